@@ -0,0 +1,5 @@
+# rasa_sdk importa questo package prima di aprire la porta del server: qui si caricano ambiente e
+# logging e, con ACTION_WARMUP=true, catalogo, indici e client (vedi utils/avvio.py)
+from utils.avvio import prepara_processo
+
+prepara_processo()
@@ -2,9 +2,21 @@ from typing import Dict, Text, Any, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.forms import FormValidationAction
-from utils.api_service import ApiService  # Importiamo il servizio API
+from actions.motori_actions import chiedi_motore  # Richiesta del motore con suggerimenti dal catalogo
+from utils.documenti import accoda_preventivo, contenuto_preventivo  # PDF generato in background
+from utils.pricing import prezza_preventivo  # Logica di prezzo condivisa con il calcolo batch
+from utils.quote_cache import get_quote_cache  # Preventivi già calcolati per configurazioni identiche
+from utils.logger import logger
+from utils.search import get_search_index  # Ricerca full-text nel catalogo
+from utils.metrics import strumenta_azioni  # Durata ed errori di run e validatori
+from utils.resilience import applica_budget_turno  # Budget di latenza per turno sulle chiamate al backend
+
+
+def api_service():
+    """Client asincrono condiviso dal processo (non blocca l'event loop), importato e creato al primo utilizzo."""
+    from utils.async_api_service import get_async_api_service
+    return get_async_api_service()
 
-api_service = ApiService()
 
 class ActionGeneratePreventivo(Action):
     """Genera un preventivo basato sulle preferenze dell'utente e i prodotti disponibili"""
@@ -12,55 +24,33 @@ class ActionGeneratePreventivo(Action):
     def name(self) -> Text:
         return "action_generate_preventivo"
 
-    def trova_motore_adatto(self, dimensione: str) -> Dict[str, Any]:
-        """Seleziona il motore più adatto in base alla dimensione della tapparella"""
-        
-        larghezza, altezza = map(int, dimensione.split("x"))
-        peso_tapparella = (larghezza * altezza * 0.005)  # Peso stimato in kg per cm²
-
-        # Recupera i motori disponibili dall'API con filtro sulla potenza minima
-        motori = api_service.get("prodotti", params={"categoria": "motori", "potenza_min": peso_tapparella})
-        
-        if not motori:
-            return None
-
-        return sorted(motori, key=lambda x: float(x["prezzo_prodotto"]))[0]  # Restituisce il motore più economico
-
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict]:
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict]:
         dimensione = tracker.get_slot("dimensione")
         materiale = tracker.get_slot("materiale")
         colore = tracker.get_slot("colore")
-        
-        print (colore) # debug
-        
+        logger.debug("Colore selezionato", extra={"colore": colore})
+
         manovra = tracker.get_slot("manovra")
         motore_selezionato = tracker.get_slot("motore")
         pulsante = tracker.get_slot("pulsante")
         accessori = tracker.get_slot("accessori") or []
 
-        # Se l'utente non ha scelto un motore, selezioniamo quello più adatto
-        if not motore_selezionato:
-            motore_selezionato = self.trova_motore_adatto(dimensione)
-
-        if not motore_selezionato:
-            dispatcher.utter_message(text="⚠️ Non ho trovato un motore adatto per questa tapparella.")
+        # Prezzo di tutta la distinta (motore, pulsante, accessori) con la logica condivisa
+        configurazione = {
+            "tipo": "preventivo", "dimensione": dimensione, "materiale": materiale, "colore": colore,
+            "motore": motore_selezionato, "pulsante": pulsante, "accessori": accessori,
+        }
+        esito = await get_quote_cache().get_or_compute(configurazione, lambda: prezza_preventivo(
+            api_service(), dimensione, materiale, motore_selezionato, pulsante, accessori
+        ))
+
+        if "errore" in esito:
+            dispatcher.utter_message(text=f"⚠️ {esito['errore']}")
             return []
 
-        prezzo_totale = float(motore_selezionato["prezzo_prodotto"])
-
-        # Recupera il pulsante se richiesto
-        if pulsante:
-            pulsante_prodotto = api_service.get("prodotti", params={"categoria": "pulsanti", "nome_prodotto": pulsante})
-            if pulsante_prodotto:
-                prezzo_totale += float(pulsante_prodotto[0]["prezzo_prodotto"])
-
-        # Recupera gli accessori se richiesti
-        accessori_selezionati = []
-        for accessorio in accessori:
-            accessorio_prodotto = api_service.get("prodotti", params={"categoria": "accessori", "nome_prodotto": accessorio})
-            if accessorio_prodotto:
-                accessori_selezionati.append(accessorio_prodotto[0])
-                prezzo_totale += float(accessorio_prodotto[0]["prezzo_prodotto"])
+        motore_selezionato = esito["motore"]
+        accessori_selezionati = esito["accessori"]
+        prezzo_totale = esito["prezzo_totale"]
 
         # Creazione del preventivo finale
         preventivo = f"""
@@ -77,6 +67,19 @@ class ActionGeneratePreventivo(Action):
         """
 
         dispatcher.utter_message(text=preventivo)
+
+        # Documento PDF/HTML: solo accodato, la generazione avviene fuori dal processo
+        documento = accoda_preventivo(contenuto_preventivo("Preventivo per la tua tapparella", [
+            ("Dimensioni", dimensione),
+            ("Materiale", materiale),
+            ("Colore", colore),
+            ("Manovra", manovra),
+            ("Motore", f"{motore_selezionato['nome_prodotto']} - {motore_selezionato['prezzo_prodotto']}€"),
+            ("Pulsante", pulsante or "Nessuno"),
+            ("Accessori", ", ".join(a['nome_prodotto'] for a in accessori_selezionati) or "Nessuno"),
+        ], totale=prezzo_totale))
+        if documento:
+            dispatcher.utter_message(text=documento)
         return []
 
 class ValidatePreventivoTapparellaForm(FormValidationAction):
@@ -90,18 +93,12 @@ class ValidatePreventivoTapparellaForm(FormValidationAction):
         tracker: Tracker,
         domain: Dict[Text, Any]
     ) -> Dict[Text, Any]:
-        """Valida il valore del motore: deve essere solo il nome del motore, non un'intera frase"""
-
-        motori_validi = ["Somfy", "Nice", "Rollmatik", "Bubendorff"]  # Lista motori disponibili
-
-        # Se il valore del motore è una frase lunga, estrai solo parole chiave
-        parole = slot_value.split()  # Divide la frase in parole
-        for parola in parole:
-            if parola.capitalize() in motori_validi:
-                return {"motore": parola.capitalize()}  # Restituisci solo il nome del motore
-        
-        dispatcher.utter_message(text="⚠️ Non ho capito quale motore vuoi. Puoi specificare uno tra Somfy, Nice, Rollmatik o Bubendorff?")
-        return {"motore": None}
+        """Valida il valore del motore: lo cerca tra i motori del catalogo invece di accettare la frase"""
+        motore, suggerimenti = get_search_index().scegli(str(slot_value), categoria="motori")
+        if motore is None:
+            chiedi_motore(dispatcher, slot_value, suggerimenti)
+            return {"motore": None}
+        return {"motore": motore.nome}
 
     async def validate_materiale(
         self,
@@ -127,7 +124,7 @@ class ValidatePreventivoTapparellaForm(FormValidationAction):
         domain: Dict[Text, Any]
     ) -> Dict[Text, Any]:
         """Valida il colore e imposta lo slot"""
-        print(f"[DEBUG COLORE]{slot_value}") #debug
+        logger.debug("Validazione colore", extra={"colore": slot_value})
         if slot_value:
             return {"colore": slot_value}
 
@@ -164,4 +161,10 @@ class ValidatePreventivoTapparellaForm(FormValidationAction):
             return {"pulsante": slot_value}
         
         dispatcher.utter_message(text="Non ho capito la scelta del pulsante, puoi ripetere?")
-        return {"pulsante": None}
\ No newline at end of file
+        return {"pulsante": None}
+
+
+# Budget di latenza per turno (API_TURN_BUDGET) sulle chiamate al backend delle azioni di questo modulo
+applica_budget_turno(globals())
+# Strumenta run e validatori delle azioni di questo modulo (nessun effetto con METRICS_ENABLED disattivo)
+strumenta_azioni(globals())
@@ -3,9 +3,25 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.forms import FormValidationAction
 from rasa_sdk.events import SlotSet, AllSlotsReset 
-from utils.api_service import ApiService  # Servizio API per recuperare i motori
+from utils.calculation import Calculations, DENSITA_MATERIALI, codice_materiale  # Tabella unica dei materiali
+from utils.documenti import accoda_preventivo, contenuto_preventivo  # PDF generato in background
+from utils.misure import Dimensione, dimensione_da_slot, dimensione_da_tracker, nome_materiale  # Slot tipizzati
+from utils.motor_selection import get_motor_selector, peso_richiesto  # Indice dei motori per portata
+from utils.search import get_search_index  # Ricerca full-text nel catalogo
+from utils.metrics import strumenta_azioni  # Durata ed errori di run e validatori
+from utils.resilience import applica_budget_turno  # Budget di latenza per turno sulle chiamate al backend
+
+def chiedi_motore(dispatcher: CollectingDispatcher, testo: str, suggerimenti: List[Any]):
+    """Motore non riconosciuto con sicurezza: lo richiede, proponendo i motori più vicini come pulsanti."""
+    if not suggerimenti:
+        dispatcher.utter_message(text=f"⚠️ Non ho trovato un motore che corrisponda a '{testo}'. Puoi indicare la marca o la coppia (es. 30 Nm)?")
+        return
+    buttons = [
+        {"title": f"{motore.nome} - {motore.prezzo}€", "payload": f'/choose_motor{{"motore": "{motore.nome}"}}'}
+        for motore in suggerimenti
+    ]
+    dispatcher.utter_message(text=f"⚠️ Non sono sicuro di quale motore intendi con '{testo}'. Forse uno di questi?", buttons=buttons)
 
-api_service = ApiService()
 
 class ActionGenerateMotorQuote(Action):
     """Genera un preventivo per il motore della tapparella"""
@@ -13,62 +29,34 @@ class ActionGenerateMotorQuote(Action):
     def name(self) -> Text:
         return "action_generate_motor_quote"
 
-    def calcola_peso_tapparella(self, dimensione: str, materiale: str) -> float:
+    def calcola_peso_tapparella(self, dimensione: Dimensione, materiale: str) -> float:
         """Calcola il peso della tapparella in base alle dimensioni e al materiale"""
-        larghezza, altezza = map(int, dimensione.split("x"))
-
-        pesi_materiali = {
-            "alluminio": 4.5,
-            "pvc": 3.0,
-            "acciaio": 7.0,
-            "PVC leggero" : 4.0,
-            "PVC rinforzato" : 5.0 ,
-            "Alluminio coibentato" : 5.5,
-            "Alluminio estruso" : 7.0,
-            "Acciaio blindato" : 8.5,
-        }
-
-        peso_m2 = pesi_materiali.get(materiale.lower(), 4.0)
-        peso_totale = (larghezza / 100) * (altezza / 100) * peso_m2
-        return round(peso_totale, 2)
-
-    def trova_potenza_minima(self, peso: float) -> int:
-        """Trova la potenza minima richiesta per il motore in base al peso della tapparella"""
-        if peso > 80:
-            return 50
-        elif peso > 60:
-            return 40
-        elif peso > 40:
-            return 30
-        else:
-            return 20
+        return Calculations.estimate_weight(dimensione, materiale)
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict]:
-        dimensione = tracker.get_slot("dimensione")
-        materiale = tracker.get_slot("materiale")
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict]:
+        dimensione = dimensione_da_tracker(tracker)  # slot larghezza_cm/altezza_cm già interpretati
+        materiale = tracker.get_slot("codice_materiale") or tracker.get_slot("materiale")
 
         if not dimensione or not materiale:
             dispatcher.utter_message(text="⚠️ Mi servono le dimensioni e il materiale della tapparella per calcolare il preventivo.")
             return []
 
         peso_tapparella = self.calcola_peso_tapparella(dimensione, materiale)
-        peso_per_motore = self.trova_potenza_minima (peso_tapparella)
-        motori = api_service.get_motori(peso_per_motore)
+        # Prende il motore più economico in grado di sollevare la tapparella
+        motore_selezionato = get_motor_selector().piu_economico(peso_richiesto(peso_tapparella))
 
-        if not motori:
+        if not motore_selezionato:
             dispatcher.utter_message(text="⚠️ Non ho trovato un motore adatto per questa tapparella.")
             return []
 
-        # Prende il motore più economico
-        motore_selezionato = sorted(motori, key=lambda x: float(x["prezzo_prodotto"]))[0]
-        prezzo_totale = float(motore_selezionato["prezzo_prodotto"])
+        prezzo_totale = motore_selezionato.prezzo
 
         preventivo = f"""
         🔧 Preventivo per il Motore 🔧
-        📏 Dimensioni: {dimensione}
-        🏗 Materiale: {materiale}
+        📏 Dimensioni: {dimensione.testo}
+        🏗 Materiale: {nome_materiale(materiale)}
         ⚖️ Peso stimato: {peso_tapparella} kg
-        ⚙️ Motore: {motore_selezionato['nome_prodotto']} - 💰 {prezzo_totale}€
+        ⚙️ Motore: {motore_selezionato.nome} - 💰 {prezzo_totale}€
         """
 
         dispatcher.utter_message(text=preventivo)
@@ -80,7 +68,8 @@ class ActionGenerateMotorQuote(Action):
         ]
         dispatcher.utter_message(text="Vuoi confermare questo motore o preferisci vederne altri?", buttons=buttons)
 
-        return []
+        # Il motore proposto è quello confermato da /confirm_motor (action_confirm_motor)
+        return [SlotSet("motore", motore_selezionato.nome)]
 
 class ValidateMotorQuoteForm(FormValidationAction):
     """Classe per validare il form `motor_quote_form`"""
@@ -92,24 +81,19 @@ class ValidateMotorQuoteForm(FormValidationAction):
         self, slot_value: Any, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]
     ) -> Dict[Text, Any]:
         """Valida la dimensione fornita dall'utente"""
-        if "x" in slot_value:
-            larghezza, altezza = slot_value.split("x")
-            try:
-                larghezza = int(larghezza)
-                altezza = int(altezza)
-                return {"dimensione": slot_value}
-            except ValueError:
-                dispatcher.utter_message(text="⚠️ Il formato delle dimensioni non è corretto. Usa il formato: larghezza x altezza (es. 120x100).")
-                return {"dimensione": None}
-        dispatcher.utter_message(text="⚠️ Non ho capito le dimensioni. Puoi fornirle nel formato corretto? (es. 120x100)")
-        return {"dimensione": None}
+        # Con FastPathExtractor gli slot tipizzati sono già impostati; il testo si interpreta solo se li ha estratti DIET
+        dimensione = dimensione_da_slot(slot_value, tracker.get_slot("larghezza_cm"), tracker.get_slot("altezza_cm"))
+        if dimensione is None:
+            dispatcher.utter_message(text="⚠️ Non ho capito le dimensioni. Puoi fornirle nel formato corretto? (es. 120x100)")
+            return {"dimensione": None, "larghezza_cm": None, "altezza_cm": None}
+        return {"dimensione": dimensione.testo, "larghezza_cm": dimensione.larghezza_cm, "altezza_cm": dimensione.altezza_cm}
 
     async def validate_materiale(
         self, slot_value: Any, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]
     ) -> Dict[Text, Any]:
         """Valida il materiale fornito dall'utente"""
         
-        materiali_validi = ["alluminio", "pvc", "acciaio", "alluminio coibentato", "acciaio blindato"]
+        materiali_validi = [codice.replace("_", " ") for codice in DENSITA_MATERIALI]
         
                 # Verifica se l'utente sta cercando di avviare un preventivo invece di fornire il materiale
         intent_utente = tracker.latest_message.get("intent", {}).get("name", "")
@@ -118,43 +102,78 @@ class ValidateMotorQuoteForm(FormValidationAction):
             dispatcher.utter_message(text="Devo prima conoscere le dimensioni e il materiale della tapparella.")
             return {"materiale": None}
         
-        if slot_value.lower() not in materiali_validi:
+        codice = tracker.get_slot("codice_materiale")
+        if codice is None or nome_materiale(codice) != slot_value:
+            codice = codice_materiale(slot_value)  # materiale estratto da DIET: nome da normalizzare
+        if codice is None:
             dispatcher.utter_message(
                 text=f"❌ Il materiale '{slot_value}' non è valido. Scegli tra: {', '.join(materiali_validi)}"
             )
-            return {"materiale": None}  # Reset dello slot per ripetere la richiesta
+            return {"materiale": None, "codice_materiale": None}  # Reset dello slot per ripetere la richiesta
 
-        return {"materiale": slot_value.lower()}
+        return {"materiale": nome_materiale(codice), "codice_materiale": codice}
 
     async def validate_motore(
         self, slot_value: Any, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]
     ) -> Dict[Text, Any]:
         """Se l'utente ha già scelto un motore, lo conferma. Altrimenti, suggerisce il migliore."""
-        dimensione = tracker.get_slot("dimensione")
+        dimensione = dimensione_da_tracker(tracker)
         if slot_value:
-            return {"motore": slot_value}
-        
-        if dimensione:
-            larghezza, altezza = map(int, dimensione.split("x"))
-            peso_tapparella = larghezza * altezza * 0.005  # Calcolo del peso stimato
+            # Richiesta libera (es. "motore 30 nm con manovra di soccorso"): cerca il motore nel catalogo
+            motore, suggerimenti = get_search_index().scegli(slot_value, categoria="motori")
+            if motore is None:
+                chiedi_motore(dispatcher, slot_value, suggerimenti)
+                return {"motore": None}
+            if motore.nome.lower() != slot_value.strip().lower():
+                dispatcher.utter_message(text=f"📌 Ho trovato il motore {motore.nome}.")
+            return {"motore": motore.nome}
 
+        if dimensione:
             # Ricerca il motore adatto
-            motori = api_service.get("motori")
+            materiale = tracker.get_slot("codice_materiale") or tracker.get_slot("materiale")
+            motori = get_motor_selector().per_tapparella(dimensione, materiale, 1)
             if motori:
-                for motore in motori:
-                    potenza = motore.get("potenza_nm", 0)
-                    if potenza >= peso_tapparella:
-                        dispatcher.utter_message(text=f"📌 Ti consiglio il motore {motore['nome_prodotto']} con {potenza}Nm di potenza.")
-                        return {"motore": motore['nome_prodotto']}
+                motore = motori[0]
+                dispatcher.utter_message(text=f"📌 Ti consiglio il motore {motore.nome} con {motore.coppia_nm:g}Nm di potenza.")
+                return {"motore": motore.nome}
 
         dispatcher.utter_message(text="⚠️ Non ho trovato un motore adatto. Puoi specificare una preferenza?")
         return {"motore": None}
     
+class ActionShowMotorAlternatives(ActionGenerateMotorQuote):
+    """Mostra i motori alternativi adatti alla tapparella, dal più economico"""
+
+    def name(self) -> Text:
+        return "action_show_motor_alternatives"
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict]:
+        dimensione = dimensione_da_tracker(tracker)
+        materiale = tracker.get_slot("codice_materiale") or tracker.get_slot("materiale")
+
+        if not dimensione or not materiale:
+            dispatcher.utter_message(text="⚠️ Mi servono le dimensioni e il materiale della tapparella per proporti dei motori.")
+            return []
+
+        peso_tapparella = self.calcola_peso_tapparella(dimensione, materiale)
+        # Il primo è il motore già proposto: mostriamo le alternative successive
+        alternative = get_motor_selector().alternative(peso_richiesto(peso_tapparella))[1:]
+
+        if not alternative:
+            dispatcher.utter_message(text="⚠️ Non ci sono altri motori adatti per questa tapparella.")
+            return []
+
+        buttons = [
+            {"title": f"{motore.nome} - {motore.prezzo}€", "payload": f'/choose_motor{{"motore": "{motore.nome}"}}'}
+            for motore in alternative
+        ]
+        dispatcher.utter_message(text=f"Ecco altri motori adatti a una tapparella di {peso_tapparella} kg:", buttons=buttons)
+        return []
+
 class ActionConfirmMotor(Action):
     def name(self) -> Text:
         return "action_confirm_motor"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict]:
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict]:
         dimensione = tracker.get_slot("dimensione")
         materiale = tracker.get_slot("materiale")
         motore = tracker.get_slot("motore")
@@ -167,6 +186,15 @@ class ActionConfirmMotor(Action):
         """
 
         dispatcher.utter_message(text=conferma)
+
+        # Documento PDF/HTML della conferma: solo accodato, la generazione avviene fuori dal processo
+        documento = accoda_preventivo(contenuto_preventivo("Conferma del preventivo", [
+            ("Dimensioni", dimensione),
+            ("Materiale", materiale),
+            ("Motore scelto", motore.get("nome_prodotto") if isinstance(motore, dict) else motore),
+        ]))
+        if documento:
+            dispatcher.utter_message(text=documento)
         dispatcher.utter_message(text="Grazie per la richiesta! Ti contatteremo presto.")
 
         # 🔄 Reset degli slot dopo la conferma
@@ -178,11 +206,11 @@ class ActionFinalizeMotor(Action):
     def name(self):
         return "action_finalize_motor"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain):
         motore = tracker.get_slot("motore")
 
         if motore:
-            dispatcher.utter_message(f"✅ Il motore **{motore['nome_prodotto']}** è stato confermato! Procediamo con l'ordine. 🚀")
+            dispatcher.utter_message(f"✅ Il motore **{motore}** è stato confermato! Procediamo con l'ordine. 🚀")
             return [SlotSet("motore", None)]  # Reset dello slot
         else:
             dispatcher.utter_message("❌ Nessun motore selezionato. Vuoi vederne altri?")
@@ -193,5 +221,14 @@ class ActionResetSlots(Action):
     def name(self) -> Text:
         return "action_reset_slots"
 
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("dimensione", None), SlotSet("materiale", None), SlotSet("motore", None)]
+    async def run(self, dispatcher, tracker, domain):
+        return [
+            SlotSet(slot, None)
+            for slot in ("dimensione", "larghezza_cm", "altezza_cm", "materiale", "codice_materiale", "motore")
+        ]
+
+
+# Budget di latenza per turno (API_TURN_BUDGET) sulle chiamate al backend delle azioni di questo modulo
+applica_budget_turno(globals())
+# Strumenta run e validatori delle azioni di questo modulo (nessun effetto con METRICS_ENABLED disattivo)
+strumenta_azioni(globals())
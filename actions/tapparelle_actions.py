@@ -3,9 +3,25 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.forms import FormValidationAction
 from rasa_sdk.events import SlotSet, AllSlotsReset
-from utils.api_service import ApiService  # Servizio API per chiamare il backend
+from utils.documenti import accoda_preventivo, contenuto_preventivo  # PDF generato in background
+from utils.pricing import prezza_tapparella  # Logica di prezzo condivisa con il calcolo batch
+from utils.misure import dimensione_da_slot, dimensione_da_tracker  # Dimensioni in cm dagli slot tipizzati
+from utils.quote_cache import get_quote_cache  # Preventivi già calcolati per configurazioni identiche
+from utils.metrics import strumenta_azioni  # Durata ed errori di run e validatori
+from utils.resilience import applica_budget_turno  # Budget di latenza per turno sulle chiamate al backend
+
+
+def api_service():
+    """Client asincrono condiviso dal processo (non blocca l'event loop), importato e creato al primo utilizzo."""
+    from utils.async_api_service import get_async_api_service
+    return get_async_api_service()
+
+
+async def colori_disponibili():
+    """Colori per materiale in memoria; l'aggiornamento dall'API, se scaduto, avviene in background."""
+    from utils.colori import get_colori_disponibili
+    return await get_colori_disponibili().pronto(api_service())
 
-api_service = ApiService()
 
 class ActionGenerateTapparellaQuote(Action):
     """Genera un preventivo per la tapparella"""
@@ -13,8 +29,8 @@ class ActionGenerateTapparellaQuote(Action):
     def name(self) -> Text:
         return "action_generate_tapparella_quote"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict]:
-        dimensione = tracker.get_slot("dimensione")
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict]:
+        dimensione = dimensione_da_tracker(tracker)  # slot larghezza_cm/altezza_cm già interpretati
         materiale = tracker.get_slot("materiale")
         colore = tracker.get_slot("colore")
         accessori = tracker.get_slot("accessori") or []
@@ -24,19 +40,18 @@ class ActionGenerateTapparellaQuote(Action):
             return []
 
         # Richiesta API per ottenere il preventivo
-        response = api_service.post("configura_tapparella", {
-            "materiale": materiale,
-            "larghezza": int(dimensione.split("x")[0]),
-            "altezza": int(dimensione.split("x")[1]),
-            "colore": colore,
-            "accessori": accessori
-        })
-
-        if "errore" in response:
-            dispatcher.utter_message(text=f"⚠️ Errore: {response['errore']}")
+        configurazione = {
+            "tipo": "tapparella", "dimensione": dimensione.testo, "materiale": materiale, "colore": colore,
+            "accessori": accessori,
+        }
+        preventivo = await get_quote_cache().get_or_compute(configurazione, lambda: prezza_tapparella(
+            api_service(), dimensione, materiale, colore, accessori
+        ))
+
+        if "errore" in preventivo:
+            dispatcher.utter_message(text=f"⚠️ Errore: {preventivo['errore']}")
             return []
 
-        preventivo = response["preventivo"]
         messaggio = f"""
         🏠 Preventivo per la tua tapparella 🏠
         📏 Dimensioni: {preventivo['dimensioni']}
@@ -49,6 +64,16 @@ class ActionGenerateTapparellaQuote(Action):
 
         dispatcher.utter_message(text=messaggio)
 
+        # Documento PDF/HTML: solo accodato, la generazione avviene fuori dal processo
+        documento = accoda_preventivo(contenuto_preventivo("Preventivo per la tua tapparella", [
+            ("Dimensioni", preventivo['dimensioni']),
+            ("Materiale", materiale),
+            ("Colore", preventivo['colore']),
+            ("Accessori", ", ".join(accessori) if accessori else "Nessuno"),
+        ], totale=preventivo['prezzo_totale']))
+        if documento:
+            dispatcher.utter_message(text=documento)
+
         buttons = [
             {"title": "Sì, conferma", "payload": "/confirm_tapparella"},
             {"title": "Voglio cambiare opzioni", "payload": "/change_tapparella"},
@@ -67,16 +92,12 @@ class ValidateTapparellaQuoteForm(FormValidationAction):
         self, slot_value: Any, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]
     ) -> Dict[Text, Any]:
         """Valida la dimensione fornita dall'utente"""
-        if "x" in slot_value:
-            larghezza, altezza = slot_value.split("x")
-            try:
-                int(larghezza), int(altezza)
-                return {"dimensione": slot_value}
-            except ValueError:
-                dispatcher.utter_message(text="⚠️ Usa il formato corretto per le dimensioni: larghezza x altezza (es. 120x100).")
-                return {"dimensione": None}
-        dispatcher.utter_message(text="⚠️ Puoi fornire le dimensioni nel formato corretto? (es. 120x100)")
-        return {"dimensione": None}
+        # Con FastPathExtractor gli slot tipizzati sono già impostati; il testo si interpreta solo se li ha estratti DIET
+        dimensione = dimensione_da_slot(slot_value, tracker.get_slot("larghezza_cm"), tracker.get_slot("altezza_cm"))
+        if dimensione is None:
+            dispatcher.utter_message(text="⚠️ Puoi fornire le dimensioni nel formato corretto? (es. 120x100)")
+            return {"dimensione": None, "larghezza_cm": None, "altezza_cm": None}
+        return {"dimensione": dimensione.testo, "larghezza_cm": dimensione.larghezza_cm, "altezza_cm": dimensione.altezza_cm}
 
     # async def validate_materiale (
     #     slef, slot_value: Any, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict [Text, Any]
@@ -91,53 +112,52 @@ class ValidateTapparellaQuoteForm(FormValidationAction):
         if not colore:
             dispatcher.utter_message(text="⚠️ Per favore, inserisci un colore valido.")
             return {"colore": None}
-        
-        # Interroga la collezione varianti per verificare i colori ammessi
-        response = api_service.get("varianti", params={"categoria": "tapparella"})
-        if "data" in response:
-            colori_ammessi = [doc.get("name", "").strip().lower() for doc in response["data"]]
-            if colore in colori_ammessi:
-                return {"colore": colore}
-            else:
-                dispatcher.utter_message(
-                    text="⚠️ Il colore inserito non è valido. I colori ammessi sono: " + ", ".join(colori_ammessi)
-                )
-                return {"colore": None}
-        else:
+
+        # Indice dei colori per materiale in memoria: nessuna chiamata al backend se già caricato
+        materiale = tracker.get_slot("materiale")
+        colori = await colori_disponibili()
+        if not colori.conosce(materiale):
             dispatcher.utter_message(text="⚠️ Errore nel recupero dei colori ammessi. Riprova più tardi.")
             return {"colore": None}
-        
-        
-class ActionAskColoreTapparella (Action) :
-    
-    def name (self):
+        if colori.ammesso(colore, materiale):
+            return {"colore": colori.nome(colore)}
+
+        testo = f"⚠️ Il colore {colore} non è disponibile" + (f" per le tapparelle in {materiale}." if materiale else ".")
+        suggerimenti = colori.suggerimenti(colore, materiale)
+        if suggerimenti:
+            testo += " Forse intendevi: " + ", ".join(suggerimenti) + "?"
+        testo += "\nI colori ammessi sono: " + ", ".join(colori.disponibili(materiale))
+        dispatcher.utter_message(text=testo)
+        return {"colore": None}
+
+
+class ActionAskColoreTapparella(Action):
+    """Chiede il colore elencando quelli disponibili per il materiale scelto"""
+
+    def name(self) -> Text:
         return "action_ask_colore_tapparella"
-    
-    def run (self, 
-             dispatcher: CollectingDispatcher, 
-             tracker: Tracker, 
-             domain: Dict[Any, Text]
-            )->List[Dict[Text, Any]]:
-                
-        materiale = tracker.get_slot ("materiale")
+
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        materiale = tracker.get_slot("materiale")
         if not materiale:
-            dispatcher.utter_message ("Non hai specificato il materiale della tapparella.")
+            dispatcher.utter_message(text="Non hai specificato il materiale della tapparella.")
             return []
-        
-        materiale_lower = materiale.strip().lower()
-        
-        response = api_service.get ("colori_tapparelle", params = {"materiale": materiale_lower})
-        
-        colori_disponibili = response["data"]
-        
-        if not response or "data" not in response:
-            dispatcher.utter_message (text="Errore nel recupero dei colori")
-        
+
+        colori = await colori_disponibili()
+        if not colori.conosce(materiale):
+            dispatcher.utter_message(text="⚠️ Errore nel recupero dei colori. Di che colore vuoi la tapparella?")
+            return []
+
         message = f"I colori disponibili per le tapparelle in {materiale} sono:\n"
-        for colore_doc in colori_disponibili:
-            valore_colore += colore_doc.get["color", "N\D"]
-            message += f"• {valore_colore}\n"
-        message+= "\n Scegli pure il colore che preferisci!"
-        
-        dispatcher.utter_message (text=message)
-        return []
\ No newline at end of file
+        for colore in colori.disponibili(materiale):
+            message += f"• {colore}\n"
+        message += "\nScegli pure il colore che preferisci!"
+
+        dispatcher.utter_message(text=message)
+        return []
+
+
+# Budget di latenza per turno (API_TURN_BUDGET) sulle chiamate al backend delle azioni di questo modulo
+applica_budget_turno(globals())
+# Strumenta run e validatori delle azioni di questo modulo (nessun effetto con METRICS_ENABLED disattivo)
+strumenta_azioni(globals())
@@ -0,0 +1,61 @@
+"""Confronto tra il calcolo per singola apertura e il calcolo batch (NumPy e Python puro).
+
+Uso: python -m benchmarks.bench_calculation [--n 10000]
+"""
+import argparse
+import random
+import time
+
+from utils.calculation import Calculations, DENSITA_MATERIALI, get_numpy
+from utils.motor_selection import get_motor_selector, peso_richiesto
+
+
+def genera_aperture(n: int, seed: int = 42):
+    """Genera n aperture casuali (larghezza, altezza in cm e codice materiale)."""
+    rnd = random.Random(seed)
+    materiali = list(DENSITA_MATERIALI)
+    larghezze = [rnd.randint(40, 300) for _ in range(n)]
+    altezze = [rnd.randint(40, 300) for _ in range(n)]
+    return larghezze, altezze, [rnd.choice(materiali) for _ in range(n)]
+
+
+def per_singola_apertura(larghezze, altezze, materiali):
+    """Il percorso delle azioni: stringa dimensione, regex, lookup e ricerca motore per ogni apertura."""
+    selector = get_motor_selector()
+    risultati = []
+    for larghezza, altezza, materiale in zip(larghezze, altezze, materiali):
+        peso = Calculations.estimate_weight(f"{larghezza}x{altezza}", materiale)
+        risultati.append((peso, selector.piu_economico(peso_richiesto(peso))))
+    return risultati
+
+
+def cronometra(funzione, *args, ripetizioni: int = 5) -> float:
+    """Tempo migliore (secondi) su più ripetizioni."""
+    migliore = float("inf")
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione(*args)
+        migliore = min(migliore, time.perf_counter() - inizio)
+    return migliore
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=10000, help="numero di aperture")
+    args = parser.parse_args()
+
+    dati = genera_aperture(args.n)
+    get_motor_selector()  # carica catalogo e indice fuori dalla misura
+
+    base = cronometra(per_singola_apertura, *dati)
+    print(f"{'metodo':<28}{'tempo (ms)':>12}{'aperture/s':>14}{'speedup':>10}")
+    print(f"{'per singola apertura':<28}{base * 1000:>12.2f}{args.n / base:>14.0f}{1:>10.1f}x")
+
+    puro = cronometra(lambda *d: Calculations.batch_motor_quote(*d, use_numpy=False), *dati)
+    print(f"{'batch Python puro':<28}{puro * 1000:>12.2f}{args.n / puro:>14.0f}{base / puro:>10.1f}x")
+
+    if get_numpy() is not None:
+        vett = cronometra(Calculations.batch_motor_quote, *dati)
+        print(f"{'batch NumPy':<28}{vett * 1000:>12.2f}{args.n / vett:>14.0f}{base / vett:>10.1f}x")
+    else:
+        print("NumPy non installato: benchmark vettoriale saltato")
@@ -0,0 +1,127 @@
+"""Memoria del catalogo al crescere del numero di worker: JSON letto da ogni processo contro snapshot mmap.
+
+Per ogni numero di worker avvia N processi indipendenti che caricano il catalogo (e ne leggono
+tutti i campi, come la costruzione dell'indice di ricerca o le risposte `prodotti`), poi legge
+/proc/<pid>/smaps_rollup di ognuno:
+  PSS   memoria proporzionale: le pagine condivise sono divise tra i processi che le usano
+  USS   memoria privata del processo (Private_Clean + Private_Dirty)
+Il costo del catalogo è la differenza con worker che importano utils.catalog senza caricarlo.
+
+Con --moltiplica K il dataset viene replicato K volte (titoli, descrizioni e link distinti), per
+simulare lo scraper che copre tutto il sito.
+
+Uso: python -m benchmarks.bench_catalog_memory [--worker 1 2 4 8] [--moltiplica 20]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from utils.catalog import DATASET_DIR, file_dataset
+from utils.snapshot import compila
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+# Codice eseguito da ogni worker: segnala quando è pronto e resta in vita finché stdin è aperto
+WORKER = """
+import sys, time
+from utils.catalog import Catalog
+modo, dataset_dir, snapshot = sys.argv[1:4]
+inizio = time.perf_counter()
+if modo != "base":
+    catalogo = Catalog(dataset_dir=dataset_dir, snapshot_path=snapshot if modo == "snapshot" else None)
+    for prodotto in catalogo.prodotti:
+        prodotto.to_api()
+print(f"pronto {time.perf_counter() - inizio:.6f}", flush=True)
+sys.stdin.read()
+"""
+
+MODI = ("base", "json", "snapshot")
+
+
+def dataset_replicato(origine: str, destinazione: str, volte: int):
+    """Copia il dataset `volte` volte, con titoli, descrizioni e link distinti per ogni copia."""
+    for percorso in file_dataset(origine):
+        with open(percorso, encoding="utf-8") as f:
+            items = json.load(f)
+        replicati = [
+            {**item, "title": f"{item.get('title', '')} v{k}", "description": f"{item.get('description', '')} (variante {k})",
+             "link": f"{item.get('link', '')}?v={k}"}
+            for k in range(volte) for item in items
+        ]
+        with open(os.path.join(destinazione, os.path.basename(percorso)), "w", encoding="utf-8") as f:
+            json.dump(replicati, f, ensure_ascii=False)
+
+
+def memoria(pid: int) -> Dict[str, int]:
+    """Rss, Pss e USS (kB) del processo."""
+    valori = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for riga in f:
+            campo, _, resto = riga.partition(":")
+            if resto.strip().endswith("kB"):
+                valori[campo] = int(resto.split()[0])
+    return {"rss": valori["Rss"], "pss": valori["Pss"], "uss": valori["Private_Clean"] + valori["Private_Dirty"]}
+
+
+def misura(modo: str, worker: int, dataset_dir: str, snapshot: str) -> Dict[str, float]:
+    """Avvia `worker` processi nel modo indicato e ne somma la memoria quando sono tutti pronti."""
+    env = {**os.environ, "PYTHONPATH": ROOT_DIR, "LOG_LEVEL": "WARNING"}
+    processi = [
+        subprocess.Popen([sys.executable, "-c", WORKER, modo, dataset_dir, snapshot], cwd=ROOT_DIR, env=env,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(worker)
+    ]
+    try:
+        caricamenti = [float(p.stdout.readline().split()[1]) for p in processi]
+        misure = [memoria(p.pid) for p in processi]
+    finally:
+        for p in processi:
+            p.stdin.close()
+            p.wait()
+    return {
+        "pss": sum(m["pss"] for m in misure) / 1024,
+        "uss": sum(m["uss"] for m in misure) / worker / 1024,
+        "rss": sum(m["rss"] for m in misure) / worker / 1024,
+        "caricamento": max(caricamenti) * 1000,
+    }
+
+
+def stampa(risultati: Dict[int, Dict[str, Dict[str, float]]]):
+    print(f"{'worker':>6} {'modo':<9}{'PSS tot MB':>11}{'catalogo MB':>13}{'USS/worker MB':>15}{'RSS/worker MB':>15}{'caricamento ms':>16}")
+    for worker, per_modo in risultati.items():
+        base = per_modo["base"]["pss"]
+        for modo in MODI[1:]:
+            m = per_modo[modo]
+            print(f"{worker:>6} {modo:<9}{m['pss']:>11.1f}{m['pss'] - base:>13.2f}{m['uss']:>15.2f}"
+                  f"{m['rss']:>15.2f}{m['caricamento']:>16.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--moltiplica", type=int, default=1, help="repliche del dataset (1 = dataset reale)")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("Serve Linux (/proc/<pid>/smaps_rollup)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_dir = DATASET_DIR
+        if args.moltiplica > 1:
+            dataset_dir = os.path.join(tmp, "prodotti_per_categoria")
+            os.makedirs(dataset_dir)
+            dataset_replicato(DATASET_DIR, dataset_dir, args.moltiplica)
+        snapshot = os.path.join(tmp, "catalogo.snap")
+        inizio = time.perf_counter()
+        info = compila(dataset_dir, snapshot)
+        print(f"dataset: {info['prodotti']} prodotti, JSON {info['byte_json'] / 1024:.0f} kB → snapshot "
+              f"{info['byte'] / 1024:.0f} kB ({info['stringhe']} stringhe, {info['stringhe_condivise']} riferimenti "
+              f"condivisi), compilato in {(time.perf_counter() - inizio) * 1000:.0f} ms\n")
+
+        risultati = {n: {modo: misura(modo, n, dataset_dir, snapshot) for modo in MODI} for n in args.worker}
+    stampa(risultati)
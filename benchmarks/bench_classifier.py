@@ -0,0 +1,89 @@
+"""Confronto tra il classificatore compilato (automa + indice di n-grammi) e la scansione ingenua.
+
+La scansione ingenua cerca ogni parola chiave e ogni titolo in ogni messaggio e, per la ricerca
+approssimata, confronta ogni parola con ogni termine (fuzzywuzzy se installato, altrimenti difflib).
+
+Uso: python -m benchmarks.bench_classifier [--n 2000]
+"""
+import argparse
+import random
+import time
+from difflib import SequenceMatcher
+
+from utils.classifier import get_classifier, normalizza, SOGLIA_FUZZY, MIN_LUNGHEZZA_FUZZY
+
+try:
+    from fuzzywuzzy import fuzz
+
+    def rapporto(a: str, b: str) -> float:
+        return fuzz.ratio(a, b) / 100
+except ImportError:  # fuzzywuzzy è opzionale per il benchmark
+    def rapporto(a: str, b: str) -> float:
+        return SequenceMatcher(None, a, b).ratio()
+
+PAROLE_COMUNI = ["vorrei", "un", "per", "la", "mia", "finestra", "quanto", "costa", "il", "prezzo", "di", "ciao"]
+
+
+def genera_messaggi(n: int, seed: int = 42):
+    """Messaggi casuali con parole chiave, titoli del catalogo ed errori di battitura."""
+    rnd = random.Random(seed)
+    classificatore = get_classifier()
+    termini = list(classificatore.parole) + list(classificatore.titoli)
+    messaggi = []
+    for _ in range(n):
+        parole = [rnd.choice(PAROLE_COMUNI) for _ in range(rnd.randint(3, 10))]
+        termine = rnd.choice(termini)
+        if rnd.random() < 0.3 and len(termine) > 4:
+            # Errore di battitura: una lettera raddoppiata
+            i = rnd.randrange(len(termine))
+            termine = termine[:i] + termine[i] + termine[i:]
+        parole.insert(rnd.randrange(len(parole) + 1), termine)
+        messaggi.append(" ".join(parole))
+    return messaggi
+
+
+def scansione_ingenua(messaggi):
+    """Ogni termine cercato in ogni messaggio; confronto a coppie per le parole non riconosciute."""
+    classificatore = get_classifier()
+    parole_fuzzy = [p for p in classificatore.parole if len(p) >= MIN_LUNGHEZZA_FUZZY]
+    risultati = []
+    for messaggio in messaggi:
+        testo = f" {' '.join(normalizza(messaggio).split())} "
+        trovate = {p for p in classificatore.parole if f" {p} " in testo}
+        trovate |= {t for t in classificatore.titoli if f" {t} " in testo}
+        for parola in testo.split():
+            if len(parola) >= MIN_LUNGHEZZA_FUZZY and parola not in trovate:
+                trovate |= {p for p in parole_fuzzy if rapporto(parola, p) >= SOGLIA_FUZZY}
+        risultati.append(trovate)
+    return risultati
+
+
+def compilato(messaggi):
+    classificatore = get_classifier()
+    return [classificatore.classifica(messaggio) for messaggio in messaggi]
+
+
+def cronometra(funzione, *args, ripetizioni: int = 3) -> float:
+    """Tempo migliore (secondi) su più ripetizioni."""
+    migliore = float("inf")
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione(*args)
+        migliore = min(migliore, time.perf_counter() - inizio)
+    return migliore
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=2000, help="numero di messaggi")
+    args = parser.parse_args()
+
+    messaggi = genera_messaggi(args.n)
+    classificatore = get_classifier()  # compila automa e indici fuori dalla misura
+    print(f"{len(classificatore.parole)} parole chiave, {len(classificatore.titoli)} titoli, {args.n} messaggi")
+
+    base = cronometra(scansione_ingenua, messaggi)
+    veloce = cronometra(compilato, messaggi)
+    print(f"{'metodo':<24}{'tempo (ms)':>12}{'messaggi/s':>14}{'speedup':>10}")
+    print(f"{'scansione ingenua':<24}{base * 1000:>12.2f}{args.n / base:>14.0f}{1:>10.1f}x")
+    print(f"{'automa + n-grammi':<24}{veloce * 1000:>12.2f}{args.n / veloce:>14.0f}{base / veloce:>10.1f}x")
@@ -0,0 +1,89 @@
+"""Latenza per l'azione dei documenti dei preventivi: generazione in linea contro accodamento (utils/documenti.py).
+
+Genera N preventivi casuali, con una frazione di ripetuti (--ripetuti) come i preventivi identici
+del traffico reale, e misura:
+- in linea: HTML e PDF generati e scritti nel processo, come se l'azione li producesse da sé;
+- coda: tempo di `accoda()` (quello che paga l'azione) e tempo totale fino all'ultimo file scritto
+  dal pool di processi, con il numero di documenti deduplicati.
+
+Uso: python -m benchmarks.bench_documenti [--n 500] [--ripetuti 0.5] [--workers 2] [--accessori 3]
+"""
+import argparse
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.load_test import percentile
+from utils.calculation import DENSITA_MATERIALI
+from utils.documenti import CodaDocumenti, contenuto_preventivo, genera_documento, ticket_documento
+
+
+def preventivi(n: int, ripetuti: float, accessori: int, seme: int = 0) -> List[Dict[str, Any]]:
+    casuale = random.Random(seme)
+    generati: List[Dict[str, Any]] = []
+    for _ in range(n):
+        if generati and casuale.random() < ripetuti:
+            generati.append(casuale.choice(generati))
+            continue
+        generati.append(contenuto_preventivo("Preventivo per la tua tapparella", [
+            ("Dimensioni", f"{casuale.randrange(40, 300, 5)}x{casuale.randrange(40, 300, 5)}"),
+            ("Materiale", casuale.choice(list(DENSITA_MATERIALI)).replace("_", " ")),
+            ("Colore", casuale.choice(["bianco", "marrone", "grigio", "verde"])),
+            ("Accessori", ", ".join(f"Accessorio {casuale.randint(1, 50)}" for _ in range(accessori)) or "Nessuno"),
+        ], totale=casuale.uniform(80, 900)))
+    return generati
+
+
+def riepilogo(nome: str, durate: List[float]):
+    ordinate = sorted(durate)
+    p50, p95, p99 = (percentile(ordinate, p) * 1000 for p in (50, 95, 99))
+    print(f"{nome:<22}{p50:>10.3f}{p95:>10.3f}{p99:>10.3f}{sum(durate):>10.2f}")
+
+
+def in_linea(contenuti: List[Dict[str, Any]]) -> List[float]:
+    durate = []
+    with tempfile.TemporaryDirectory() as cartella:
+        for contenuto in contenuti:
+            inizio = time.perf_counter()
+            genera_documento(contenuto, cartella, ticket_documento(contenuto))
+            durate.append(time.perf_counter() - inizio)
+    return durate
+
+
+def in_coda(contenuti: List[Dict[str, Any]], workers: int) -> Dict[str, Any]:
+    durate = []
+    with tempfile.TemporaryDirectory() as cartella:
+        coda = CodaDocumenti(cartella, workers=workers, maxsize=len(contenuti))
+        # Avvio del pool fuori dalla misura, come in un server già in esecuzione
+        coda.accoda(contenuto_preventivo("riscaldamento", []))
+        coda.attendi()
+        inizio_totale = time.perf_counter()
+        for contenuto in contenuti:
+            inizio = time.perf_counter()
+            coda.accoda(contenuto)
+            durate.append(time.perf_counter() - inizio)
+        coda.attendi()
+        totale = time.perf_counter() - inizio_totale
+        stats = coda.stats()
+        coda.chiudi()
+    return {"durate": durate, "totale": totale, "stats": stats}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=500)
+    parser.add_argument("--ripetuti", type=float, default=0.5, help="frazione di preventivi identici a uno precedente")
+    parser.add_argument("--workers", type=int, default=2, help="processi del pool")
+    parser.add_argument("--accessori", type=int, default=3, help="accessori per preventivo")
+    args = parser.parse_args()
+
+    contenuti = preventivi(args.n, args.ripetuti, args.accessori)
+    print(f"{args.n} preventivi, {len({ticket_documento(c) for c in contenuti})} distinti")
+    print(f"{'latenza azione (ms)':<22}{'p50':>10}{'p95':>10}{'p99':>10}{'tot (s)':>10}")
+    riepilogo("in linea", in_linea(contenuti))
+    risultato = in_coda(contenuti, args.workers)
+    riepilogo("accodamento", risultato["durate"])
+    stats = risultato["stats"]
+    print(f"coda: tutti i file scritti in {risultato['totale']:.2f}s, {stats['completati'] - 1} generati, "
+          f"{stats['deduplicati']} deduplicati, {stats['falliti']} falliti")
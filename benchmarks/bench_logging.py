@@ -0,0 +1,89 @@
+"""Costo del logging per turno sul thread che gestisce la richiesta: prima e dopo la coda.
+
+Per ogni configurazione riporta la CPU media usata dal thread chiamante e i percentili del tempo reale.
+
+"sincrono" riproduce la configurazione precedente (FileHandler + StreamHandler e print del corpo
+di ogni risposta); "coda" usa utils.logger, con scrittura in background e payload solo in DEBUG.
+
+Uso: python -m benchmarks.bench_logging [--turni 5000]
+"""
+import argparse
+import contextlib
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from utils.catalog import get_catalog
+
+RECORD_PER_TURNO = 3  # messaggi INFO scritti in un turno tipico
+# Pausa tra i turni (attesa del backend in un turno reale), in cui il thread di scrittura lavora
+PAUSA_TRA_TURNI = 0.0005
+
+
+def risposta_tipica():
+    """Il corpo di una risposta `prodotti`, come stampato prima da ApiService._get."""
+    return [p.to_api() for p in get_catalog().prodotti[:10]]
+
+
+def turno(logger: logging.Logger, payload, stampa: bool):
+    for i in range(RECORD_PER_TURNO):
+        logger.info(f"Azione eseguita {i}")
+    if stampa:
+        print(payload)
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Risposta GET prodotti", extra={"payload": payload})
+
+
+def misura(logger: logging.Logger, turni: int, stampa: bool):
+    """Tempo reale e CPU del thread chiamante (µs) per ogni turno."""
+    payload = risposta_tipica()
+    reali, cpu = [], []
+    for _ in range(turni):
+        inizio, inizio_cpu = time.perf_counter(), time.thread_time()
+        turno(logger, payload, stampa)
+        cpu.append((time.thread_time() - inizio_cpu) * 1e6)
+        reali.append((time.perf_counter() - inizio) * 1e6)
+        time.sleep(PAUSA_TRA_TURNI)
+    return reali, cpu
+
+
+def riassunto(nome: str, misure):
+    reali, cpu = sorted(misure[0]), misure[1]
+    p99 = reali[int(len(reali) * 0.99) - 1]
+    print(f"{nome:<26}{statistics.mean(cpu):>10.1f}{statistics.median(reali):>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turni", type=int, default=5000)
+    args = parser.parse_args()
+
+    cartella = tempfile.mkdtemp()
+    risultati = {}
+    # La console viene rediretta su file per non misurare il terminale
+    with open(os.path.join(cartella, "console.txt"), "w") as console, \
+            contextlib.redirect_stdout(console), contextlib.redirect_stderr(console):
+        sincrono = logging.getLogger("bench.sincrono")
+        sincrono.propagate = False
+        sincrono.setLevel(logging.INFO)
+        formato = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+        for handler in (logging.FileHandler(os.path.join(cartella, "sincrono.log")), logging.StreamHandler(console)):
+            handler.setFormatter(formato)
+            sincrono.addHandler(handler)
+        risultati["sincrono + print"] = misura(sincrono, args.turni, stampa=True)
+
+        os.environ["LOG_FILE"] = os.path.join(cartella, "coda.log")
+        from utils.logger import setup_logging
+        listener = setup_logging(level="INFO", log_file=os.environ["LOG_FILE"])
+        risultati["coda (INFO)"] = misura(logging.getLogger("bench.coda"), args.turni, stampa=False)
+        logging.getLogger().setLevel(logging.DEBUG)
+        risultati["coda (DEBUG campionato)"] = misura(logging.getLogger("bench.coda"), args.turni, stampa=False)
+        listener.stop()
+
+    # Con una sola CPU il thread di scrittura compete con il chiamante: la colonna CPU misura
+    # il lavoro fatto davvero sul thread della richiesta
+    print(f"{'configurazione':<26}{'CPU µs':>10}{'p50 µs':>10}{'p99 µs':>10}")
+    for nome, tempi in risultati.items():
+        riassunto(nome, tempi)
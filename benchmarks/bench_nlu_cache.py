@@ -0,0 +1,119 @@
+"""Hit rate e CPU risparmiata dalla cache dei parse dell'NLU (nlu_components/) su conversazioni riprodotte.
+
+Riproduce i messaggi utente delle storie (benchmarks/conversazioni.yml e tests/test_stories.yml)
+per N conversazioni, con una parte di variazioni come nel traffico reale: dimensioni diverse
+(--dimensioni-casuali) e maiuscole/spazi diversi (--variazioni).
+
+- Senza modello: hit rate della cache (ParseCache) sulla sequenza di messaggi; i messaggi con
+  dimensioni hanno un'entità, come li restituirebbe DIET.
+- Con --modello (serve rasa installato e un modello addestrato con config.yml): parse di ogni
+  messaggio con l'Agent di Rasa, prima con la cache disattivata e poi attiva; riporta tempo di CPU
+  del processo e latenza per messaggio nei due casi.
+
+Uso: python -m benchmarks.bench_nlu_cache [--conversazioni 1000] [--variazioni 0.2] [--dimensioni-casuali]
+                                          [--maxsize 5000] [--modello models/xxx.tar.gz]
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import time
+from typing import Any, Dict, List
+
+from benchmarks.load_test import STORIE_DEFAULT, carica_storie, percentile
+from nlu_components.cache import ParseCache, get_parse_cache
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+STORIE_TEST = os.path.join(ROOT_DIR, "tests", "test_stories.yml")
+DIMENSIONE = re.compile(r"\d+\s*[x×*]\s*\d+")
+
+
+def messaggi(storie: List[Dict[str, Any]], conversazioni: int, variazioni: float, dimensioni_casuali: bool,
+             seme: int = 0) -> List[str]:
+    """Messaggi utente di `conversazioni` conversazioni prese a turno dalle storie."""
+    casuale = random.Random(seme)
+    testi = []
+    for i in range(conversazioni):
+        for passo in storie[i % len(storie)].get("steps", []):
+            testo = (passo.get("user") or "").strip()
+            if not testo:
+                continue
+            if dimensioni_casuali and DIMENSIONE.search(testo):
+                testo = DIMENSIONE.sub(f"{casuale.randint(40, 300)}x{casuale.randint(40, 300)}", testo)
+            if casuale.random() < variazioni:
+                testo = casuale.choice([testo.upper(), testo.capitalize(), f" {testo}  "])
+            testi.append(testo)
+    return testi
+
+
+def risultato_simulato(testo: str) -> Dict[str, Any]:
+    """Risultato con la forma di quello di DIET: un'entità per le dimensioni."""
+    entita = [
+        {"entity": "dimensione", "start": m.start(), "end": m.end(), "value": m.group(), "extractor": "DIETClassifier"}
+        for m in DIMENSIONE.finditer(testo)
+    ]
+    return {"intent": {"name": "intent", "confidence": 1.0}, "entities": entita}
+
+
+def simula(testi: List[str], maxsize: int) -> Dict[str, Any]:
+    cache = ParseCache(maxsize)
+    cache.usa_modello("modello")
+    for testo in testi:
+        if cache.cerca(testo, "modello") is None:
+            cache.salva(testo, "modello", risultato_simulato(testo))
+    return cache.stats()
+
+
+async def misura_modello(percorso: str, testi: List[str]) -> Dict[str, Dict[str, float]]:
+    """Parse di tutti i messaggi con cache disattivata e attiva: CPU e latenze."""
+    from rasa.core.agent import Agent
+
+    agent = Agent.load(percorso)
+    cache = get_parse_cache()
+    risultati = {}
+    for modo, attiva in (("senza cache", False), ("con cache", True)):
+        cache.attiva = attiva
+        cache.svuota()
+        durate = []
+        cpu = time.process_time()
+        for testo in testi:
+            inizio = time.perf_counter()
+            await agent.parse_message(testo)
+            durate.append(time.perf_counter() - inizio)
+        cpu = time.process_time() - cpu
+        durate.sort()
+        risultati[modo] = {
+            "cpu": cpu,
+            **{f"p{p}": percentile(durate, p) * 1000 for p in (50, 95, 99)},
+            "hit_rate": cache.stats()["hit_rate"] if attiva else 0.0,
+        }
+    return risultati
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--storie", nargs="+", default=[STORIE_DEFAULT, STORIE_TEST])
+    parser.add_argument("--conversazioni", type=int, default=1000)
+    parser.add_argument("--variazioni", type=float, default=0.2, help="frazione di messaggi con maiuscole/spazi diversi")
+    parser.add_argument("--dimensioni-casuali", action="store_true", help="dimensioni diverse per ogni conversazione")
+    parser.add_argument("--maxsize", type=int, default=5000)
+    parser.add_argument("--modello", default=None, help="modello Rasa addestrato (.tar.gz) per misurare la CPU")
+    args = parser.parse_args()
+
+    testi = messaggi(carica_storie(args.storie), args.conversazioni, args.variazioni, args.dimensioni_casuali)
+    stats = simula(testi, args.maxsize)
+    print(f"{len(testi)} messaggi ({len(set(testi))} distinti): hit rate {stats['hit_rate']:.1%}, "
+          f"{stats['size']} voci in cache, {stats['incompatibili']} miss per entità non riportabili, "
+          f"{stats['evictions']} evictions")
+
+    if args.modello:
+        risultati = asyncio.run(misura_modello(args.modello, testi))
+        print(f"\n{'modo':<14}{'CPU s':>8}{'ms/msg':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'hit rate':>10}")
+        for modo, m in risultati.items():
+            print(f"{modo:<14}{m['cpu']:>8.2f}{m['cpu'] / len(testi) * 1000:>9.3f}{m['p50']:>9.2f}{m['p95']:>9.2f}"
+                  f"{m['p99']:>9.2f}{m['hit_rate']:>10.1%}")
+        risparmio = 1 - risultati["con cache"]["cpu"] / risultati["senza cache"]["cpu"]
+        print(f"\nCPU risparmiata: {risparmio:.1%}")
+    else:
+        print("(per la CPU risparmiata: --modello con un modello addestrato con config.yml)")
@@ -0,0 +1,115 @@
+"""Tempo di `rasa train nlu` con la cache delle feature (nlu_components/feature_cache.py) fredda e calda.
+
+Ogni addestramento è un processo `rasa train nlu` separato, con la cache dei componenti di Rasa
+disattivata (RASA_MAX_CACHE_SIZE=0) per misurare solo la cache delle feature, in una cartella
+temporanea. Scenari, nell'ordine:
+- senza cache (NLU_FEATURE_CACHE=false): riferimento;
+- cache fredda: prima esecuzione, tutte le feature calcolate e salvate;
+- cache calda: stessi dati, feature lette dalla cache;
+- con gli esempi del catalogo (nlu_components/training_data.py): solo gli esempi nuovi sono calcolati.
+
+Gli epoch di DIET e ResponseSelector sono ridotti (--epochs) per far pesare la featurizzazione
+come nelle iterazioni di sviluppo; con gli epoch di config.yml il risparmio è lo stesso in secondi.
+
+Serve rasa installato con il modello spaCy di config.yml.
+
+Uso: python -m benchmarks.bench_nlu_training [--epochs 5] [--config config.yml] [--nlu data/nlu.yml]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import yaml
+
+from nlu_components.feature_cache import FeatureCache
+from nlu_components.training_data import genera, scrivi
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CONFIG_DEFAULT = os.path.join(ROOT_DIR, "config.yml")
+NLU_DEFAULT = os.path.join(ROOT_DIR, "data", "nlu.yml")
+
+
+def config_ridotta(config: str, epochs: int, destinazione: str) -> str:
+    """Copia della configurazione con gli epoch ridotti."""
+    with open(config, encoding="utf-8") as f:
+        dati = yaml.safe_load(f)
+    for componente in dati.get("pipeline", []):
+        if "epochs" in componente:
+            componente["epochs"] = epochs
+    dati.pop("policies", None)
+    percorso = os.path.join(destinazione, "config.yml")
+    with open(percorso, "w", encoding="utf-8") as f:
+        yaml.safe_dump(dati, f, allow_unicode=True, sort_keys=False)
+    return percorso
+
+
+def addestra(config: str, nlu: List[str], cartella: str, cache_dir: str, cache_attiva: bool = True) -> float:
+    """Secondi di un `rasa train nlu` con i file `nlu`."""
+    env = dict(
+        os.environ,
+        RASA_MAX_CACHE_SIZE="0",
+        RASA_TELEMETRY_ENABLED="false",
+        NLU_FEATURE_CACHE="true" if cache_attiva else "false",
+        NLU_FEATURE_CACHE_DIR=cache_dir,
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT_DIR, os.getenv("PYTHONPATH")])),
+    )
+    dati = os.path.join(cartella, "nlu")
+    shutil.rmtree(dati, ignore_errors=True)
+    os.makedirs(dati)
+    for i, file in enumerate(nlu):
+        shutil.copy(file, os.path.join(dati, f"{i}_{os.path.basename(file)}"))
+    comando = [sys.executable, "-m", "rasa", "train", "nlu", "--config", config, "--nlu", dati,
+               "--out", os.path.join(cartella, "models"), "--quiet"]
+    inizio = time.perf_counter()
+    esito = subprocess.run(comando, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                           text=True)
+    durata = time.perf_counter() - inizio
+    if esito.returncode != 0:
+        raise RuntimeError(f"rasa train nlu terminato con codice {esito.returncode}:\n{esito.stderr[-2000:]}")
+    return durata
+
+
+def esegui(config: str, nlu: str, epochs: int, cache_dir: Optional[str]) -> Dict[str, float]:
+    risultati = {}
+    with tempfile.TemporaryDirectory(prefix="bench_nlu_training_") as cartella:
+        cache_dir = cache_dir or os.path.join(cartella, "feature_cache")
+        config = config_ridotta(config, epochs, cartella)
+        catalogo = os.path.join(cartella, "nlu_catalogo.yml")
+        scrivi(genera(), catalogo)
+
+        scenari = [
+            ("senza cache", [nlu], False),
+            ("cache fredda", [nlu], True),
+            ("cache calda", [nlu], True),
+            ("calda + catalogo", [nlu, catalogo], True),
+        ]
+        for nome, file, cache_attiva in scenari:
+            risultati[nome] = addestra(config, file, cartella, cache_dir, cache_attiva)
+            print(f"{nome:<18} {risultati[nome]:7.1f} s")
+        occupazione = FeatureCache(cache_dir).occupazione()
+        print(f"cache: {occupazione['voci']} voci, {occupazione['byte'] / 1024:.0f} kB")
+    return risultati
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=CONFIG_DEFAULT)
+    parser.add_argument("--nlu", default=NLU_DEFAULT)
+    parser.add_argument("--epochs", type=int, default=5, help="epoch di DIET e ResponseSelector")
+    parser.add_argument("--cache-dir", default=None, help="cartella della cache (default: temporanea)")
+    args = parser.parse_args()
+
+    try:
+        import rasa  # noqa: F401
+    except ImportError:
+        sys.exit("rasa non è installato: il benchmark addestra modelli veri")
+
+    risultati = esegui(args.config, args.nlu, args.epochs, args.cache_dir)
+    riferimento = risultati["senza cache"]
+    for nome in ("cache fredda", "cache calda", "calda + catalogo"):
+        print(f"{nome:<18} {risultati[nome] / riferimento:6.0%} del tempo senza cache")
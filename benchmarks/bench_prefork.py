@@ -0,0 +1,185 @@
+"""Throughput del server delle azioni multiprocesso (utils/prefork.py) al crescere dei worker.
+
+Per ogni numero di worker avvia `python -m utils.prefork` contro il backend di prova
+(benchmarks/stub_backend.py, in un processo separato) e lo carica via HTTP con le conversazioni di
+benchmarks/conversazioni.yml, inviate come richieste al webhook /webhook come farebbe Rasa.
+I client girano in più processi (--client), ognuno con il proprio event loop, per non essere
+loro il collo di bottiglia. Riporta richieste/s e percentili p50/p95/p99 della latenza.
+
+La scalabilità dipende dalle CPU disponibili: con una sola CPU i worker si contendono lo stesso
+core e il throughput non può crescere.
+
+Uso: python -m benchmarks.bench_prefork [--worker 1 2 4] [--conversazioni 400] [--concorrenza 32]
+                                        [--client 2] [--latenza 0.0]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.load_test import STORIE_DEFAULT, Conversazione, carica_domain, carica_storie, percentile
+from utils.prefork import cpu_disponibili
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+AZIONI_SERVER = ("action_", "validate_")  # gli altri passi (utter_*, form) li gestisce Rasa
+ATTESA_AVVIO = 60.0
+
+Misura = Tuple[float, bool]  # durata (s), errore
+
+
+def porta_libera() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def attendi(url: str, processo: subprocess.Popen, timeout: float = ATTESA_AVVIO):
+    """Attende che il server di `url` risponda; errore se il processo termina prima."""
+    scadenza = time.monotonic() + timeout
+    while time.monotonic() < scadenza:
+        if processo.poll() is not None:
+            raise RuntimeError(f"{processo.args} terminato con stato {processo.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except urllib.error.HTTPError:
+            return  # risponde, anche se con un errore
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} non risponde dopo {timeout:.0f}s")
+
+
+def _payload(conversazione: Conversazione, azione: str, domain: Dict[str, Any]) -> Dict[str, Any]:
+    """Richiesta al webhook come la invia Rasa (tracker serializzato e domain)."""
+    tracker = conversazione.tracker()
+    return {
+        "next_action": azione,
+        "sender_id": conversazione.sender_id,
+        "tracker": tracker.current_state(),
+        "domain": domain,
+        "version": "3.6.0",
+    }
+
+
+async def _client(url: str, storie, domain, indici: List[int], concorrenza: int) -> List[Misura]:
+    import aiohttp
+
+    misure: List[Misura] = []
+    coda = iter(indici)
+
+    async def utente_virtuale(sessione):
+        for i in coda:
+            storia = storie[i % len(storie)]
+            conversazione = Conversazione(f"utente-{i}", domain)
+            for passo in storia.get("steps", []):
+                if "intent" in passo or "user" in passo:
+                    conversazione.utente(passo.get("user") or "", passo.get("intent"))
+                for slot in passo.get("slot_was_set", []):
+                    nome, valore = next(iter(slot.items())) if isinstance(slot, dict) else (slot, None)
+                    conversazione.candidati[nome] = valore
+                azione = passo.get("action")
+                if not azione or not azione.startswith(AZIONI_SERVER):
+                    continue
+                inizio = time.perf_counter()
+                try:
+                    async with sessione.post(url, json=_payload(conversazione, azione, domain)) as risposta:
+                        corpo = await risposta.json(content_type=None)
+                        errore = risposta.status != 200
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    corpo, errore = {}, True
+                misure.append((time.perf_counter() - inizio, errore))
+                conversazione.applica((corpo or {}).get("events", []) if not errore else [])
+
+    connettore = aiohttp.TCPConnector(limit=concorrenza)
+    async with aiohttp.ClientSession(connector=connettore) as sessione:
+        await asyncio.gather(*(utente_virtuale(sessione) for _ in range(concorrenza)))
+    return misure
+
+
+def esegui_client(url: str, percorsi_storie: List[str], indici: List[int], concorrenza: int) -> List[Misura]:
+    """Processo client: riproduce le conversazioni `indici` con `concorrenza` utenti virtuali."""
+    storie = carica_storie(percorsi_storie)
+    return asyncio.run(_client(url, storie, carica_domain(storie), indici, concorrenza))
+
+
+def misura(worker: int, api_url: str, args) -> Dict[str, float]:
+    """Avvia il server con `worker` processi, lo carica e restituisce throughput e latenze."""
+    porta = porta_libera()
+    env = {
+        **os.environ, "PYTHONPATH": ROOT_DIR, "API_URL": api_url, "ACTION_WORKERS": str(worker),
+        "LOG_LEVEL": "WARNING", "LOG_FILE": "", "METRICS_ENABLED": "false", "ACTION_WARMUP": "true",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "utils.prefork", "--port", str(porta), "--host", "127.0.0.1"],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        attendi(f"http://127.0.0.1:{porta}/health", server)
+        url = f"http://127.0.0.1:{porta}/webhook"
+        # Giro di riscaldamento, escluso dalle misure: connessioni e cache dei worker
+        esegui_client(url, args.storie, list(range(worker * 4)), worker * 2)
+
+        blocchi = [list(range(c, args.conversazioni, args.client)) for c in range(args.client)]
+        concorrenza = max(1, args.concorrenza // args.client)
+        inizio = time.perf_counter()
+        with ProcessPoolExecutor(args.client) as pool:
+            risultati = list(pool.map(esegui_client, [url] * args.client, [args.storie] * args.client, blocchi,
+                                      [concorrenza] * args.client))
+        durata = time.perf_counter() - inizio
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    misure = [m for r in risultati for m in r]
+    ordinate = sorted(d for d, _ in misure)
+    return {
+        "richieste": len(misure),
+        "errori": sum(e for _, e in misure),
+        "rps": len(misure) / durata,
+        **{f"p{p}": percentile(ordinate, p) * 1000 for p in (50, 95, 99)},
+    }
+
+
+def stampa(risultati: Dict[int, Dict[str, float]]):
+    base = next(iter(risultati.values()))["rps"]
+    print(f"{'worker':>6}{'richieste':>11}{'errori':>8}{'rich/s':>10}{'scala':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for worker, m in risultati.items():
+        print(f"{worker:>6}{m['richieste']:>11}{m['errori']:>8}{m['rps']:>10.1f}{m['rps'] / base:>6.2f}x"
+              f"{m['p50']:>9.2f}{m['p95']:>9.2f}{m['p99']:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker", type=int, nargs="+", default=None, help="default 1, 2, 4… fino alle CPU")
+    parser.add_argument("--storie", nargs="+", default=[STORIE_DEFAULT])
+    parser.add_argument("--conversazioni", type=int, default=400)
+    parser.add_argument("--concorrenza", type=int, default=32, help="utenti virtuali in totale")
+    parser.add_argument("--client", type=int, default=2, help="processi client")
+    parser.add_argument("--latenza", type=float, default=0.0, help="latenza del backend di prova (secondi)")
+    args = parser.parse_args()
+
+    cpu = cpu_disponibili()
+    worker = args.worker or sorted({min(2 ** k, cpu) for k in range(cpu.bit_length() + 1)})
+    print(f"CPU disponibili: {cpu}" + ("  ⚠️ con una sola CPU il throughput non può scalare" if cpu == 1 else ""))
+
+    porta_backend = porta_libera()
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_backend", "--port", str(porta_backend), "--latenza", str(args.latenza)],
+        cwd=ROOT_DIR, env={**os.environ, "PYTHONPATH": ROOT_DIR}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        api_url = f"http://127.0.0.1:{porta_backend}"
+        attendi(f"{api_url}/motori", backend)
+        risultati = {n: misura(n, api_url, args) for n in worker}
+    finally:
+        backend.terminate()
+        backend.wait()
+    stampa(risultati)
@@ -0,0 +1,70 @@
+"""Confronto tra i backend di estrazione dello scraper sulle pagine salvate in scraper/fixtures.
+
+Per ogni backend misura le pagine elaborate al secondo e il picco di memoria (tracemalloc).
+
+Uso: python -m benchmarks.bench_scraper_parsing [--ripetizioni 200] [--pagine file.html ...]
+"""
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+from scraper import config
+from scraper.extraction import BACKENDS, REGOLE_PAGINA, SoupExtractor, lxml_html
+
+FIXTURES_DIR = os.path.join(config.ROOT_DIR, "scraper", "fixtures")
+
+
+def carica_pagine(percorsi=None):
+    """Legge le pagine HTML da confrontare (di default tutte quelle delle fixture)."""
+    percorsi = percorsi or sorted(glob.glob(os.path.join(FIXTURES_DIR, "**", "*.html"), recursive=True))
+    pagine = []
+    for percorso in percorsi:
+        with open(percorso, encoding="utf-8") as f:
+            pagine.append(f.read())
+    return pagine
+
+
+def estrattori():
+    """Backend disponibili in questo ambiente; il primo (BeautifulSoup con html.parser) è il riferimento."""
+    risultati = [SoupExtractor("html.parser"), BACKENDS["streaming"]()]
+    if lxml_html is not None:
+        risultati += [SoupExtractor("lxml"), BACKENDS["lxml"]()]
+    return risultati
+
+
+def misura(estrattore, pagine, ripetizioni: int):
+    """Restituisce pagine/s e picco di memoria (KiB) per una singola pagina alla volta."""
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        for html in pagine:
+            estrattore.estrai(html, REGOLE_PAGINA)
+    durata = time.perf_counter() - inizio
+
+    # Memoria misurata a parte: tracemalloc rallenta molto l'esecuzione
+    picco = 0
+    for html in pagine:
+        tracemalloc.start()
+        estrattore.estrai(html, REGOLE_PAGINA)
+        picco = max(picco, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return ripetizioni * len(pagine) / durata, picco / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ripetizioni", type=int, default=200, help="passaggi sull'insieme delle pagine")
+    parser.add_argument("--pagine", nargs="*", help="file HTML da usare al posto delle fixture")
+    args = parser.parse_args()
+
+    pagine = carica_pagine(args.pagine)
+    riferimento = None
+    print(f"{len(pagine)} pagine, {sum(len(p) for p in pagine) / 1024:.0f} KiB")
+    print(f"{'backend':<22}{'pagine/s':>12}{'picco (KiB)':>14}{'speedup':>10}")
+    for estrattore in estrattori():
+        pagine_s, picco = misura(estrattore, pagine, args.ripetizioni)
+        riferimento = riferimento or pagine_s
+        print(f"{estrattore.nome:<22}{pagine_s:>12.0f}{picco:>14.0f}{pagine_s / riferimento:>10.1f}x")
+    if lxml_html is None:
+        print("lxml non installato: backend lxml saltato")
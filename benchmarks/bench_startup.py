@@ -0,0 +1,87 @@
+"""Costo di avvio del server delle azioni: profilo degli import e durata del riscaldamento.
+
+Ogni misura usa un interprete nuovo (`python -X importtime`), come un pod appena avviato.
+Riporta il tempo di import del package delle azioni, i moduli che pesano di più e quali
+dipendenze pesanti vengono caricate all'import invece che al primo utilizzo; poi i tempi delle
+fasi di utils/avvio.py (riscaldamento prima che il server risulti pronto).
+
+Uso: python -m benchmarks.bench_startup [--ripetizioni 5] [--top 12]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Tuple
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+IMPORT_AZIONI = "import actions.actions, actions.motori_actions, actions.tapparelle_actions"
+# Dipendenze che le azioni caricano solo al primo utilizzo (o nel riscaldamento)
+IMPORT_DIFFERITI = ("numpy", "aiohttp", "requests", "utils.async_api_service", "utils.api_service")
+
+Profilo = Dict[str, Tuple[int, int, int]]  # modulo → (self µs, cumulativo µs, profondità)
+
+
+def _ambiente() -> Dict[str, str]:
+    return {**os.environ, "ACTION_WARMUP": "false", "LOG_FILE": "", "LOG_LEVEL": "WARNING", "PYTHONPATH": ROOT_DIR}
+
+
+def profilo_import(codice: str = IMPORT_AZIONI) -> Tuple[float, Profilo]:
+    """Esegue `codice` in un interprete nuovo. Restituisce il tempo totale (s) e il profilo degli import."""
+    inizio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codice],
+        cwd=ROOT_DIR, env=_ambiente(), capture_output=True, text=True, check=True,
+    )
+    durata = time.perf_counter() - inizio
+    profilo: Profilo = {}
+    for riga in processo.stderr.splitlines():
+        if not riga.startswith("import time:") or "self [us]" in riga:
+            continue
+        proprio, cumulativo, nome = riga[len("import time:"):].split("|")
+        profondita = (len(nome) - len(nome.lstrip()) - 1) // 2
+        profilo[nome.strip()] = (int(proprio), int(cumulativo), profondita)
+    return durata, profilo
+
+
+def riassunto_import(ripetizioni: int, top: int):
+    durate, totali, profili = [], [], []
+    base, _ = profilo_import("pass")  # avvio dell'interprete, da sottrarre
+    for _ in range(ripetizioni):
+        durata, profilo = profilo_import()
+        durate.append(durata - base)
+        totali.append(sum(c for _, c, p in profilo.values() if p == 0) / 1e6)
+        profili.append(profilo)
+
+    print(f"import del package delle azioni: {statistics.median(totali) * 1000:.1f} ms "
+          f"(processo: {statistics.median(durate) * 1000:.1f} ms oltre all'avvio dell'interprete)\n")
+
+    # Mediana del tempo cumulativo per modulo sulle ripetizioni
+    moduli = set().union(*profili)
+    mediane = {m: statistics.median(p[m][1] for p in profili if m in p) for m in moduli}
+    print(f"{'modulo':<44}{'cumulativo ms':>14}")
+    primi = [m for m in moduli if profili[0].get(m, (0, 0, 1))[2] <= 1 or m.startswith(("utils", "actions"))]
+    for modulo in sorted(primi, key=mediane.get, reverse=True)[:top]:
+        print(f"{modulo:<44}{mediane[modulo] / 1000:>14.1f}")
+
+    caricati = [m for m in IMPORT_DIFFERITI if m in profili[0]]
+    print("\ndipendenze differite caricate all'import:", ", ".join(caricati) if caricati else "nessuna ✅")
+
+
+def riassunto_riscaldamento():
+    processo = subprocess.run(
+        [sys.executable, "-m", "utils.avvio"], cwd=ROOT_DIR, env=_ambiente(), capture_output=True, text=True, check=True
+    )
+    print("\nriscaldamento (utils/avvio.py, interprete nuovo):")
+    print(processo.stdout.rstrip())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="numero di moduli da mostrare")
+    args = parser.parse_args()
+
+    riassunto_import(args.ripetizioni, args.top)
+    riassunto_riscaldamento()
@@ -0,0 +1,241 @@
+"""Test di carico del server delle azioni: quante conversazioni di preventivo regge un processo.
+
+Riproduce le conversazioni scritte nel formato delle storie di test (benchmarks/conversazioni.yml)
+direttamente contro le classi delle azioni, con N conversazioni in parallelo sullo stesso event loop
+come nel server di rasa_sdk. Il backend è sostituito da benchmarks/stub_backend.py, con latenza ed
+errori configurabili. Riporta throughput e percentili p50/p95/p99 della durata di ogni azione.
+
+Uso: python -m benchmarks.load_test [--conversazioni 500] [--concorrenza 50] [--latenza 0.02]
+                                    [--jitter 0.02] [--errori 0.0] [--senza-cache] [--dimensioni-casuali]
+"""
+import argparse
+import asyncio
+import importlib
+import inspect
+import os
+import random
+import time
+from typing import Dict, Any, List, Optional
+
+import yaml
+
+from benchmarks.stub_backend import StubBackend
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+STORIE_DEFAULT = os.path.join(os.path.dirname(__file__), "conversazioni.yml")
+DOMAIN_FILE = os.path.join(ROOT_DIR, "domain.yml")
+MODULI_AZIONI = ("actions.actions", "actions.motori_actions", "actions.tapparelle_actions")
+
+
+def carica_storie(percorsi: List[str]) -> List[Dict[str, Any]]:
+    """Storie (chiave `stories`) di uno o più file YAML."""
+    storie = []
+    for percorso in percorsi:
+        with open(percorso, encoding="utf-8") as f:
+            storie.extend((yaml.safe_load(f) or {}).get("stories", []))
+    return storie
+
+
+def registro_azioni() -> Dict[str, Any]:
+    """Istanze delle azioni definite nei moduli del server, per nome."""
+    from rasa_sdk import Action
+
+    registro = {}
+    for nome_modulo in MODULI_AZIONI:
+        modulo = importlib.import_module(nome_modulo)
+        for oggetto in vars(modulo).values():
+            if inspect.isclass(oggetto) and issubclass(oggetto, Action) and oggetto.__module__ == modulo.__name__:
+                azione = oggetto()
+                registro[azione.name()] = azione
+    return registro
+
+
+def carica_domain(storie: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """domain.yml, completato con gli slot e i form usati nelle storie ma non ancora dichiarati.
+
+    I validatori dei form controllano solo gli slot richiesti dal form: per i form assenti dal
+    domain si usano come `required_slots` gli slot impostati nelle storie che li validano.
+    """
+    with open(DOMAIN_FILE, encoding="utf-8") as f:
+        domain = yaml.safe_load(f) or {}
+    slots = domain.setdefault("slots", {})
+    forms = domain.setdefault("forms", {})
+    dichiarati = set(forms)
+    for storia in storie:
+        impostati: List[str] = []
+        for passo in storia.get("steps", []):
+            for slot in passo.get("slot_was_set", []):
+                nome = next(iter(slot)) if isinstance(slot, dict) else slot
+                slots.setdefault(nome, {"type": "any", "mappings": []})
+                impostati.append(nome)
+            azione = passo.get("action") or ""
+            nome_form = azione[len("validate_"):]
+            if azione.startswith("validate_") and azione.endswith("_form") and nome_form not in dichiarati:
+                form = forms.setdefault(nome_form, {"required_slots": []})
+                form["required_slots"] = list(dict.fromkeys(form["required_slots"] + impostati))
+    return domain
+
+
+class Conversazione:
+    """Stato di una conversazione (slot, ultimo messaggio, slot candidati) come lo vedrebbe il tracker."""
+
+    def __init__(self, sender_id: str, domain: Dict[str, Any]):
+        self.sender_id = sender_id
+        self.slots: Dict[str, Any] = {nome: None for nome in domain.get("slots", {})}
+        self.messaggio: Dict[str, Any] = {"intent": {}, "entities": [], "text": ""}
+        self.candidati: Dict[str, Any] = {}  # slot estratti al turno corrente, da validare
+
+    def utente(self, testo: str, intent: Optional[str]):
+        self.messaggio = {"intent": {"name": intent, "confidence": 1.0}, "entities": [], "text": testo.strip()}
+        self.candidati = {}
+
+    def tracker(self):
+        from rasa_sdk import Tracker
+
+        eventi = [{"event": "user", "text": self.messaggio["text"], "parse_data": self.messaggio}]
+        eventi += [{"event": "slot", "name": nome, "value": valore} for nome, valore in self.candidati.items()]
+        return Tracker(
+            self.sender_id, {**self.slots, **self.candidati}, self.messaggio, eventi, False, None, None, "action_listen"
+        )
+
+    def applica(self, eventi: List[Dict[str, Any]]):
+        for evento in eventi or []:
+            if evento.get("event") == "slot":
+                self.slots[evento["name"]] = evento.get("value")
+            elif evento.get("event") == "reset_slots":
+                self.slots = {nome: None for nome in self.slots}
+        self.candidati = {}
+
+
+class Statistiche:
+    """Durate (s) ed errori per azione, più il numero di conversazioni completate."""
+
+    def __init__(self):
+        self.durate: Dict[str, List[float]] = {}
+        self.errori: Dict[str, int] = {}
+        self.conversazioni = 0
+
+    def registra(self, azione: str, durata: float, errore: bool):
+        self.durate.setdefault(azione, []).append(durata)
+        if errore:
+            self.errori[azione] = self.errori.get(azione, 0) + 1
+
+
+def percentile(ordinati: List[float], p: float) -> float:
+    """Percentile con il metodo nearest-rank su valori già ordinati."""
+    indice = max(0, min(len(ordinati) - 1, int(round(p / 100 * len(ordinati) + 0.5)) - 1))
+    return ordinati[indice]
+
+
+async def riproduci(storia: Dict[str, Any], conversazione: Conversazione, registro, domain, stats: Statistiche,
+                    dimensioni_casuali: bool = False):
+    """Esegue i passi di una storia, cronometrando ogni azione del server."""
+    from rasa_sdk.executor import CollectingDispatcher
+
+    for passo in storia.get("steps", []):
+        if "intent" in passo or "user" in passo:
+            conversazione.utente(passo.get("user") or "", passo.get("intent"))
+        if "slot_was_set" in passo:
+            for slot in passo["slot_was_set"]:
+                nome, valore = next(iter(slot.items())) if isinstance(slot, dict) else (slot, None)
+                if nome == "dimensione" and dimensioni_casuali:
+                    # Dimensioni diverse per ogni conversazione: niente preventivi già in cache
+                    valore = f"{random.randint(40, 300)}x{random.randint(40, 300)}"
+                conversazione.candidati[nome] = valore
+        nome_azione = passo.get("action")
+        azione = registro.get(nome_azione) if nome_azione else None
+        if azione is None:
+            continue  # utter_*, form e action_listen li gestisce Rasa
+
+        inizio = time.perf_counter()
+        errore = False
+        try:
+            eventi = await azione.run(CollectingDispatcher(), conversazione.tracker(), domain)
+        except Exception as e:
+            errore, eventi = True, []
+            if stats.errori.get(nome_azione, 0) == 0:
+                print(f"⚠️ {nome_azione}: {e!r}")  # solo il primo errore per azione
+        stats.registra(nome_azione, time.perf_counter() - inizio, errore)
+        conversazione.applica(eventi)
+    stats.conversazioni += 1
+
+
+async def carico(storie, registro, domain, conversazioni: int, concorrenza: int, dimensioni_casuali: bool) -> Statistiche:
+    """Esegue `conversazioni` conversazioni con al massimo `concorrenza` in corso contemporaneamente."""
+    stats = Statistiche()
+    contatore = iter(range(conversazioni))
+
+    async def utente_virtuale():
+        for i in contatore:
+            storia = storie[i % len(storie)]
+            await riproduci(storia, Conversazione(f"utente-{i}", domain), registro, domain, stats, dimensioni_casuali)
+
+    await asyncio.gather(*(utente_virtuale() for _ in range(concorrenza)))
+    from utils.async_api_service import get_async_api_service
+    await get_async_api_service().close()
+    return stats
+
+
+def stampa_rapporto(stats: Statistiche, durata: float):
+    print(f"{'azione':<40}{'chiamate':>9}{'errori':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    azioni = 0
+    for nome, durate in sorted(stats.durate.items()):
+        ordinate = sorted(durate)
+        azioni += len(ordinate)
+        p50, p95, p99 = (percentile(ordinate, p) * 1000 for p in (50, 95, 99))
+        print(f"{nome:<40}{len(ordinate):>9}{stats.errori.get(nome, 0):>8}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
+    print(f"\n{stats.conversazioni} conversazioni, {azioni} azioni in {durata:.2f}s: "
+          f"{stats.conversazioni / durata:.1f} conversazioni/s, {azioni / durata:.1f} azioni/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--storie", nargs="+", default=[STORIE_DEFAULT], help="file YAML con le storie da riprodurre")
+    parser.add_argument("--conversazioni", type=int, default=500)
+    parser.add_argument("--concorrenza", type=int, default=50, help="conversazioni in corso contemporaneamente")
+    parser.add_argument("--latenza", type=float, default=0.02, help="latenza del backend (secondi)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="latenza aggiuntiva casuale massima (secondi)")
+    parser.add_argument("--errori", type=float, default=0.0, help="frazione di richieste al backend che falliscono (503)")
+    parser.add_argument("--senza-cache", action="store_true", help="disattiva cache delle risposte e dei preventivi")
+    parser.add_argument("--dimensioni-casuali", action="store_true", help="dimensioni diverse per ogni conversazione")
+    parser.add_argument("--senza-riscaldamento", action="store_true",
+                        help="misura anche il primo giro (caricamento di catalogo e indici nel percorso delle richieste)")
+    parser.add_argument("--log-level", default="CRITICAL")
+    args = parser.parse_args()
+
+    with StubBackend(latenza=args.latenza, jitter=args.jitter, tasso_errori=args.errori) as backend:
+        # Configurazione prima di importare le azioni: i servizi leggono l'ambiente alla creazione
+        os.environ["API_URL"] = backend.url
+        os.environ.setdefault("LOG_FILE", "")
+        os.environ.setdefault("LOG_LEVEL", args.log_level)
+        if args.senza_cache:
+            os.environ["QUOTE_CACHE_TTL"] = "0"
+            for endpoint in ("PRODOTTI", "MOTORI", "VARIANTI", "COLORI_TAPPARELLE"):
+                os.environ[f"API_CACHE_TTL_{endpoint}"] = "0"
+
+        storie = carica_storie(args.storie)
+        registro = registro_azioni()
+        domain = carica_domain(storie)
+        if not any(passo.get("action") in registro for storia in storie for passo in storia.get("steps", [])):
+            parser.error("nessuna azione del server nelle storie indicate")
+
+        if not args.senza_riscaldamento:
+            # Un giro di ogni storia fuori dalla misura: catalogo, indici e classificatori vengono
+            # costruiti al primo uso e bloccherebbero l'event loop nelle prime conversazioni
+            asyncio.run(carico(storie, registro, domain, len(storie), 1, args.dimensioni_casuali))
+            # Le cache invece partono vuote, come dopo un riavvio
+            from utils.cache import get_response_cache
+            from utils.quote_cache import get_quote_cache
+            get_response_cache().invalidate()
+            get_quote_cache().invalidate()
+            backend.richieste = 0
+
+        inizio = time.perf_counter()
+        stats = asyncio.run(carico(storie, registro, domain, args.conversazioni, args.concorrenza, args.dimensioni_casuali))
+        durata = time.perf_counter() - inizio
+        from utils.async_api_service import get_async_api_service
+        pool = get_async_api_service().pool_stats()
+        print(f"backend: latenza {args.latenza * 1000:.0f}ms (+{args.jitter * 1000:.0f}ms), errori {args.errori:.0%}, "
+              f"{backend.richieste} richieste; concorrenza {args.concorrenza}; "
+              f"pool {pool['pool_maxsize']} connessioni ({pool['pool_per_host']} per host)\n")
+        stampa_rapporto(stats, durata)
@@ -0,0 +1,226 @@
+"""Backend locale che sostituisce l'API dei prodotti, servendo i dati di dataset/prodotti_per_categoria.
+
+Endpoint: GET `prodotti`, `motori`, `varianti`, `colori_tapparelle`; POST `prodotti/bulk`, `configura_tapparella`.
+
+Uso: python -m benchmarks.stub_backend --port 8000 [--no-bulk] [--latenza 0.2] [--jitter 0.1] [--errori 0.3]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from scraper.config import COLORI_FILE
+from utils.calculation import codice_materiale
+from utils.catalog import Catalog, DATASET_DIR
+from utils.colori import leggi_file_colori
+
+# Colori per materiale usati se manca dataset/colori_tapparelle.json (prodotto dallo scraper)
+COLORI_DEFAULT = {
+    "pvc": ["bianco", "avorio", "grigio chiaro", "marrone"],
+    "alluminio": ["bianco", "avorio", "grigio antracite", "verde", "marrone", "effetto legno"],
+    "alluminio coibentato": ["bianco", "avorio", "grigio argento", "grigio antracite", "verde", "marrone", "noce"],
+    "acciaio": ["bianco", "grigio antracite", "marrone"],
+}
+
+# Prezzo al metro quadro della tapparella per materiale (€), minimo fatturabile 1.5 m²
+PREZZO_MQ = {
+    "pvc": 32.0,
+    "pvc_rinforzato": 38.0,
+    "alluminio": 55.0,
+    "alluminio_coibentato": 65.0,
+    "alluminio_estruso": 90.0,
+    "acciaio": 110.0,
+    "acciaio_blindato": 150.0,
+}
+MQ_MINIMI = 1.5
+
+
+def carica_colori(percorso: str = COLORI_FILE) -> Dict[str, List[str]]:
+    """Colori per materiale: quelli dello scraper se disponibili, altrimenti la tabella di default."""
+    colori = {materiale: list(lista) for materiale, lista in COLORI_DEFAULT.items()}
+    colori.update(leggi_file_colori(percorso))
+    return colori
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 256  # il default (5) fa scartare le connessioni sotto carico
+    daemon_threads = True
+
+
+class StubBackend:
+    """Server HTTP di prova con gli endpoint usati dalle azioni, da avviare nei test e nei benchmark."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        bulk: bool = True,
+        dataset_dir: str = DATASET_DIR,
+        latenza: float = 0.0,
+        tasso_errori: float = 0.0,
+        jitter: float = 0.0,
+    ):
+        self.catalogo = Catalog(dataset_dir=dataset_dir)
+        self.prodotti = {c: self.catalogo.risposta_api("prodotti", {"categoria": c}) for c in self.catalogo.categorie()}
+        self.colori = carica_colori()
+        self.bulk = bulk  # False per simulare un backend senza endpoint bulk
+        # Iniezione di guasti, modificabili anche a server avviato
+        self.latenza = latenza  # secondi di attesa prima di ogni risposta
+        self.jitter = jitter  # attesa aggiuntiva casuale, da 0 a `jitter` secondi
+        self.tasso_errori = tasso_errori  # frazione di richieste che ricevono un 503
+        self.richieste = 0
+        self._server = _Server((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def cerca(self, categoria: Optional[str], nome_prodotto: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Cerca per categoria e nome (prima corrispondenza esatta, poi per sottostringa)."""
+        if categoria:
+            candidati = self.prodotti.get(categoria, [])
+        else:
+            candidati = [p for lista in self.prodotti.values() for p in lista]
+        if not nome_prodotto:
+            return candidati
+        nome = nome_prodotto.strip().lower()
+        esatti = [p for p in candidati if p["nome_prodotto"].lower() == nome]
+        return esatti or [p for p in candidati if nome in p["nome_prodotto"].lower()]
+
+    def colori_materiale(self, materiale: Optional[str]) -> List[str]:
+        materiale = (materiale or "").strip().lower().replace("_", " ")
+        return self.colori.get(materiale, [])
+
+    def configura_tapparella(self, richiesta: Dict[str, Any]) -> Dict[str, Any]:
+        """Preventivo della tapparella: superficie × prezzo al m² del materiale, più gli accessori."""
+        codice = codice_materiale(richiesta.get("materiale"))
+        if codice not in PREZZO_MQ:
+            return {"errore": f"Materiale non disponibile: {richiesta.get('materiale')}"}
+        try:
+            larghezza, altezza = int(richiesta["larghezza"]), int(richiesta["altezza"])
+        except (KeyError, TypeError, ValueError):
+            return {"errore": "Dimensioni non valide"}
+        colore = str(richiesta.get("colore") or "").strip().lower()
+        ammessi = self.colori_materiale(codice)
+        if ammessi and colore not in ammessi:
+            return {"errore": f"Colore {colore} non disponibile per {codice.replace('_', ' ')}"}
+
+        prezzo = max(larghezza * altezza / 10000, MQ_MINIMI) * PREZZO_MQ[codice]
+        accessori = []
+        for nome in richiesta.get("accessori") or []:
+            trovati = self.cerca("accessori", nome)
+            if trovati:
+                accessori.append(trovati[0])
+                prezzo += float(trovati[0]["prezzo_prodotto"])
+        return {"preventivo": {
+            "dimensioni": f"{larghezza}x{altezza} cm",
+            "materiale": codice,
+            "colore": colore,
+            "accessori": accessori,
+            "prezzo_totale": round(prezzo, 2),
+        }}
+
+    def _handler_class(self):
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _rispondi(self, status: int, corpo: Any):
+                dati = json.dumps(corpo).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dati)))
+                self.end_headers()
+                self.wfile.write(dati)
+
+            def _guasto(self) -> bool:
+                """Applica latenza ed errori simulati; True se la richiesta ha già ricevuto un 503."""
+                attesa = backend.latenza + (random.uniform(0, backend.jitter) if backend.jitter else 0)
+                if attesa:
+                    time.sleep(attesa)
+                if backend.tasso_errori and random.random() < backend.tasso_errori:
+                    self._rispondi(503, {"errore": "servizio non disponibile (simulato)"})
+                    return True
+                return False
+
+            def do_GET(self):
+                backend.richieste += 1
+                if self._guasto():
+                    return
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path == "/prodotti":
+                    self._rispondi(200, backend.cerca(query.get("categoria"), query.get("nome_prodotto")))
+                elif url.path == "/motori":
+                    self._rispondi(200, backend.catalogo.risposta_api("motori", query))
+                elif url.path == "/varianti":
+                    # Tutti i colori ammessi per le tapparelle, senza distinzione di materiale
+                    colori = dict.fromkeys(c for lista in backend.colori.values() for c in lista)
+                    self._rispondi(200, {"data": [{"name": colore} for colore in colori]})
+                elif url.path == "/colori_tapparelle":
+                    colori = backend.colori_materiale(query.get("materiale"))
+                    self._rispondi(200, {"data": [{"color": colore, "materiale": query.get("materiale")} for colore in colori]})
+                else:
+                    self._rispondi(404, {"errore": "endpoint non trovato"})
+
+            def do_POST(self):
+                backend.richieste += 1
+                lunghezza = int(self.headers.get("Content-Length", 0))
+                corpo = json.loads(self.rfile.read(lunghezza) or b"{}")
+                if self._guasto():
+                    return
+                if self.path == "/prodotti/bulk" and backend.bulk:
+                    risultati = []
+                    for richiesta in corpo.get("richieste", []):
+                        trovati = backend.cerca(richiesta.get("categoria"), richiesta.get("nome_prodotto"))
+                        risultati.append({**richiesta, "prodotto": trovati[0] if trovati else None})
+                    self._rispondi(200, {"risultati": risultati})
+                elif self.path == "/configura_tapparella":
+                    self._rispondi(200, backend.configura_tapparella(corpo))
+                else:
+                    self._rispondi(404, {"errore": "endpoint non trovato"})
+
+            def log_message(self, format, *args):
+                pass  # niente log per ogni richiesta
+
+        return Handler
+
+    def start(self) -> "StubBackend":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend prodotti locale per test e benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-bulk", action="store_true", help="disabilita l'endpoint prodotti/bulk")
+    parser.add_argument("--latenza", type=float, default=0.0, help="secondi di attesa prima di ogni risposta")
+    parser.add_argument("--jitter", type=float, default=0.0, help="attesa aggiuntiva casuale massima (secondi)")
+    parser.add_argument("--errori", type=float, default=0.0, help="frazione di richieste che ricevono un 503")
+    args = parser.parse_args()
+
+    backend = StubBackend(
+        args.host, args.port, bulk=not args.no_bulk, latenza=args.latenza, tasso_errori=args.errori, jitter=args.jitter
+    )
+    print(f"Backend di prova in ascolto su {backend.url}")
+    try:
+        backend._server.serve_forever()
+    except KeyboardInterrupt:
+        backend.stop()
@@ -0,0 +1,149 @@
+"""Cache dei risultati dell'NLU (intent, ranking, entità) per testo normalizzato e modello.
+
+Il traffico è dominato da messaggi brevi e ripetuti (payload dei pulsanti, "sì", "120x100",
+"PVC", nomi di colori): per questi il risultato di spaCy + DIET è sempre lo stesso finché il
+modello non cambia. La chiave è il testo con spazi compattati e in minuscolo; ogni voce vale solo
+per il modello (model_id di Rasa) con cui è stata calcolata: al cambio di modello la cache si svuota.
+
+Le entità hanno posizioni e valori presi dal testo: un risultato con entità viene riusato solo
+se il testo differisce al più per maiuscole/minuscole (stesse posizioni), riportando i valori
+sul testo nuovo; altrimenti conta come miss e viene ricalcolato.
+
+Il modulo non dipende da Rasa: i componenti della pipeline sono in nlu_components/parse_cache.py.
+"""
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Proprietà del messaggio prodotte dalla pipeline e restituite nel parse
+CAMPI_RISULTATO = ("intent", "intent_ranking", "entities", "response_selector")
+MAXSIZE_DEFAULT = 5000
+# Proprietà interna del messaggio (non restituita nel parse): impronta del modello e esito della ricerca
+STATO_CACHE = "parse_cache"
+
+
+def chiave_testo(testo: str) -> str:
+    """Testo normalizzato: spazi compattati e minuscole."""
+    return " ".join(testo.split()).lower()
+
+
+def da_cache(message) -> bool:
+    """Indica se il messaggio di Rasa è stato risolto dalla cache (niente da calcolare)."""
+    return (message.get(STATO_CACHE) or {}).get("hit", False)
+
+
+def _entita_sul_testo(risultato: Dict[str, Any], testo_salvato: str, testo: str) -> Optional[Dict[str, Any]]:
+    """Copia del risultato con i valori delle entità presi da `testo`; None se le posizioni non valgono."""
+    risultato = copy.deepcopy(risultato)
+    entita = risultato.get("entities")
+    if not entita or testo == testo_salvato:
+        return risultato
+    if len(testo) != len(testo_salvato) or testo.lower() != testo_salvato.lower():
+        return None
+    for e in entita:
+        inizio, fine = e.get("start"), e.get("end")
+        # I valori sostituiti da un sinonimo non corrispondono al testo: restano quelli canonici
+        if inizio is not None and fine is not None and e.get("value") == testo_salvato[inizio:fine]:
+            e["value"] = testo[inizio:fine]
+    return risultato
+
+
+class ParseCache:
+    """Cache LRU dei risultati dell'NLU per il modello corrente."""
+
+    def __init__(self, maxsize: int = MAXSIZE_DEFAULT):
+        self.maxsize = maxsize
+        self.attiva = True  # False per misurare la pipeline senza cache
+        self.modello: Optional[str] = None
+        self._data: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()  # chiave → (testo, risultato)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.incompatibili = 0  # stessa chiave ma entità non riportabili sul testo
+        self.evictions = 0
+        self.invalidazioni = 0
+
+    def usa_modello(self, modello: Optional[str]):
+        """Imposta l'impronta del modello caricato; se è cambiata le voci precedenti vengono scartate."""
+        with self._lock:
+            if modello != self.modello:
+                if self._data:
+                    self.invalidazioni += 1
+                self._data.clear()
+                self.modello = modello
+
+    def cerca(self, testo: str, modello: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Risultato salvato per `testo` (una copia, modificabile dalla pipeline) o None."""
+        if not self.attiva or modello is None:
+            return None
+        chiave = chiave_testo(testo)
+        with self._lock:
+            voce = self._data.get(chiave) if modello == self.modello else None
+            if voce is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(chiave)
+        risultato = _entita_sul_testo(voce[1], voce[0], testo)
+        with self._lock:
+            if risultato is None:
+                self.misses += 1
+                self.incompatibili += 1
+            else:
+                self.hits += 1
+        return risultato
+
+    def salva(self, testo: str, modello: Optional[str], risultato: Dict[str, Any]):
+        """Salva il risultato calcolato con `modello`; ignorato se nel frattempo il modello è cambiato."""
+        if not self.attiva or modello is None or self.maxsize <= 0:
+            return
+        risultato = copy.deepcopy(risultato)
+        chiave = chiave_testo(testo)
+        with self._lock:
+            if modello != self.modello:
+                return
+            self._data[chiave] = (testo, risultato)
+            self._data.move_to_end(chiave)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def svuota(self) -> int:
+        with self._lock:
+            rimosse = len(self._data)
+            self._data.clear()
+            return rimosse
+
+    def stats(self) -> Dict[str, Any]:
+        """Contatori di hit/miss e occupazione della cache."""
+        with self._lock:
+            richieste = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "incompatibili": self.incompatibili,
+                "evictions": self.evictions,
+                "invalidazioni": self.invalidazioni,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "modello": self.modello,
+                "hit_rate": self.hits / richieste if richieste else 0.0,
+            }
+
+
+_parse_cache: Optional[ParseCache] = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache(maxsize: Optional[int] = None) -> ParseCache:
+    """Cache condivisa dai componenti di lettura e scrittura della pipeline.
+
+    `maxsize` (dalla configurazione del componente) vale alla creazione e ai caricamenti successivi.
+    """
+    global _parse_cache
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache(MAXSIZE_DEFAULT if maxsize is None else maxsize)
+        elif maxsize is not None:
+            _parse_cache.maxsize = maxsize
+        return _parse_cache
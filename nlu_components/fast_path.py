@@ -0,0 +1,86 @@
+"""Estrattore deterministico di dimensione e materiale, prima dell'estrazione di entità di DIET.
+
+Riconosce nel testo dimensioni e materiali con le espressioni compilate di utils/misure.py ed
+emette entità con valori già normalizzati e tipizzati:
+- `dimensione` nella forma canonica 'LxH' (cm), più `larghezza_cm` e `altezza_cm` numeriche;
+- `materiale` con il nome da mostrare e `codice_materiale` con il codice della tabella unica.
+
+CachedDIETClassifier (nlu_components/parse_cache.py) scarta le proprie entità dei tipi già
+trovati qui: il modello conta solo quando il percorso deterministico non trova nulla.
+"""
+from typing import Any, Dict, List, Text
+
+from rasa.engine.graph import ExecutionContext, GraphComponent
+from rasa.engine.recipes.default_recipe import DefaultV1Recipe
+from rasa.engine.storage.resource import Resource
+from rasa.engine.storage.storage import ModelStorage
+from rasa.shared.nlu.constants import ENTITIES, TEXT
+from rasa.shared.nlu.training_data.message import Message
+from rasa.shared.nlu.training_data.training_data import TrainingData
+
+from nlu_components.cache import da_cache
+from utils.misure import nome_materiale, trova_dimensione, trova_materiale
+
+ESTRATTORE = "FastPathExtractor"
+# Proprietà interna del messaggio: tipi di entità trovati dal percorso deterministico
+TIPI_TROVATI = "fast_path_entita"
+
+
+def entita_deterministiche(testo: str) -> List[Dict[str, Any]]:
+    """Entità di dimensione e materiale nel testo, con i valori normalizzati."""
+    entita = []
+
+    def aggiungi(tipo: str, valore: Any, inizio: int, fine: int):
+        entita.append({
+            "entity": tipo, "start": inizio, "end": fine, "value": valore,
+            "confidence_entity": 1.0, "extractor": ESTRATTORE,
+        })
+
+    dimensione = trova_dimensione(testo)
+    if dimensione:
+        valore, inizio, fine = dimensione
+        aggiungi("dimensione", valore.testo, inizio, fine)
+        aggiungi("larghezza_cm", valore.larghezza_cm, inizio, fine)
+        aggiungi("altezza_cm", valore.altezza_cm, inizio, fine)
+    materiale = trova_materiale(testo)
+    if materiale:
+        codice, inizio, fine = materiale
+        aggiungi("materiale", nome_materiale(codice), inizio, fine)
+        aggiungi("codice_materiale", codice, inizio, fine)
+    return entita
+
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.ENTITY_EXTRACTOR], is_trainable=False)
+class FastPathExtractor(GraphComponent):
+    """Entità `dimensione` e `materiale` (e i valori tipizzati) senza passare dal modello."""
+
+    @classmethod
+    def create(cls, config: Dict[Text, Any], model_storage: ModelStorage, resource: Resource,
+               execution_context: ExecutionContext) -> "FastPathExtractor":
+        return cls()
+
+    def process_training_data(self, training_data: TrainingData) -> TrainingData:
+        return training_data
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        for message in messages:
+            testo = message.get(TEXT)
+            if da_cache(message):
+                continue  # entità già nel risultato in cache
+            entita = entita_deterministiche(testo) if testo else []
+            if not entita:
+                continue
+            message.set(ENTITIES, message.get(ENTITIES, []) + entita, add_to_output=True)
+            message.set(TIPI_TROVATI, sorted({e["entity"] for e in entita}))
+        return messages
+
+
+def scarta_entita_duplicate(message: Message):
+    """Toglie le entità di altri estrattori dei tipi già trovati dal percorso deterministico."""
+    tipi = set(message.get(TIPI_TROVATI) or ())
+    if not tipi:
+        return
+    entita = message.get(ENTITIES, [])
+    filtrate = [e for e in entita if e.get("extractor") == ESTRATTORE or e.get("entity") not in tipi]
+    if len(filtrate) != len(entita):
+        message.set(ENTITIES, filtrate, add_to_output=True)
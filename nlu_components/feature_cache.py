@@ -0,0 +1,144 @@
+"""Cache su disco, indirizzata per contenuto, della featurizzazione degli esempi di addestramento.
+
+Ogni voce è un file il cui nome è lo SHA-256 di tutto ciò da cui dipende il risultato:
+impronta del componente (modello spaCy e versione) e contenuto
+dell'esempio. Un esempio cambiato, o un componente diverso, produce una chiave nuova: non
+serve invalidare nulla e ai riaddestramenti vengono calcolati solo gli esempi nuovi o modificati.
+
+Le scritture sono atomiche (file temporaneo + os.replace): più addestramenti possono usare la
+stessa cartella. Le voci non più usate restano su disco finché non si esegue `--pulisci`.
+
+Cartella: NLU_FEATURE_CACHE_DIR (default .rasa/feature_cache); NLU_FEATURE_CACHE=false la disattiva.
+
+Uso: python -m nlu_components.feature_cache [--pulisci] [--piu-vecchie-di GIORNI]
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("NLUFeatureCache")
+
+CARTELLA_DEFAULT = os.path.join(".rasa", "feature_cache")
+
+
+def chiave(*parti: Any) -> str:
+    """SHA-256 delle parti (serializzate in JSON con chiavi ordinate)."""
+    contenuto = json.dumps(parti, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(contenuto.encode("utf-8")).hexdigest()
+
+
+class FeatureCache:
+    """Voci binarie per chiave, in sottocartelle per i primi due caratteri della chiave."""
+
+    def __init__(self, cartella: str = CARTELLA_DEFAULT, attiva: bool = True):
+        self.cartella = cartella
+        self.attiva = attiva
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.scritture = 0
+
+    def _percorso(self, chiave: str) -> str:
+        return os.path.join(self.cartella, chiave[:2], chiave[2:])
+
+    def leggi(self, chiave: str) -> Optional[bytes]:
+        if not self.attiva:
+            return None
+        try:
+            with open(self._percorso(chiave), "rb") as f:
+                dati = f.read()
+        except OSError:
+            dati = None
+        with self._lock:
+            if dati is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return dati
+
+    def scrivi(self, chiave: str, dati: bytes):
+        if not self.attiva:
+            return
+        percorso = self._percorso(chiave)
+        temporaneo = f"{percorso}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(percorso), exist_ok=True)
+            with open(temporaneo, "wb") as f:
+                f.write(dati)
+            os.replace(temporaneo, percorso)
+        except OSError as e:
+            # La cache è solo un'ottimizzazione: un disco pieno non deve fermare l'addestramento
+            logger.warning(f"Scrittura nella cache delle feature non riuscita: {e}")
+            return
+        with self._lock:
+            self.scritture += 1
+
+    def pulisci(self, piu_vecchie_di: Optional[float] = None) -> int:
+        """Rimuove le voci (solo quelle non lette né scritte da `piu_vecchie_di` secondi). Restituisce il numero."""
+        limite = time.time() - piu_vecchie_di if piu_vecchie_di is not None else None
+        rimosse = 0
+        for radice, _, file in os.walk(self.cartella):
+            for nome in file:
+                percorso = os.path.join(radice, nome)
+                try:
+                    if limite is None or max(os.path.getatime(percorso), os.path.getmtime(percorso)) < limite:
+                        os.remove(percorso)
+                        rimosse += 1
+                except OSError:
+                    pass
+        return rimosse
+
+    def occupazione(self) -> Dict[str, int]:
+        voci, byte = 0, 0
+        for radice, _, file in os.walk(self.cartella):
+            for nome in file:
+                try:
+                    byte += os.path.getsize(os.path.join(radice, nome))
+                    voci += 1
+                except OSError:
+                    pass
+        return {"voci": voci, "byte": byte}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            richieste = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "scritture": self.scritture,
+                "hit_rate": self.hits / richieste if richieste else 0.0,
+            }
+
+
+_feature_cache: Optional[FeatureCache] = None
+_feature_cache_lock = threading.Lock()
+
+
+def get_feature_cache() -> FeatureCache:
+    """Cache delle feature condivisa dai componenti della pipeline durante l'addestramento."""
+    global _feature_cache
+    with _feature_cache_lock:
+        if _feature_cache is None:
+            attiva = os.getenv("NLU_FEATURE_CACHE", "true").strip().lower() in ("1", "true", "yes", "si")
+            _feature_cache = FeatureCache(os.getenv("NLU_FEATURE_CACHE_DIR") or CARTELLA_DEFAULT, attiva)
+        return _feature_cache
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Occupazione e pulizia della cache delle feature NLU")
+    parser.add_argument("--pulisci", action="store_true", help="rimuove le voci")
+    parser.add_argument("--piu-vecchie-di", type=float, default=None, help="solo le voci non usate da N giorni")
+    args = parser.parse_args()
+
+    cache = get_feature_cache()
+    if args.pulisci:
+        giorni = args.piu_vecchie_di
+        print(f"rimosse {cache.pulisci(giorni * 86400 if giorni is not None else None)} voci")
+    occupazione = cache.occupazione()
+    print(f"{cache.cartella}: {occupazione['voci']} voci, {occupazione['byte'] / 1024:.0f} kB")
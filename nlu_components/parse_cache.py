@@ -0,0 +1,223 @@
+"""Componenti Rasa che mettono la cache dei parse (nlu_components/cache.py) davanti alla pipeline.
+
+- `ParseCacheLookup`, primo della pipeline: per i testi già visti con lo stesso modello imposta
+  intent, ranking, entità e risposte selezionate e segna il messaggio come risolto dalla cache.
+- Le varianti `Cached*` dei componenti di config.yml saltano i messaggi risolti dalla cache:
+  niente documento spaCy, tokenizzazione, feature e classificazione DIET.
+- `ParseCacheStore`, ultimo della pipeline: salva il risultato dei messaggi elaborati.
+
+L'impronta del modello è il model_id assegnato da Rasa a ogni addestramento: caricando un
+modello nuovo la cache si svuota. Lookup e store sono registrati come classificatori di intent,
+quindi non entrano nei grafi end-to-end delle policy, che continuano a calcolare le feature.
+
+In addestramento CachedSpacyNLP legge e scrive la cache su disco dei documenti spaCy per esempio
+(nlu_components/feature_cache.py): il modello spaCy elabora solo gli esempi nuovi o modificati.
+Le feature di CountVectors non sono in cache: gli indici dipendono dal vocabolario appreso a ogni
+addestramento, e un solo n-gram nuovo li cambierebbe per tutti gli esempi.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional, Text
+
+from rasa.engine.graph import ExecutionContext, GraphComponent
+from rasa.engine.recipes.default_recipe import DefaultV1Recipe
+from rasa.engine.storage.resource import Resource
+from rasa.engine.storage.storage import ModelStorage
+from rasa.nlu.classifiers.diet_classifier import DIETClassifier
+from rasa.nlu.constants import DENSE_FEATURIZABLE_ATTRIBUTES, SPACY_DOCS
+from rasa.nlu.extractors.entity_synonyms import EntitySynonymMapper
+from rasa.nlu.featurizers.dense_featurizer.spacy_featurizer import SpacyFeaturizer
+from rasa.nlu.featurizers.sparse_featurizer.count_vectors_featurizer import CountVectorsFeaturizer
+from rasa.nlu.featurizers.sparse_featurizer.lexical_syntactic_featurizer import LexicalSyntacticFeaturizer
+from rasa.nlu.featurizers.sparse_featurizer.regex_featurizer import RegexFeaturizer
+from rasa.nlu.selectors.response_selector import ResponseSelector
+from rasa.nlu.tokenizers.spacy_tokenizer import SpacyTokenizer
+from rasa.nlu.utils.spacy_utils import SpacyModel, SpacyNLP
+from rasa.shared.nlu.constants import TEXT
+from rasa.shared.nlu.training_data.message import Message
+from rasa.shared.nlu.training_data.training_data import TrainingData
+
+from nlu_components.cache import CAMPI_RISULTATO, MAXSIZE_DEFAULT, STATO_CACHE, da_cache, get_parse_cache
+from nlu_components.fast_path import scarta_entita_duplicate
+from nlu_components.feature_cache import chiave, get_feature_cache
+
+logger = logging.getLogger("NLUFeatureCache")
+
+
+def _non_in_cache(messages: List[Message]) -> List[Message]:
+    return [m for m in messages if not da_cache(m)]
+
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER], is_trainable=False)
+class ParseCacheLookup(GraphComponent):
+    """Risolve dalla cache i messaggi già visti con il modello corrente."""
+
+    @staticmethod
+    def get_default_config() -> Dict[Text, Any]:
+        return {"maxsize": MAXSIZE_DEFAULT}
+
+    def __init__(self, config: Dict[Text, Any], modello: Optional[str]):
+        self.cache = get_parse_cache(int(config.get("maxsize", MAXSIZE_DEFAULT)))
+        self.modello = modello
+        self.cache.usa_modello(modello)
+
+    @classmethod
+    def create(cls, config: Dict[Text, Any], model_storage: ModelStorage, resource: Resource,
+               execution_context: ExecutionContext) -> "ParseCacheLookup":
+        return cls(config, execution_context.model_id)
+
+    def process_training_data(self, training_data: TrainingData) -> TrainingData:
+        return training_data
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        for message in messages:
+            testo = message.get(TEXT)
+            if not testo:
+                continue
+            risultato = self.cache.cerca(testo, self.modello)
+            message.set(STATO_CACHE, {"modello": self.modello, "hit": risultato is not None})
+            for campo, valore in (risultato or {}).items():
+                message.set(campo, valore, add_to_output=True)
+        return messages
+
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER], is_trainable=False)
+class ParseCacheStore(GraphComponent):
+    """Salva nella cache il risultato dei messaggi elaborati dalla pipeline."""
+
+    def __init__(self):
+        self.cache = get_parse_cache()
+
+    @classmethod
+    def create(cls, config: Dict[Text, Any], model_storage: ModelStorage, resource: Resource,
+               execution_context: ExecutionContext) -> "ParseCacheStore":
+        return cls()
+
+    def process_training_data(self, training_data: TrainingData) -> TrainingData:
+        return training_data
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        for message in messages:
+            stato = message.get(STATO_CACHE)
+            if not stato or stato["hit"] or not message.get("intent"):
+                continue
+            risultato = {campo: message.get(campo) for campo in CAMPI_RISULTATO if message.get(campo) is not None}
+            self.cache.salva(message.get(TEXT), stato["modello"], risultato)
+        return messages
+
+
+# --- Componenti della pipeline che saltano i messaggi risolti dalla cache ---
+
+
+@DefaultV1Recipe.register(
+    [DefaultV1Recipe.ComponentType.MODEL_LOADER], is_trainable=False, model_from="CachedSpacyNLP"
+)
+class CachedSpacyNLP(SpacyNLP):
+    def process(self, messages: List[Message], model: SpacyModel) -> List[Message]:
+        super().process(_non_in_cache(messages), model)
+        return messages
+
+    def process_training_data(self, training_data: TrainingData, model: SpacyModel) -> TrainingData:
+        """Documenti spaCy degli esempi: dalla cache su disco, calcolati (in batch) solo quelli mancanti."""
+        cache = get_feature_cache()
+        if not cache.attiva:
+            return super().process_training_data(training_data, model)
+        import spacy
+        from spacy.tokens import Doc
+
+        nlp = model.model
+        impronta = chiave(type(self).__name__, model.model_name, nlp.meta.get("version"), spacy.__version__,
+                          self._config)
+        inizio, letti, calcolati = time.perf_counter(), 0, 0
+        for attributo in DENSE_FEATURIZABLE_ATTRIBUTES:
+            mancanti = []
+            for esempio in training_data.training_examples:
+                testo = self._get_text(esempio, attributo)
+                if not testo:
+                    continue
+                chiave_esempio = chiave(impronta, testo)
+                dati = cache.leggi(chiave_esempio)
+                if dati is None:
+                    mancanti.append((esempio, testo, chiave_esempio))
+                    continue
+                doc = Doc(nlp.vocab).from_bytes(dati)
+                letti += 1
+                if len(doc):
+                    esempio.set(SPACY_DOCS[attributo], doc)
+            for (esempio, _, chiave_esempio), doc in zip(mancanti, nlp.pipe([t for _, t, _ in mancanti], batch_size=50)):
+                cache.scrivi(chiave_esempio, doc.to_bytes())
+                calcolati += 1
+                if len(doc):
+                    esempio.set(SPACY_DOCS[attributo], doc)
+        logger.info(f"Documenti spaCy: {letti} dalla cache, {calcolati} calcolati in {time.perf_counter() - inizio:.2f}s")
+        return training_data
+
+
+@DefaultV1Recipe.register(
+    [DefaultV1Recipe.ComponentType.MESSAGE_TOKENIZER], is_trainable=False, model_from="CachedSpacyNLP"
+)
+class CachedSpacyTokenizer(SpacyTokenizer):
+    def process(self, messages: List[Message]) -> List[Message]:
+        super().process(_non_in_cache(messages))
+        return messages
+
+
+@DefaultV1Recipe.register(
+    [DefaultV1Recipe.ComponentType.MESSAGE_FEATURIZER], is_trainable=False, model_from="CachedSpacyNLP"
+)
+class CachedSpacyFeaturizer(SpacyFeaturizer):
+    def process(self, messages: List[Message]) -> List[Message]:
+        super().process(_non_in_cache(messages))
+        return messages
+
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.MESSAGE_FEATURIZER], is_trainable=True)
+class CachedRegexFeaturizer(RegexFeaturizer):
+    def process(self, messages: List[Message]) -> List[Message]:
+        super().process(_non_in_cache(messages))
+        return messages
+
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.MESSAGE_FEATURIZER], is_trainable=True)
+class CachedLexicalSyntacticFeaturizer(LexicalSyntacticFeaturizer):
+    def process(self, messages: List[Message]) -> List[Message]:
+        super().process(_non_in_cache(messages))
+        return messages
+
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.MESSAGE_FEATURIZER], is_trainable=True)
+class CachedCountVectorsFeaturizer(CountVectorsFeaturizer):
+    def process(self, messages: List[Message]) -> List[Message]:
+        super().process(_non_in_cache(messages))
+        return messages
+
+
+@DefaultV1Recipe.register(
+    [DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER, DefaultV1Recipe.ComponentType.ENTITY_EXTRACTOR],
+    is_trainable=True,
+)
+class CachedDIETClassifier(DIETClassifier):
+    """Oltre a saltare i messaggi in cache, lascia le entità già trovate da FastPathExtractor."""
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        da_elaborare = _non_in_cache(messages)
+        super().process(da_elaborare)
+        for message in da_elaborare:
+            scarta_entita_duplicate(message)
+        return messages
+
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.ENTITY_EXTRACTOR], is_trainable=True)
+class CachedEntitySynonymMapper(EntitySynonymMapper):
+    """Le entità in cache hanno già i valori canonici: non vanno mappate una seconda volta."""
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        super().process(_non_in_cache(messages))
+        return messages
+
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER], is_trainable=True)
+class CachedResponseSelector(ResponseSelector):
+    def process(self, messages: List[Message]) -> List[Message]:
+        super().process(_non_in_cache(messages))
+        return messages
@@ -0,0 +1,154 @@
+"""Generatore di esempi NLU dal catalogo: materiali, colori, dimensioni e nomi dei prodotti.
+
+Scrive un file di training data di Rasa (default data/nlu_catalogo.yml, caricato da `rasa train`
+insieme a data/nlu.yml) con:
+- esempi di `inform_materiale` per ogni materiale e alias della tabella unica (utils/calculation.py);
+- esempi di `inform_colore` per i colori delle tapparelle salvati dallo scraper
+  (dataset/colori_tapparelle.json) e quelli della lookup `colore` di data/nlu.yml;
+- esempi di `inform_dimensione` nei formati riconosciuti da utils/misure.py;
+- lookup `prodotto` e `marca` con nomi e marche di dataset/prodotti_per_categoria.
+
+L'output è deterministico (seme fisso, voci ordinate): rigenerarlo con lo stesso catalogo produce
+lo stesso file, quindi i documenti spaCy degli esempi invariati restano nella cache delle feature
+(nlu_components/feature_cache.py) e al riaddestramento si calcolano solo quelli nuovi.
+
+Uso: python -m nlu_components.training_data [--output data/nlu_catalogo.yml] [--dataset-dir DIR]
+                                            [--colori FILE] [--dimensioni 30] [--seme 0]
+"""
+import argparse
+import os
+import random
+import re
+from typing import Dict, Iterable, List
+
+import yaml
+
+from utils.calculation import ALIAS_MATERIALI, DENSITA_MATERIALI
+from utils.catalog import DATASET_DIR, Catalog
+from utils.misure import nome_materiale
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+OUTPUT_DEFAULT = os.path.join(ROOT_DIR, "data", "nlu_catalogo.yml")
+NLU_FILE = os.path.join(ROOT_DIR, "data", "nlu.yml")
+COLORI_DEFAULT = os.path.join(DATASET_DIR, "..", "colori_tapparelle.json")
+
+FRASI_MATERIALE = (
+    "È in [{v}](materiale)",
+    "Il materiale è [{v}](materiale)",
+    "La voglio in [{v}](materiale)",
+    "Preferisco [{v}](materiale)",
+    "[{v}](materiale)",
+)
+FRASI_COLORE = (
+    "La vorrei [{v}](colore)",
+    "Il colore deve essere [{v}](colore)",
+    "Colore [{v}](colore)",
+    "[{v}](colore)",
+)
+FRASI_DIMENSIONE = (
+    "La tapparella è [{v}](dimensione)",
+    "Le dimensioni sono [{v}](dimensione)",
+    "Misura [{v}](dimensione)",
+    "[{v}](dimensione)",
+)
+# Formati delle dimensioni (larghezza e altezza in cm), come li scrivono gli utenti
+FORMATI_DIMENSIONE = (
+    lambda l, a: f"{l}x{a}",
+    lambda l, a: f"{l} x {a}",
+    lambda l, a: f"{l}x{a} cm",
+    lambda l, a: f"{l}*{a}",
+    lambda l, a: f"{l} per {a} cm",
+    lambda l, a: f"{l / 100:g}x{a / 100:g}m".replace(".", ","),
+)
+
+
+def _esempi(frasi: Iterable[str], valori: Iterable[str]) -> List[str]:
+    """Una frase per valore, a rotazione, più il valore da solo per ognuno."""
+    frasi = list(frasi)
+    esempi = []
+    for i, valore in enumerate(valori):
+        esempi.append(frasi[i % (len(frasi) - 1)].format(v=valore))
+        esempi.append(frasi[-1].format(v=valore))
+    return list(dict.fromkeys(esempi))
+
+
+def materiali() -> List[str]:
+    """Nomi dei materiali e degli alias, come li scrive un utente."""
+    return sorted({nome_materiale(codice) for codice in [*DENSITA_MATERIALI, *ALIAS_MATERIALI]})
+
+
+def colori(percorso_colori: str, nlu_file: str = NLU_FILE) -> List[str]:
+    """Colori dello scraper (tutti i materiali) e della lookup `colore` di data/nlu.yml."""
+    from utils.colori import leggi_file_colori
+
+    trovati = {c for lista in leggi_file_colori(percorso_colori).values() for c in lista}
+    try:
+        with open(nlu_file, encoding="utf-8") as f:
+            voci = (yaml.safe_load(f) or {}).get("nlu", [])
+        for voce in voci:
+            if voce.get("lookup") == "colore":
+                trovati.update(riga.lstrip("- ").strip() for riga in voce.get("examples", "").splitlines())
+    except (OSError, yaml.YAMLError):
+        pass
+    return sorted(c for c in trovati if c)
+
+
+def dimensioni(numero: int, seme: int) -> List[str]:
+    casuale = random.Random(seme)
+    return [
+        FORMATI_DIMENSIONE[i % len(FORMATI_DIMENSIONE)](casuale.randrange(40, 300, 5), casuale.randrange(40, 300, 5))
+        for i in range(numero)
+    ]
+
+
+def _nome_prodotto(nome: str) -> str:
+    """Nome del prodotto senza le note tra parentesi e gli spazi ripetuti."""
+    return " ".join(re.sub(r"\([^)]*\)", " ", nome).split())
+
+
+def genera(dataset_dir: str = DATASET_DIR, percorso_colori: str = COLORI_DEFAULT, n_dimensioni: int = 30,
+           seme: int = 0) -> Dict[str, List[str]]:
+    """Esempi per intent e voci delle lookup, in ordine deterministico."""
+    catalogo = Catalog(dataset_dir=dataset_dir)
+    return {
+        "inform_materiale": _esempi(FRASI_MATERIALE, materiali()),
+        "inform_colore": _esempi(FRASI_COLORE, colori(percorso_colori)),
+        "inform_dimensione": _esempi(FRASI_DIMENSIONE, dimensioni(n_dimensioni, seme)),
+        "lookup:prodotto": sorted({_nome_prodotto(p.nome) for p in catalogo.prodotti if p.nome}),
+        "lookup:marca": sorted({p.marca for p in catalogo.prodotti if p.marca}),
+    }
+
+
+def scrivi(voci: Dict[str, List[str]], percorso: str):
+    righe = [
+        "# Generato da nlu_components/training_data.py a partire dal catalogo: non modificare a mano.",
+        'version: "3.1"',
+        "",
+        "nlu:",
+    ]
+    for nome, esempi in voci.items():
+        if not esempi:
+            continue
+        tipo, _, valore = nome.partition(":")
+        righe.append(f"  - lookup: {valore}" if valore else f"  - intent: {tipo}")
+        righe.append("    examples: |")
+        righe.extend(f"      - {esempio}" for esempio in esempi)
+        righe.append("")
+    temporaneo = percorso + ".tmp"
+    with open(temporaneo, "w", encoding="utf-8") as f:
+        f.write("\n".join(righe))
+    os.replace(temporaneo, percorso)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=OUTPUT_DEFAULT)
+    parser.add_argument("--dataset-dir", default=os.getenv("CATALOG_DIR", DATASET_DIR))
+    parser.add_argument("--colori", default=COLORI_DEFAULT, help="colori per materiale salvati dallo scraper")
+    parser.add_argument("--dimensioni", type=int, default=30, help="numero di dimensioni di esempio")
+    parser.add_argument("--seme", type=int, default=0)
+    args = parser.parse_args()
+
+    voci = genera(args.dataset_dir, args.colori, args.dimensioni, args.seme)
+    scrivi(voci, args.output)
+    print(f"{args.output}: " + ", ".join(f"{nome} {len(esempi)}" for nome, esempi in voci.items()))
@@ -0,0 +1,41 @@
+import os
+
+# Configurazione dello scraper del catalogo (valori sovrascrivibili da variabili d'ambiente)
+
+BASE_URL = os.getenv("SCRAPER_BASE_URL", "https://www.letapparelle.com")
+SITEMAP_URL = os.getenv("SCRAPER_SITEMAP_URL", f"{BASE_URL}/sitemap.xml")
+
+# Pagine di partenza se non si usa la sitemap né un elenco di URL
+START_URLS = [
+    f"{BASE_URL}/tapparelle_avvolgibili_in_alluminio_coibentato_52.html",
+]
+
+# Pagine con i colori disponibili per materiale
+PAGINE_COLORI = {
+    f"{BASE_URL}/tapparelle_avvolgibili_in_alluminio_coibentato_52.html": "alluminio coibentato",
+}
+
+# Prima parte del percorso delle pagine prodotto → categoria del dataset
+CATEGORIE_PERCORSO = {
+    "motori_rollmatik": "motori",
+    "motori_rollmatik_bidirezionali": "motori",
+    "pulsanti_e_placche": "pulsanti",
+    "radiocomandi_monodirezionali": "telecomandi",
+    "radiocomandi_bidirezionali": "telecomandi",
+    "centraline_e_domotica": "altri",
+    "centraline_e_domotica_bidirez.": "altri",
+}
+
+# Richieste HTTP
+MAX_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", 8))
+TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", 15))
+USER_AGENT = os.getenv("SCRAPER_USER_AGENT", "step-by-step-catalog-scraper/1.0")
+
+# Backend di estrazione: auto, streaming, lxml o soup (vedi scraper/extraction.py)
+EXTRACTOR = os.getenv("SCRAPER_EXTRACTOR", "auto")
+
+# Percorsi
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+CACHE_DIR = os.getenv("SCRAPER_CACHE_DIR", os.path.join(os.path.dirname(__file__), ".cache"))
+DATASET_DIR = os.getenv("SCRAPER_DATASET_DIR", os.path.join(ROOT_DIR, "dataset", "prodotti_per_categoria"))
+COLORI_FILE = os.getenv("SCRAPER_COLORI_FILE", os.path.join(ROOT_DIR, "dataset", "colori_tapparelle.json"))
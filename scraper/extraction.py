@@ -0,0 +1,239 @@
+"""Estrazione dei dati dalle pagine del sito tramite regole dichiarative e backend intercambiabili.
+
+Backend disponibili:
+- "streaming": parser a eventi della libreria standard, non costruisce l'albero della pagina;
+- "lxml": albero lxml interrogato con XPath (se lxml è installato);
+- "soup": BeautifulSoup, con lxml come parser se disponibile, altrimenti html.parser.
+"""
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, Any, List, Optional, FrozenSet
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # lxml è opzionale
+    lxml_html = None
+
+# Elementi HTML senza tag di chiusura
+ELEMENTI_VUOTI = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+})
+
+
+@dataclass(frozen=True)
+class Regola:
+    """Regola di estrazione: quali elementi cercare e cosa leggere da ciascuno."""
+
+    tag: Optional[str] = None  # None per qualsiasi tag
+    classi: FrozenSet[str] = frozenset()  # classi CSS che l'elemento deve avere tutte
+    attrs: Dict[str, str] = field(default_factory=dict)  # attributi con valore esatto
+    figlio: Optional[str] = None  # legge il testo del primo discendente con questo tag
+    attributo: Optional[str] = None  # legge questo attributo invece del testo
+    multiplo: bool = False  # True per tutti i risultati, False per il primo
+
+    def corrisponde(self, tag: str, attrs: Dict[str, Optional[str]]) -> bool:
+        if self.tag is not None and tag != self.tag:
+            return False
+        if self.classi and not self.classi <= set((attrs.get("class") or "").split()):
+            return False
+        return all(attrs.get(nome) == valore for nome, valore in self.attrs.items())
+
+
+# Regole per le pagine del catalogo (tapparelle con colori e pagine prodotto)
+REGOLE_PAGINA: Dict[str, Regola] = {
+    "colori": Regola(tag="div", classi=frozenset({"tap-color-container", "colore"}), figlio="span", multiplo=True),
+    "titolo": Regola(tag="h1"),
+    "og_titolo": Regola(tag="meta", attrs={"property": "og:title"}, attributo="content"),
+    "descrizione": Regola(tag="meta", attrs={"name": "description"}, attributo="content"),
+    "og_descrizione": Regola(tag="meta", attrs={"property": "og:description"}, attributo="content"),
+    "prezzo": Regola(attrs={"itemprop": "price"}, attributo="content"),
+    "prezzo_testo": Regola(classi=frozenset({"prezzo"})),
+    "immagine": Regola(tag="meta", attrs={"property": "og:image"}, attributo="content"),
+    "link": Regola(tag="a", attributo="href", multiplo=True),
+}
+
+
+def _pulisci(testo: Optional[str]) -> Optional[str]:
+    """Normalizza gli spazi; None per i testi vuoti."""
+    if testo is None:
+        return None
+    testo = " ".join(testo.split())
+    return testo or None
+
+
+def _risultato(regole: Dict[str, Regola], trovati: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Lista per le regole multiple, primo valore (o None) per le altre."""
+    return {
+        nome: trovati[nome] if regola.multiplo else (trovati[nome][0] if trovati[nome] else None)
+        for nome, regola in regole.items()
+    }
+
+
+class _StreamingParser(HTMLParser):
+    """Applica le regole mentre legge la pagina, tenendo in memoria solo gli elementi aperti."""
+
+    def __init__(self, regole: Dict[str, Regola]):
+        super().__init__(convert_charrefs=True)
+        self.regole = regole
+        self.trovati: Dict[str, List[str]] = {nome: [] for nome in regole}
+        # Per ogni elemento aperto: tag, testi catturati su di esso e regole in attesa di un figlio
+        self._pila: List[Dict[str, Any]] = []
+        self._buffer_attivi: List[List[str]] = []
+
+    def _serve(self, nome: str, regola: Regola) -> bool:
+        return regola.multiplo or not self.trovati[nome]
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        elemento = {"tag": tag, "catture": [], "attese": []}
+
+        # Regole che aspettano il primo discendente con un certo tag
+        for aperto in self._pila:
+            for attesa in aperto["attese"]:
+                nome, regola = attesa["nome"], attesa["regola"]
+                if not attesa["trovato"] and tag == regola.figlio:
+                    attesa["trovato"] = True
+                    elemento["catture"].append((nome, []))
+
+        for nome, regola in self.regole.items():
+            if not self._serve(nome, regola) or not regola.corrisponde(tag, attrs):
+                continue
+            if regola.attributo:
+                valore = _pulisci(attrs.get(regola.attributo))
+                if valore:
+                    self.trovati[nome].append(valore)
+            elif regola.figlio:
+                elemento["attese"].append({"nome": nome, "regola": regola, "trovato": False})
+            else:
+                elemento["catture"].append((nome, []))
+
+        if tag in ELEMENTI_VUOTI:
+            return
+        self._pila.append(elemento)
+        self._buffer_attivi.extend(buffer for _, buffer in elemento["catture"])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ELEMENTI_VUOTI:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # Tollera HTML malformato: chiude tutti gli elementi fino a quello corrispondente
+        if not any(elemento["tag"] == tag for elemento in self._pila):
+            return
+        while self._pila:
+            elemento = self._pila.pop()
+            for nome, buffer in elemento["catture"]:
+                self._buffer_attivi.remove(buffer)
+                testo = _pulisci("".join(buffer))
+                if testo and self._serve(nome, self.regole[nome]):
+                    self.trovati[nome].append(testo)
+            if elemento["tag"] == tag:
+                break
+
+    def handle_data(self, data):
+        for buffer in self._buffer_attivi:
+            buffer.append(data)
+
+
+class StreamingExtractor:
+    """Estrattore a eventi: non costruisce l'albero della pagina."""
+
+    nome = "streaming"
+
+    def estrai(self, html: str, regole: Dict[str, Regola] = REGOLE_PAGINA) -> Dict[str, Any]:
+        parser = _StreamingParser(regole)
+        parser.feed(html)
+        parser.close()
+        return _risultato(regole, parser.trovati)
+
+
+def _xpath(regola: Regola) -> str:
+    """Traduce una regola in un'espressione XPath."""
+    condizioni = [
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {classe} ')" for classe in sorted(regola.classi)
+    ]
+    condizioni += [f"@{nome}='{valore}'" for nome, valore in regola.attrs.items()]
+    espressione = f"//{regola.tag or '*'}"
+    if condizioni:
+        espressione += "[" + " and ".join(condizioni) + "]"
+    return espressione
+
+
+class LxmlExtractor:
+    """Estrattore basato sull'albero lxml, molto più veloce di BeautifulSoup."""
+
+    nome = "lxml"
+
+    def __init__(self):
+        if lxml_html is None:
+            raise ImportError("lxml non è installato")
+
+    def estrai(self, html: str, regole: Dict[str, Regola] = REGOLE_PAGINA) -> Dict[str, Any]:
+        albero = lxml_html.fromstring(html)
+        trovati: Dict[str, List[str]] = {}
+        for nome, regola in regole.items():
+            valori = []
+            for elemento in albero.xpath(_xpath(regola)):
+                if regola.attributo:
+                    valore = _pulisci(elemento.get(regola.attributo))
+                elif regola.figlio:
+                    figli = elemento.xpath(f".//{regola.figlio}")
+                    valore = _pulisci(figli[0].text_content()) if figli else None
+                else:
+                    valore = _pulisci(elemento.text_content())
+                if valore:
+                    valori.append(valore)
+                    if not regola.multiplo:
+                        break
+            trovati[nome] = valori
+        return _risultato(regole, trovati)
+
+
+class SoupExtractor:
+    """Estrattore basato su BeautifulSoup (costruisce l'albero completo della pagina)."""
+
+    def __init__(self, parser: Optional[str] = None):
+        from bs4 import BeautifulSoup  # import locale: serve solo a questo backend
+
+        self._soup = BeautifulSoup
+        self.parser = parser or ("lxml" if lxml_html is not None else "html.parser")
+        self.nome = f"soup[{self.parser}]"
+
+    def estrai(self, html: str, regole: Dict[str, Regola] = REGOLE_PAGINA) -> Dict[str, Any]:
+        soup = self._soup(html, self.parser)
+        trovati: Dict[str, List[str]] = {}
+        for nome, regola in regole.items():
+            valori = []
+            for elemento in soup.find_all(lambda tag: regola.corrisponde(tag.name, {
+                k: " ".join(v) if isinstance(v, list) else v for k, v in tag.attrs.items()
+            })):
+                if regola.attributo:
+                    valore = _pulisci(elemento.get(regola.attributo))
+                elif regola.figlio:
+                    figlio = elemento.find(regola.figlio)
+                    valore = _pulisci(figlio.get_text()) if figlio else None
+                else:
+                    valore = _pulisci(elemento.get_text())
+                if valore:
+                    valori.append(valore)
+                    if not regola.multiplo:
+                        break
+            trovati[nome] = valori
+        return _risultato(regole, trovati)
+
+
+BACKENDS = {
+    "streaming": StreamingExtractor,
+    "lxml": LxmlExtractor,
+    "soup": SoupExtractor,
+}
+
+
+def get_extractor(nome: str = "auto"):
+    """Restituisce l'estrattore richiesto; "auto" sceglie lxml se installato, altrimenti lo streaming."""
+    if nome == "auto":
+        nome = "lxml" if lxml_html is not None else "streaming"
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend di estrazione sconosciuto: {nome} (disponibili: {', '.join(BACKENDS)})")
+    return BACKENDS[nome]()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scraper import config
+
+logger = logging.getLogger("Scraper")
+
+
+@dataclass
+class Pagina:
+    """Risultato del download di una pagina."""
+
+    url: str
+    status: int
+    html: Optional[str]
+    cambiata: bool  # False se il server ha risposto 304 o il contenuto è identico alla copia in cache
+    errore: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class PageCache:
+    """Cache su disco delle pagine scaricate, con ETag e Last-Modified per le richieste condizionali."""
+
+    def __init__(self, directory: str = config.CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _percorso(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def leggi(self, url: str) -> Optional[Dict[str, str]]:
+        """Restituisce i metadati (etag, last_modified, sha1) e il corpo salvati per l'URL."""
+        percorso = self._percorso(url)
+        try:
+            with open(percorso + ".json", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(percorso + ".html", encoding="utf-8") as f:
+                meta["html"] = f.read()
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def scrivi(self, url: str, html: str, etag: Optional[str], last_modified: Optional[str]):
+        percorso = self._percorso(url)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha1": hashlib.sha1(html.encode("utf-8")).hexdigest(),
+        }
+        # Scrittura atomica: prima il corpo, poi i metadati che lo rendono valido
+        for estensione, contenuto in ((".html", html), (".json", json.dumps(meta))):
+            temporaneo = percorso + estensione + ".tmp"
+            with open(temporaneo, "w", encoding="utf-8") as f:
+                f.write(contenuto)
+            os.replace(temporaneo, percorso + estensione)
+
+
+class PageFetcher:
+    """Scarica pagine in parallelo (concorrenza limitata) riusando le connessioni e saltando quelle invariate."""
+
+    def __init__(self, cache: Optional[PageCache] = None, max_concurrency: int = config.MAX_CONCURRENCY):
+        self.cache = cache or PageCache()
+        self.max_concurrency = max_concurrency
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = config.USER_AGENT
+
+    def fetch(self, url: str) -> Pagina:
+        """Scarica una pagina con una richiesta condizionale basata sulla copia in cache.
+
+        La cache non viene aggiornata qui: la pagina va salvata con `salva()` solo dopo averne
+        registrato i dati, altrimenti un errore successivo la farebbe risultare invariata.
+        """
+        salvata = self.cache.leggi(url)
+        headers = {}
+        if salvata:
+            if salvata.get("etag"):
+                headers["If-None-Match"] = salvata["etag"]
+            if salvata.get("last_modified"):
+                headers["If-Modified-Since"] = salvata["last_modified"]
+        try:
+            response = self.session.get(url, headers=headers, timeout=config.TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Errore nel recuperare {url}: {e}")
+            return Pagina(url, 0, None, False, str(e))
+
+        if response.status_code == 304 and salvata:
+            return Pagina(url, 304, salvata["html"], False)
+        if response.status_code != 200:
+            logger.error(f"Errore nel recuperare la pagina {url}: {response.status_code}")
+            return Pagina(url, response.status_code, None, False, f"HTTP {response.status_code}")
+
+        html = response.text
+        cambiata = not salvata or salvata.get("sha1") != hashlib.sha1(html.encode("utf-8")).hexdigest()
+        return Pagina(url, 200, html, cambiata, etag=response.headers.get("ETag"),
+                      last_modified=response.headers.get("Last-Modified"))
+
+    def salva(self, pagina: Pagina):
+        """Salva in cache una pagina scaricata (le risposte 304 sono già in cache)."""
+        if pagina.status == 200 and pagina.html is not None:
+            self.cache.scrivi(pagina.url, pagina.html, pagina.etag, pagina.last_modified)
+
+    def fetch_all(self, urls: Iterable[str]) -> Iterator[Pagina]:
+        """Scarica tutte le pagine con al massimo `max_concurrency` richieste in parallelo."""
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            yield from executor.map(self.fetch, dict.fromkeys(urls))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,107 @@
+"""Server HTTP locale che serve le pagine di scraper/fixtures con ETag e Last-Modified.
+
+Permette di provare lo scraper senza accedere al sito:
+    python -m scraper.fixture_server --port 8800
+    SCRAPER_BASE_URL=http://127.0.0.1:8800 python -m scraper.site_scraper --sitemap
+"""
+import argparse
+import hashlib
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class FixtureServer:
+    """Serve i file di fixture; nella sitemap il segnaposto {base} diventa l'URL del server."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, directory: str = FIXTURES_DIR):
+        self.directory = directory
+        self.richieste = 0
+        self.risposte_304 = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.richieste += 1
+                percorso = os.path.normpath(os.path.join(server.directory, self.path.split("?")[0].lstrip("/")))
+                if not percorso.startswith(os.path.abspath(server.directory)) or not os.path.isfile(percorso):
+                    self.send_error(404)
+                    return
+                with open(percorso, "rb") as f:
+                    corpo = f.read().replace(b"{base}", server.url.encode("utf-8"))
+                etag = '"' + hashlib.sha1(corpo).hexdigest() + '"'
+                mtime = int(os.path.getmtime(percorso))
+
+                # Richieste condizionali: 304 se la pagina non è cambiata
+                if self.headers.get("If-None-Match") == etag or self._non_modificata(mtime):
+                    server.risposte_304 += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                tipo = "application/xml" if percorso.endswith(".xml") else "text/html; charset=utf-8"
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def _non_modificata(self, mtime: int) -> bool:
+                valore = self.headers.get("If-Modified-Since")
+                if not valore or self.headers.get("If-None-Match"):
+                    return False
+                try:
+                    return mtime <= parsedate_to_datetime(valore).timestamp()
+                except (TypeError, ValueError):
+                    return False
+
+            def log_message(self, format, *args):
+                pass  # niente log per ogni richiesta
+
+        return Handler
+
+    def start(self) -> "FixtureServer":
+        self.directory = os.path.abspath(self.directory)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server delle pagine di fixture dello scraper")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    args = parser.parse_args()
+
+    server = FixtureServer(args.host, args.port).start()
+    print(f"Fixture in ascolto su {server.url}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
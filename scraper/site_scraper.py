@@ -1,32 +1,235 @@
-import requests
-from bs4 import BeautifulSoup
+"""Scraper del catalogo: aggiorna colori, prezzi e prodotti in dataset/prodotti_per_categoria.
+
+Uso:
+    python -m scraper.site_scraper                     # pagine di config.START_URLS
+    python -m scraper.site_scraper --sitemap [URL]     # tutte le pagine della sitemap
+    python -m scraper.site_scraper --urls elenco.txt   # un URL per riga
+"""
+import argparse
 import json
+import logging
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from urllib.parse import urlparse, urljoin
+
+from scraper import config
+from scraper.extraction import get_extractor, REGOLE_PAGINA
+from scraper.fetcher import Pagina, PageFetcher
+
+logger = logging.getLogger("Scraper")
+
+
+def formatta_prezzo(testo: Optional[str]) -> Optional[str]:
+    """Riporta un prezzo ("€ 32.90", "32,90") al formato del dataset ("32,90")."""
+    if not testo:
+        return None
+    cifre = "".join(c for c in testo if c.isdigit() or c in ",.")
+    if not cifre:
+        return None
+    if "," in cifre:
+        cifre = cifre.replace(".", "").replace(",", ".")
+    try:
+        return f"{float(cifre):.2f}".replace(".", ",")
+    except ValueError:
+        return None
+
+
+def estrai_prodotto(dati: Dict[str, Any], url: str) -> Optional[Dict[str, Any]]:
+    """Costruisce il record del dataset dai dati estratti da una pagina prodotto."""
+    titolo = dati["titolo"] or dati["og_titolo"]
+    if not titolo:
+        return None
+    return {
+        "title": titolo,
+        "description": dati["descrizione"] or dati["og_descrizione"] or "",
+        "price": formatta_prezzo(dati["prezzo"] or dati["prezzo_testo"]),
+        "image_url": dati["immagine"],
+        "link": url,
+    }
+
+
+def categoria_da_url(url: str) -> Optional[str]:
+    """Categoria del dataset di una pagina prodotto, ricavata dalla prima parte del percorso."""
+    parti = urlparse(url).path.strip("/").split("/")
+    if len(parti) < 2:
+        return None
+    return config.CATEGORIE_PERCORSO.get(parti[0])
+
+
+def urls_da_sitemap(fetcher: PageFetcher, sitemap_url: str) -> List[str]:
+    """Legge la sitemap (anche indici di sitemap) e restituisce le pagine prodotto e colori."""
+    urls: List[str] = []
+    da_leggere = [sitemap_url]
+    visitate = set()
+    while da_leggere:
+        corrente = da_leggere.pop()
+        if corrente in visitate:
+            continue
+        visitate.add(corrente)
+        pagina = fetcher.fetch(corrente)
+        if not pagina.html:
+            continue
+        try:
+            radice = ET.fromstring(pagina.html.encode("utf-8"))
+        except ET.ParseError as e:
+            logger.error(f"Sitemap non valida {corrente}: {e}")
+            continue
+        fetcher.salva(pagina)
+        for elemento in radice.iter():
+            if not elemento.tag.endswith("loc") or not elemento.text:
+                continue
+            loc = elemento.text.strip()
+            if radice.tag.endswith("sitemapindex"):
+                da_leggere.append(loc)
+            elif categoria_da_url(loc) or loc in config.PAGINE_COLORI:
+                urls.append(loc)
+    return urls
+
+
+def _scrivi_json(percorso: str, dati: Any):
+    """Scrittura atomica nello stesso formato dei file del dataset."""
+    temporaneo = percorso + ".tmp"
+    with open(temporaneo, "w", encoding="utf-8") as f:
+        json.dump(dati, f, indent=4, ensure_ascii=False)
+    os.replace(temporaneo, percorso)
+
+
+def aggiorna_dataset(prodotti: Iterable[Tuple[str, Dict[str, Any]]], dataset_dir: str = config.DATASET_DIR) -> Dict[str, int]:
+    """Unisce i prodotti estratti nei file del dataset, riscrivendo solo i file modificati.
+
+    I prodotti già presenti (stesso link) vengono aggiornati nel file in cui si trovano,
+    quelli nuovi aggiunti al file della loro categoria.
+    """
+    contenuti: Dict[str, List[Dict[str, Any]]] = {}
+    posizioni: Dict[str, Tuple[str, int]] = {}
+    for nome_file in sorted(os.listdir(dataset_dir)):
+        if nome_file.endswith(".json"):
+            categoria = nome_file[:-len(".json")]
+            with open(os.path.join(dataset_dir, nome_file), encoding="utf-8") as f:
+                contenuti[categoria] = json.load(f)
+            for i, item in enumerate(contenuti[categoria]):
+                posizioni.setdefault(item.get("link"), (categoria, i))
+
+    modificati = set()
+    stats = {"nuovi": 0, "aggiornati": 0, "invariati": 0}
+    for categoria, prodotto in prodotti:
+        if prodotto["link"] in posizioni:
+            categoria_file, i = posizioni[prodotto["link"]]
+            esistente = contenuti[categoria_file][i]
+            # Non sovrascriviamo campi noti con valori mancanti nella pagina
+            aggiornato = {**esistente, **{k: v for k, v in prodotto.items() if v}}
+            if aggiornato == esistente:
+                stats["invariati"] += 1
+                continue
+            contenuti[categoria_file][i] = aggiornato
+            modificati.add(categoria_file)
+            stats["aggiornati"] += 1
+        else:
+            contenuti.setdefault(categoria, []).append(prodotto)
+            posizioni[prodotto["link"]] = (categoria, len(contenuti[categoria]) - 1)
+            modificati.add(categoria)
+            stats["nuovi"] += 1
+
+    for categoria in modificati:
+        _scrivi_json(os.path.join(dataset_dir, f"{categoria}.json"), contenuti[categoria])
+    return stats
+
+
+def aggiorna_colori(colori: Dict[str, List[str]], percorso: str = config.COLORI_FILE) -> bool:
+    """Salva i colori per materiale, riscrivendo il file solo se sono cambiati."""
+    try:
+        with open(percorso, encoding="utf-8") as f:
+            esistenti = json.load(f)
+    except (OSError, ValueError):
+        esistenti = {}
+    aggiornati = {**esistenti, **colori}
+    if aggiornati == esistenti:
+        return False
+    _scrivi_json(percorso, aggiornati)
+    return True
+
+
+def scrape(urls: Iterable[str], fetcher: Optional[PageFetcher] = None, dataset_dir: str = config.DATASET_DIR,
+           colori_file: str = config.COLORI_FILE, extractor=None, segui_link: bool = False,
+           snapshot: bool = True) -> Dict[str, int]:
+    """Scarica le pagine, estrae prodotti e colori da quelle cambiate e aggiorna il dataset.
+
+    Con `segui_link` scarica anche le pagine prodotto collegate da quelle visitate (un livello),
+    comprese quelle invariate, i cui link sono letti dalla copia in cache.
+    Se il dataset cambia (e `snapshot` è vero) viene ricompilato lo snapshot binario accanto al dataset.
+    Le pagine scaricate entrano nella cache solo dopo l'aggiornamento del dataset e dei colori:
+    se questo fallisce, al giro successivo risultano ancora cambiate e vengono rielaborate.
+    """
+    fetcher = fetcher or PageFetcher()
+    extractor = extractor or get_extractor(config.EXTRACTOR)
+    stats = {"pagine": 0, "invariate": 0, "errori": 0}
+    prodotti: List[Tuple[str, Dict[str, Any]]] = []
+    colori: Dict[str, List[str]] = {}
+    scaricate: List[Pagina] = []
+    da_visitare = list(dict.fromkeys(urls))
+    visitate = set(da_visitare)
+
+    while da_visitare:
+        collegate = []
+        for pagina in fetcher.fetch_all(da_visitare):
+            stats["pagine"] += 1
+            if pagina.errore:
+                stats["errori"] += 1
+                continue
+            scaricate.append(pagina)
+            if not pagina.cambiata:
+                stats["invariate"] += 1
+                if segui_link:
+                    dati = extractor.estrai(pagina.html, {"link": REGOLE_PAGINA["link"]})
+                    collegate.extend(urljoin(pagina.url, link) for link in dati["link"])
+                continue
+            # Estrazione dei dati dal contenuto HTML con le regole dichiarative
+            dati = extractor.estrai(pagina.html, REGOLE_PAGINA)
+            if pagina.url in config.PAGINE_COLORI:
+                colori[config.PAGINE_COLORI[pagina.url]] = dati["colori"]
+            categoria = categoria_da_url(pagina.url)
+            if categoria:
+                prodotto = estrai_prodotto(dati, pagina.url)
+                if prodotto:
+                    prodotti.append((categoria, prodotto))
+            if segui_link:
+                collegate.extend(urljoin(pagina.url, link) for link in dati["link"])
+        da_visitare = [url for url in dict.fromkeys(collegate) if url not in visitate and categoria_da_url(url)]
+        visitate.update(da_visitare)
+
+    if prodotti:
+        stats.update(aggiorna_dataset(prodotti, dataset_dir))
+        if snapshot and (stats["nuovi"] or stats["aggiornati"]):
+            from utils.snapshot import compila
+            stats["snapshot_byte"] = compila(dataset_dir, os.path.join(dataset_dir, "..", "catalogo.snap"))["byte"]
+    stats["colori_aggiornati"] = int(bool(colori) and aggiorna_colori(colori, colori_file))
+    for pagina in scaricate:
+        fetcher.salva(pagina)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggiorna il dataset dei prodotti dal sito")
+    parser.add_argument("--sitemap", nargs="?", const=config.SITEMAP_URL, help="scopre le pagine dalla sitemap")
+    parser.add_argument("--urls", help="file con un URL per riga")
+    parser.add_argument("--concurrency", type=int, default=config.MAX_CONCURRENCY)
+    parser.add_argument("--extractor", default=config.EXTRACTOR, help="auto, streaming, lxml o soup")
+    parser.add_argument("--segui-link", action="store_true", help="visita anche le pagine prodotto collegate")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    fetcher = PageFetcher(max_concurrency=args.concurrency)
+    if args.urls:
+        with open(args.urls, encoding="utf-8") as f:
+            urls = [linea.strip() for linea in f if linea.strip()]
+    elif args.sitemap:
+        urls = urls_da_sitemap(fetcher, args.sitemap)
+    else:
+        urls = config.START_URLS
+
+    risultato = scrape(urls, fetcher, extractor=get_extractor(args.extractor), segui_link=args.segui_link)
+    fetcher.close()
 
-# URL della pagina da cui estrarre i dati
-url = "https://www.letapparelle.com/tapparelle_avvolgibili_in_alluminio_coibentato_52.html"
-
-# Effettua la richiesta HTTP
-response = requests.get(url)
-if response.status_code != 200:
-    raise Exception(f"Errore nel recuperare la pagina: {response.status_code}")
-    
-# Parsing del contenuto HTML
-soup = BeautifulSoup(response.text, "html.parser")
-
-# Trova tutti i div che contengono il tag span con il testo desiderato
-color_divs = soup.find_all("div", class_="tap-color-container colore")
-
-# Estrai il testo all'interno del tag <span> di ciascun div
-color_values = []
-for div in color_divs:
-    span = div.find("span")
-    if span:
-        text = span.get_text(strip=True)
-        if text:
-            color_values.append(text)
-
-# Genera un documento JSON con i valori estratti
-output_document = {"color_values": color_values}
-
-# Stampa il documento JSON formattato
-print(json.dumps(output_document, indent=4, ensure_ascii=False))
+    # Stampa il riepilogo JSON formattato
+    print(json.dumps(risultato, indent=4, ensure_ascii=False))
@@ -1,72 +1,351 @@
 import requests
 import os
 import logging
-from dotenv import load_dotenv
-from typing import Dict, Any, Optional
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Optional, List, Tuple
 
-
-# Sceglie il .env corretto
-dotenv_path = os.path.join(os.path.dirname(__file__), "..", ".env.dev")
-# Carica le variabili d'ambiente
-load_dotenv(dotenv_path=dotenv_path)
+from utils.cache import get_response_cache, FRESH, STALE, MISS
+from utils.catalog import get_catalog
+from utils.metrics import get_metrics
+from utils.resilience import get_resilienza, STATUS_RITENTABILI
+from utils.settings import carica_ambiente
 
 # Configurazione logging
 logger = logging.getLogger("ApiService")
 
-print(f"API BASE URL: {os.getenv('API_URL')}")
+
+def _env_int(nome: str, default: int) -> int:
+    """Legge un intero dalle variabili d'ambiente, con valore di default."""
+    try:
+        return int(os.getenv(nome, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(nome: str, default: float) -> float:
+    """Legge un float dalle variabili d'ambiente, con valore di default."""
+    try:
+        return float(os.getenv(nome, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(nome: str, default: bool) -> bool:
+    """Legge un booleano dalle variabili d'ambiente (True/False, 1/0)."""
+    valore = os.getenv(nome)
+    if valore is None:
+        return default
+    return valore.strip().lower() in ("1", "true", "yes", "si")
+
+
+# Endpoint per la ricerca di più prodotti in una sola richiesta
+BULK_ENDPOINT = "prodotti/bulk"
+# Status con cui un backend senza endpoint bulk risponde: si passa alle richieste concorrenti
+BULK_NON_SUPPORTATO = (404, 405, 501)
+
+
+def params_prodotto(categoria: str, nome_prodotto: str) -> Dict[str, Any]:
+    """Parametri della GET `prodotti` per un singolo prodotto, usati anche come chiave di cache."""
+    return {"categoria": categoria, "nome_prodotto": nome_prodotto}
+
+
+def primo_prodotto(risposta: Any) -> Optional[Dict[str, Any]]:
+    """Estrae il primo prodotto da una risposta della GET `prodotti`."""
+    if isinstance(risposta, list) and risposta:
+        return risposta[0]
+    return None
+
+
+def payload_bulk(coppie: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Corpo della POST `prodotti/bulk`."""
+    return {"richieste": [params_prodotto(categoria, nome) for categoria, nome in coppie]}
+
+
+def parse_bulk(risposta: Any, coppie: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[Dict[str, Any]]]:
+    """Associa i risultati della POST `prodotti/bulk` alle coppie richieste (stesso ordine)."""
+    risultati = (risposta or {}).get("risultati", [])
+    return {coppia: (risultato or {}).get("prodotto") for coppia, risultato in zip(coppie, risultati)}
+
 
 class ApiService:
     """Classe per gestire le richieste all'API dei prodotti."""
 
     def __init__(self):
-        """Inizializza il servizio API con l'URL base."""
+        """Inizializza il servizio API con l'URL base e il pool di connessioni."""
+        carica_ambiente()
         self.base_url = os.getenv("API_URL")  # Assicurati che API_URL sia nel file .env
+        logger.info(f"API BASE URL: {self.base_url}")
+
+        # Parametri del pool configurabili dai file .env.*
+        self.pool_connections = _env_int("API_POOL_CONNECTIONS", 4)  # numero di host in cache
+        self.pool_maxsize = _env_int("API_POOL_MAXSIZE", 20)  # connessioni per host
+        self.pool_block = _env_bool("API_POOL_BLOCK", False)
+        self.timeout = (
+            _env_float("API_CONNECT_TIMEOUT", 3.0),
+            _env_float("API_READ_TIMEOUT", 10.0),
+        )
+        self.keep_alive = _env_bool("API_KEEP_ALIVE", True)
+
+        self.session = self._build_session()
+        self.cache = get_response_cache()  # Cache condivisa per le letture di catalogo
+        self.metrics = get_metrics()  # Durate, errori e hit di cache per endpoint
+        self.resilienza = get_resilienza()  # Deadline del turno, retry e circuit breaker per endpoint
+        self.bulk_supported = True  # diventa False se il backend non espone `prodotti/bulk`
+        # Catalogo locale: "fallback" se il backend non risponde, "local" per non usare il backend, "off"
+        self.catalog_mode = os.getenv("CATALOG_MODE", "fallback").strip().lower()
+
+    def _build_session(self) -> requests.Session:
+        """Crea una sessione HTTP con connessioni persistenti riutilizzate tra le richieste."""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Restituisce le statistiche di utilizzo del pool per ogni host, utili per dimensionarlo."""
+        stats = {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "hosts": {},
+        }
+        adapter = self.session.get_adapter(self.base_url or "http://")
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            # La coda del pool contiene None per gli slot mai usati: contiamo solo le connessioni reali
+            idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+            stats["hosts"][f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "connessioni_aperte": pool.num_connections,
+                "richieste_servite": pool.num_requests,
+                "connessioni_inattive": idle,
+            }
+        return stats
+
+    def close(self):
+        """Chiude tutte le connessioni del pool."""
+        self.session.close()
+
+    def _prodotto_locale(self, categoria: str, nome_prodotto: str) -> Optional[Dict[str, Any]]:
+        """Prodotto dal catalogo locale nel formato dell'API, None se non trovato."""
+        prodotto = get_catalog().trova(categoria, nome_prodotto)
+        return prodotto.to_api() if prodotto else None
+
+    def _risposta_locale(self, endpoint: str, params: Optional[Dict[str, Any]] = None):
+        """Risposta dal catalogo locale per `prodotti`/`motori`, None se non disponibile."""
+        if self.catalog_mode == "off":
+            return None
+        return get_catalog().risposta_api(endpoint, params)
+
+    def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, use_cache: bool = True):
+        """Effettua una richiesta GET all'API, servendo dalla cache le letture di catalogo."""
+        if self.catalog_mode == "local":
+            locale = self._risposta_locale(endpoint, params)
+            if locale is not None:
+                return locale
+        if use_cache and self.cache.is_cacheable(endpoint):
+            valore, stato = self.cache.lookup(endpoint, params)
+            self.metrics.incrementa("api_cache_lookups_total", endpoint=endpoint, stato=stato)
+            if stato == FRESH:
+                return valore
+            if stato == STALE:
+                # stale-while-revalidate: rispondiamo subito e aggiorniamo in background
+                self._refresh_in_background(endpoint, params)
+                return valore
+            dati = self._get(endpoint, params)
+            if dati is None:
+                # Backend non disponibile: rispondiamo dal catalogo locale, senza salvare in cache
+                return self._risposta_locale(endpoint, params)
+            self.cache.store(endpoint, params, dati)
+            return dati
+        dati = self._get(endpoint, params)
+        return dati if dati is not None else self._risposta_locale(endpoint, params)
+
+    def _refresh_in_background(self, endpoint: str, params: Optional[Dict[str, Any]]):
+        """Aggiorna una voce scaduta della cache in un thread separato."""
+        if not self.cache.begin_refresh(endpoint, params):
+            return
 
-    def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None):
-        """Effettua una richiesta GET all'API."""
+        def _refresh():
+            try:
+                self.cache.store(endpoint, params, self._get(endpoint, params))
+            finally:
+                self.cache.end_refresh(endpoint, params)
+
+        threading.Thread(target=_refresh, name=f"refresh-{endpoint}", daemon=True).start()
+
+    def _chiama(self, method: str, endpoint: str, accetta=frozenset(), **kwargs) -> Optional[requests.Response]:
+        """Esegue una richiesta rispettando il budget del turno e il circuit breaker dell'endpoint.
+
+        Solo le GET vengono ritentate (backoff esponenziale con jitter) sugli errori temporanei.
+        Restituisce la risposta se riuscita (o con status in `accetta`), altrimenti None.
+        """
         url = f"{self.base_url}/{endpoint}"
+        breaker = self.resilienza.breaker(endpoint)
+        tentativi = self.resilienza.tentativi if method == "GET" else 0
+        for tentativo in range(tentativi + 1):
+            timeout = self.resilienza.timeout(endpoint)
+            if timeout is None:
+                self.metrics.incrementa("api_deadline_exceeded_total", endpoint=endpoint)
+                logger.warning(f"Budget del turno esaurito: richiesta {method} a {url} non inviata")
+                return None
+            if not breaker.consenti():
+                self.metrics.incrementa("api_circuit_open_total", endpoint=endpoint)
+                logger.warning(f"Circuito aperto per {endpoint}: richiesta {method} non inviata")
+                return None
+            try:
+                with self.metrics.cronometra("api_request_duration_seconds", endpoint=endpoint, method=method):
+                    response = self.session.request(
+                        method, url, timeout=(min(self.timeout[0], timeout), timeout), **kwargs
+                    )
+                    if response.status_code not in accetta:
+                        response.raise_for_status()
+                breaker.successo()
+                return response
+            except requests.exceptions.HTTPError as e:
+                errore = e
+                ritentabile = e.response is not None and e.response.status_code in STATUS_RITENTABILI
+            except requests.exceptions.RequestException as e:
+                errore = e
+                ritentabile = True  # connessione rifiutata, timeout...
+            except BaseException:
+                # Errore inatteso: senza esito, la chiamata di prova del circuito semi-aperto va liberata
+                breaker.rilascia()
+                raise
+            if ritentabile:
+                breaker.fallimento()
+            else:
+                breaker.successo()  # errore della richiesta (4xx), il backend risponde
+
+            attesa = self.resilienza.attesa(tentativo) if ritentabile and tentativo < tentativi else None
+            if attesa is None:
+                logger.error(f"Errore nella richiesta {method} a {url}: {errore}")
+                return None
+            self.metrics.incrementa("api_retries_total", endpoint=endpoint)
+            logger.warning(f"Errore nella richiesta {method} a {url}: {errore}, nuovo tentativo tra {attesa:.2f}s")
+            time.sleep(attesa)
+        return None
+
+    def _get(self, endpoint: str, params: Optional[Dict[str, Any]] = None):
+        """Esegue la richiesta GET vera e propria, senza passare dalla cache."""
+        response = self._chiama("GET", endpoint, params=params)
+        if response is None:
+            return None
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            print(response.json())
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Errore nella richiesta GET a {url}: {e}")
+            dati = response.json()
+        except ValueError as e:
+            logger.error(f"Risposta non valida da {endpoint}: {e}")
             return None
-        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Risposta GET {endpoint}", extra={"payload": dati})
+        return dati
+
     def post(self, endpoint: str, data: Dict[str, Any]):
-        """Effettua una richiesta POST all'API."""
-        url = f"{self.base_url}/{endpoint}"
+        """Effettua una richiesta POST all'API (mai ritentata: non è idempotente)."""
+        response = self._chiama("POST", endpoint, json=data)
+        if response is None:
+            return None
         try:
-            response = requests.post(url, json=data, timeout=10)
-            response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Errore nella richiesta POST a {url}: {e}")
+        except ValueError as e:
+            logger.error(f"Risposta non valida da {endpoint}: {e}")
             return None
-    
+
+    def get_prodotti_bulk(self, coppie: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """Risolve molte coppie (categoria, nome_prodotto) con una sola richiesta all'API.
+
+        Restituisce il prodotto trovato (o None) per ogni coppia, nello stesso ordine.
+        Se il backend non supporta la ricerca bulk, le ricerche vengono eseguite in parallelo.
+        """
+        if self.catalog_mode == "local":
+            return [self._prodotto_locale(*coppia) for coppia in coppie]
+
+        risultati: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        mancanti = []
+        for coppia in dict.fromkeys(coppie):  # rimuove i duplicati mantenendo l'ordine
+            valore, stato = self.cache.lookup("prodotti", params_prodotto(*coppia))
+            self.metrics.incrementa("api_cache_lookups_total", endpoint="prodotti", stato=stato)
+            if stato == MISS:
+                mancanti.append(coppia)
+                continue
+            if stato == STALE:
+                self._refresh_in_background("prodotti", params_prodotto(*coppia))
+            risultati[coppia] = primo_prodotto(valore)
+
+        if mancanti:
+            trovati = self._post_bulk(mancanti) if self.bulk_supported else None
+            if trovati is None:
+                trovati = self._lookup_concorrente(mancanti)
+            risultati.update(trovati)
+        return [risultati.get(coppia) for coppia in coppie]
+
+    def _post_bulk(self, coppie: List[Tuple[str, str]]) -> Optional[Dict[Tuple[str, str], Optional[Dict[str, Any]]]]:
+        """Esegue la POST `prodotti/bulk`; None se non è supportata o fallisce."""
+        response = self._chiama("POST", BULK_ENDPOINT, accetta=BULK_NON_SUPPORTATO, json=payload_bulk(coppie))
+        if response is None:
+            return None
+        if response.status_code in BULK_NON_SUPPORTATO:
+            logger.info(f"Endpoint {BULK_ENDPOINT} non disponibile, uso richieste concorrenti")
+            self.bulk_supported = False
+            return None
+        try:
+            trovati = parse_bulk(response.json(), coppie)
+        except ValueError as e:
+            logger.error(f"Risposta non valida da {BULK_ENDPOINT}: {e}")
+            return None
+        for coppia, prodotto in trovati.items():
+            if prodotto is not None:
+                self.cache.store("prodotti", params_prodotto(*coppia), [prodotto])
+        return trovati
+
+    def _lookup_concorrente(self, coppie: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[Dict[str, Any]]]:
+        """Fallback senza endpoint bulk: una GET `prodotti` per coppia, eseguite in parallelo sul pool."""
+        workers = max(1, min(len(coppie), self.pool_maxsize))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Ogni thread eredita il contesto del chiamante, quindi anche la scadenza del turno
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.get, "prodotti", params_prodotto(*coppia))
+                for coppia in coppie
+            ]
+            return {coppia: primo_prodotto(future.result()) for coppia, future in zip(coppie, futures)}
+
     def get_motori(self, potenza_min: int):
         """Recupera i motori dalla API in base alla potenza minima"""
-        response = requests.get(f"{self.base_url}/motori", params={"potenza_min": potenza_min})
-        return response.json().get("prodotti", [])
-    
-    def get_colori (self, materiale : str):
-        if materiale == "alluminio coibentato":
-            response = requests.get (f"{self.base_url}/colori", params=materiale)
-            return response.json().get("colori", [])
-        if materiale == "pvc":
-            response = requests.get(f"{self.base_url}/colori", params=materiale)
-            return response.json().get("colori", [])
-    
-    def get_colore (self, materiale: str, colore : str):
-        lista_colori = []
-        colori = []
-        if materiale == "alluminio coibentato":
-            lista_colori = self.get_colori ("alluminio")
-        elif materiale == "pvc":
-            lista_colori = self.get_colori(materiale)
-            
-        for colore in lista_colori :
-            if colore in lista_colori:
-                colori.append (colori)
-        return colori 
\ No newline at end of file
+        response = self.get("motori", params={"potenza_min": potenza_min})
+        return response.get("prodotti", []) if isinstance(response, dict) else []
+
+    def get_colori(self, materiale: str) -> List[str]:
+        """Nomi dei colori disponibili per il materiale (lista vuota se il backend non risponde)"""
+        response = self.get("colori_tapparelle", params={"materiale": materiale})
+        data = response.get("data", []) if isinstance(response, dict) else []
+        return [doc["color"].strip().lower() for doc in data if doc.get("color")]
+
+    def get_colore(self, materiale: str, colore: str) -> Optional[str]:
+        """Il colore richiesto se disponibile per il materiale, altrimenti None"""
+        colore = (colore or "").strip().lower()
+        return colore if colore in set(self.get_colori(materiale)) else None
+
+
+# Istanza condivisa a livello di processo: tutte le azioni riusano lo stesso pool
+_api_service: Optional[ApiService] = None
+_api_service_lock = threading.Lock()
+
+
+def get_api_service() -> ApiService:
+    """Restituisce l'istanza ApiService condivisa dal processo, creandola al primo utilizzo."""
+    global _api_service
+    if _api_service is None:
+        with _api_service_lock:
+            if _api_service is None:
+                _api_service = ApiService()
+    return _api_service
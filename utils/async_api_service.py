@@ -0,0 +1,286 @@
+import asyncio
+import os
+import logging
+from typing import Dict, Any, Optional, List, Tuple
+
+import aiohttp
+
+from utils.api_service import (
+    _env_int, _env_float, _env_bool,
+    BULK_ENDPOINT, BULK_NON_SUPPORTATO, params_prodotto, primo_prodotto, payload_bulk, parse_bulk,
+)
+from utils.cache import get_response_cache, FRESH, STALE, MISS
+from utils.catalog import get_catalog
+from utils.metrics import get_metrics
+from utils.resilience import get_resilienza, STATUS_RITENTABILI
+from utils.settings import carica_ambiente
+
+# Configurazione logging
+logger = logging.getLogger("AsyncApiService")
+
+
+class AsyncApiService:
+    """Controparte asincrona di ApiService, da usare nelle azioni del server asyncio di rasa_sdk."""
+
+    def __init__(self):
+        """Inizializza il servizio con l'URL base; la sessione viene creata al primo utilizzo."""
+        carica_ambiente()
+        self.base_url = os.getenv("API_URL")
+        logger.info(f"API BASE URL: {self.base_url}")
+
+        # Parametri del pool e limiti di concorrenza configurabili dai file .env.*
+        self.pool_maxsize = _env_int("API_POOL_MAXSIZE", 20)  # connessioni totali
+        self.pool_per_host = _env_int("API_POOL_PER_HOST", self.pool_maxsize)  # connessioni per host
+        self.max_concurrency = _env_int("API_MAX_CONCURRENCY", 100)  # richieste in volo contemporanee
+        self.keep_alive = _env_bool("API_KEEP_ALIVE", True)
+        self.keepalive_timeout = _env_float("API_KEEPALIVE_TIMEOUT", 30.0)
+        self.timeout = aiohttp.ClientTimeout(
+            sock_connect=_env_float("API_CONNECT_TIMEOUT", 3.0),
+            sock_read=_env_float("API_READ_TIMEOUT", 10.0),
+        )
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_volo = 0
+        self.cache = get_response_cache()  # Stessa cache di ApiService
+        self.metrics = get_metrics()  # Durate, errori e hit di cache per endpoint
+        self.resilienza = get_resilienza()  # Deadline del turno, retry e circuit breaker (condivisi con ApiService)
+        self._refresh_tasks = set()
+        self.bulk_supported = True  # diventa False se il backend non espone `prodotti/bulk`
+        # Catalogo locale: "fallback" se il backend non risponde, "local" per non usare il backend, "off"
+        self.catalog_mode = os.getenv("CATALOG_MODE", "fallback").strip().lower()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Crea la sessione (e il connettore con il pool) legata all'event loop corrente."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_maxsize,
+                limit_per_host=self.pool_per_host,
+                keepalive_timeout=self.keepalive_timeout if self.keep_alive else None,
+                force_close=not self.keep_alive,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Restituisce lo stato del pool asincrono e delle richieste in volo."""
+        stats = {
+            "pool_maxsize": self.pool_maxsize,
+            "pool_per_host": self.pool_per_host,
+            "max_concurrency": self.max_concurrency,
+            "richieste_in_volo": self._in_volo,
+            "connessioni_inattive": 0,
+        }
+        if self._session is not None and not self._session.closed:
+            connector = self._session.connector
+            stats["connessioni_inattive"] = sum(len(conns) for conns in connector._conns.values())
+        return stats
+
+    async def close(self):
+        """Chiude la sessione e tutte le connessioni del pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _chiama(self, method: str, endpoint: str, accetta=frozenset(), **kwargs) -> Tuple[Optional[int], Any]:
+        """Esegue una richiesta rispettando limite di concorrenza, budget del turno e circuit breaker.
+
+        Solo le GET vengono ritentate (backoff esponenziale con jitter) sugli errori temporanei.
+        Restituisce (status, JSON) se riuscita; (status, None) per gli status in `accetta`;
+        (None, None) se la chiamata non è andata a buon fine.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        session = self._get_session()
+        breaker = self.resilienza.breaker(endpoint)
+        tentativi = self.resilienza.tentativi if method == "GET" else 0
+        for tentativo in range(tentativi + 1):
+            timeout = self.resilienza.timeout(endpoint)
+            if timeout is None:
+                self.metrics.incrementa("api_deadline_exceeded_total", endpoint=endpoint)
+                logger.warning(f"Budget del turno esaurito: richiesta {method} a {url} non inviata")
+                return None, None
+            if not breaker.consenti():
+                self.metrics.incrementa("api_circuit_open_total", endpoint=endpoint)
+                logger.warning(f"Circuito aperto per {endpoint}: richiesta {method} non inviata")
+                return None, None
+            limite = aiohttp.ClientTimeout(total=timeout, sock_connect=min(self.timeout.sock_connect, timeout))
+            try:
+                async with self._semaphore:
+                    self._in_volo += 1
+                    try:
+                        with self.metrics.cronometra("api_request_duration_seconds", endpoint=endpoint, method=method):
+                            async with session.request(method, url, timeout=limite, **kwargs) as response:
+                                if response.status in accetta:
+                                    breaker.successo()
+                                    return response.status, None
+                                response.raise_for_status()
+                                dati = await response.json(content_type=None)
+                    finally:
+                        self._in_volo -= 1
+                breaker.successo()
+                return response.status, dati
+            except aiohttp.ClientResponseError as e:
+                errore = f"{e.status} {e.message}"
+                ritentabile = e.status in STATUS_RITENTABILI
+            except ValueError as e:
+                breaker.successo()  # il backend risponde, ma non con JSON valido
+                logger.error(f"Risposta non valida da {url}: {e}")
+                return None, None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                errore = repr(e)  # str() di un timeout è vuoto
+                ritentabile = True  # connessione rifiutata, timeout...
+            except BaseException:
+                # Cancellazione (client disconnesso, timeout del chiamante) o errore inatteso: senza
+                # esito, la chiamata di prova del circuito semi-aperto va liberata
+                breaker.rilascia()
+                raise
+            if ritentabile:
+                breaker.fallimento()
+            else:
+                breaker.successo()  # errore della richiesta (4xx), il backend risponde
+
+            attesa = self.resilienza.attesa(tentativo) if ritentabile and tentativo < tentativi else None
+            if attesa is None:
+                logger.error(f"Errore nella richiesta {method} a {url}: {errore}")
+                return None, None
+            self.metrics.incrementa("api_retries_total", endpoint=endpoint)
+            logger.warning(f"Errore nella richiesta {method} a {url}: {errore}, nuovo tentativo tra {attesa:.2f}s")
+            await asyncio.sleep(attesa)
+        return None, None
+
+    async def _request(self, method: str, endpoint: str, **kwargs):
+        """Esegue una richiesta e restituisce il JSON, None se non è andata a buon fine."""
+        _, dati = await self._chiama(method, endpoint, **kwargs)
+        return dati
+
+    def _prodotto_locale(self, categoria: str, nome_prodotto: str) -> Optional[Dict[str, Any]]:
+        """Prodotto dal catalogo locale nel formato dell'API, None se non trovato."""
+        prodotto = get_catalog().trova(categoria, nome_prodotto)
+        return prodotto.to_api() if prodotto else None
+
+    def _risposta_locale(self, endpoint: str, params: Optional[Dict[str, Any]] = None):
+        """Risposta dal catalogo locale per `prodotti`/`motori`, None se non disponibile."""
+        if self.catalog_mode == "off":
+            return None
+        return get_catalog().risposta_api(endpoint, params)
+
+    async def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, use_cache: bool = True):
+        """Effettua una richiesta GET all'API, servendo dalla cache le letture di catalogo."""
+        if params:
+            # aiohttp non accetta parametri None
+            params = {k: v for k, v in params.items() if v is not None}
+        if self.catalog_mode == "local":
+            locale = self._risposta_locale(endpoint, params)
+            if locale is not None:
+                return locale
+        if use_cache and self.cache.is_cacheable(endpoint):
+            valore, stato = self.cache.lookup(endpoint, params)
+            self.metrics.incrementa("api_cache_lookups_total", endpoint=endpoint, stato=stato)
+            if stato == FRESH:
+                return valore
+            if stato == STALE:
+                # stale-while-revalidate: rispondiamo subito e aggiorniamo in background
+                self._refresh_in_background(endpoint, params)
+                return valore
+            dati = await self._request("GET", endpoint, params=params)
+            if dati is None:
+                # Backend non disponibile: rispondiamo dal catalogo locale, senza salvare in cache
+                return self._risposta_locale(endpoint, params)
+            self.cache.store(endpoint, params, dati)
+            return dati
+        dati = await self._request("GET", endpoint, params=params)
+        return dati if dati is not None else self._risposta_locale(endpoint, params)
+
+    def _refresh_in_background(self, endpoint: str, params: Optional[Dict[str, Any]]):
+        """Aggiorna una voce scaduta della cache con un task sull'event loop corrente."""
+        if not self.cache.begin_refresh(endpoint, params):
+            return
+
+        async def _refresh():
+            try:
+                self.cache.store(endpoint, params, await self._request("GET", endpoint, params=params))
+            finally:
+                self.cache.end_refresh(endpoint, params)
+
+        task = asyncio.get_running_loop().create_task(_refresh())
+        # Manteniamo un riferimento al task finché non termina
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def post(self, endpoint: str, data: Dict[str, Any]):
+        """Effettua una richiesta POST all'API."""
+        return await self._request("POST", endpoint, json=data)
+
+    async def get_prodotti_bulk(self, coppie: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """Risolve molte coppie (categoria, nome_prodotto) con una sola richiesta all'API.
+
+        Restituisce il prodotto trovato (o None) per ogni coppia, nello stesso ordine.
+        Se il backend non supporta la ricerca bulk, le ricerche vengono eseguite in parallelo.
+        """
+        if self.catalog_mode == "local":
+            return [self._prodotto_locale(*coppia) for coppia in coppie]
+
+        risultati: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        mancanti = []
+        for coppia in dict.fromkeys(coppie):  # rimuove i duplicati mantenendo l'ordine
+            valore, stato = self.cache.lookup("prodotti", params_prodotto(*coppia))
+            self.metrics.incrementa("api_cache_lookups_total", endpoint="prodotti", stato=stato)
+            if stato == MISS:
+                mancanti.append(coppia)
+                continue
+            if stato == STALE:
+                self._refresh_in_background("prodotti", params_prodotto(*coppia))
+            risultati[coppia] = primo_prodotto(valore)
+
+        if mancanti:
+            trovati = await self._post_bulk(mancanti) if self.bulk_supported else None
+            if trovati is None:
+                risposte = await asyncio.gather(
+                    *(self.get("prodotti", params=params_prodotto(*coppia)) for coppia in mancanti)
+                )
+                trovati = {coppia: primo_prodotto(risposta) for coppia, risposta in zip(mancanti, risposte)}
+            risultati.update(trovati)
+        return [risultati.get(coppia) for coppia in coppie]
+
+    async def _post_bulk(self, coppie: List[Tuple[str, str]]) -> Optional[Dict[Tuple[str, str], Optional[Dict[str, Any]]]]:
+        """Esegue la POST `prodotti/bulk`; None se non è supportata o fallisce."""
+        status, dati = await self._chiama("POST", BULK_ENDPOINT, accetta=BULK_NON_SUPPORTATO, json=payload_bulk(coppie))
+        if status in BULK_NON_SUPPORTATO:
+            logger.info(f"Endpoint {BULK_ENDPOINT} non disponibile, uso richieste concorrenti")
+            self.bulk_supported = False
+            return None
+        if dati is None:
+            return None
+        try:
+            trovati = parse_bulk(dati, coppie)
+        except ValueError as e:
+            logger.error(f"Risposta non valida da {BULK_ENDPOINT}: {e}")
+            return None
+        for coppia, prodotto in trovati.items():
+            if prodotto is not None:
+                self.cache.store("prodotti", params_prodotto(*coppia), [prodotto])
+        return trovati
+
+    async def get_motori(self, potenza_min: int):
+        """Recupera i motori dalla API in base alla potenza minima"""
+        response = await self.get("motori", params={"potenza_min": potenza_min})
+        return response.get("prodotti", []) if isinstance(response, dict) else []
+
+    async def get_colori(self, materiale: str, use_cache: bool = True) -> List[str]:
+        """Nomi dei colori disponibili per il materiale (lista vuota se il backend non risponde)"""
+        response = await self.get("colori_tapparelle", params={"materiale": materiale}, use_cache=use_cache)
+        data = response.get("data", []) if isinstance(response, dict) else []
+        return [doc["color"].strip().lower() for doc in data if doc.get("color")]
+
+
+# Istanza condivisa a livello di processo, come per ApiService
+_async_api_service: Optional[AsyncApiService] = None
+
+
+def get_async_api_service() -> AsyncApiService:
+    """Restituisce l'istanza AsyncApiService condivisa dal processo."""
+    global _async_api_service
+    if _async_api_service is None:
+        _async_api_service = AsyncApiService()
+    return _async_api_service
@@ -0,0 +1,112 @@
+"""Avvio del server delle azioni: ambiente, logging e riscaldamento opzionale.
+
+`prepara_processo()` viene chiamata da actions/__init__.py, cioè quando rasa_sdk importa il
+package delle azioni, prima di aprire la porta. Con ACTION_WARMUP=true catalogo, indici, colori e
+client vengono caricati in quel momento, quindi prima che il server risulti pronto (/health), invece
+che durante le prime conversazioni. I moduli delle azioni non hanno altri effetti all'import.
+
+Uso: python -m utils.avvio  (tempi di ogni fase del riscaldamento)
+"""
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from utils.settings import carica_ambiente
+
+logger = logging.getLogger("Avvio")
+
+_preparato = False
+
+
+def _carica_catalogo():
+    from utils.catalog import get_catalog
+    get_catalog()
+
+
+def _carica_motori():
+    from utils.motor_selection import get_motor_selector
+    get_motor_selector()
+
+
+def _carica_ricerca():
+    from utils.search import get_search_index
+    get_search_index()
+
+
+def _carica_colori():
+    from utils.colori import get_colori_disponibili
+    get_colori_disponibili()
+
+
+def _carica_classificatore():
+    from utils.classifier import get_classifier
+    get_classifier()
+
+
+def _crea_client():
+    from utils.async_api_service import get_async_api_service
+    from utils.cache import get_response_cache
+    from utils.quote_cache import get_quote_cache
+    get_response_cache()
+    get_quote_cache()
+    get_async_api_service()
+
+
+# Fasi del riscaldamento, nell'ordine: ogni fase usa quanto caricato dalle precedenti
+FASI_RISCALDAMENTO = (
+    ("catalogo", _carica_catalogo),
+    ("motori", _carica_motori),
+    ("ricerca", _carica_ricerca),
+    ("classificatore", _carica_classificatore),
+    ("colori", _carica_colori),
+    ("client", _crea_client),
+)
+
+
+def riscalda() -> Dict[str, float]:
+    """Carica catalogo, indici e client condivisi. Restituisce la durata (s) di ogni fase.
+
+    Una fase che fallisce viene registrata nel log e saltata: il componente verrà
+    ricaricato (e l'errore riproposto) al primo utilizzo.
+    """
+    tempi = {}
+    for nome, carica in FASI_RISCALDAMENTO:
+        inizio = time.perf_counter()
+        try:
+            carica()
+        except Exception:
+            logger.exception(f"Riscaldamento: fase {nome} non riuscita")
+        tempi[nome] = time.perf_counter() - inizio
+    logger.info(
+        f"Riscaldamento completato in {sum(tempi.values()):.2f}s",
+        extra={"fasi": {nome: round(durata, 4) for nome, durata in tempi.items()}},
+    )
+    return tempi
+
+
+def prepara_processo(riscaldamento: Optional[bool] = None) -> Optional[Dict[str, float]]:
+    """Carica l'ambiente e avvia il logging; con ACTION_WARMUP=true (o `riscaldamento`) esegue riscalda().
+
+    Idempotente: le chiamate successive alla prima non fanno nulla.
+    """
+    global _preparato
+    if _preparato:
+        return None
+    _preparato = True
+
+    carica_ambiente()
+    from utils.logger import setup_logging
+    setup_logging()
+
+    if riscaldamento is None:
+        riscaldamento = os.getenv("ACTION_WARMUP", "false").strip().lower() in ("1", "true", "yes", "on")
+    return riscalda() if riscaldamento else None
+
+
+if __name__ == "__main__":
+    carica_ambiente()
+    tempi = riscalda()
+    for nome, durata in tempi.items():
+        print(f"{nome:<16}{durata * 1000:>10.1f} ms")
+    print(f"{'totale':<16}{sum(tempi.values()) * 1000:>10.1f} ms")
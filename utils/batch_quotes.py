@@ -0,0 +1,186 @@
+"""Calcolo batch dei preventivi da file CSV o JSONL di configurazioni.
+
+Ogni riga descrive una configurazione con i campi: id, tipo (preventivo o tapparella),
+dimensione, materiale, colore, motore, pulsante, accessori (lista JSON o separati da ';').
+
+Uso: python -m utils.batch_quotes ordini.csv preventivi.jsonl [--workers 16] [--dedupe-size 10000]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, Tuple, Optional
+
+from utils.async_api_service import get_async_api_service
+from utils.pricing import prezza_configurazione, chiave_configurazione, normalizza_configurazione
+
+logger = logging.getLogger("BatchQuotes")
+
+COLONNE_CSV = ["riga", "id", "tipo", "dimensione", "materiale", "colore", "motore", "prezzo_totale", "errore"]
+
+
+def leggi_configurazioni(percorso: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Legge le configurazioni una riga alla volta, senza caricare il file in memoria."""
+    with open(percorso, encoding="utf-8", newline="") as f:
+        if percorso.endswith(".csv"):
+            for riga, record in enumerate(csv.DictReader(f), start=1):
+                yield riga, record
+            return
+        for riga, linea in enumerate(f, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                record = json.loads(linea)
+            except ValueError:
+                yield riga, {"_errore": "JSON non valido"}
+                continue
+            # JSON valido ma non un oggetto ([1], "x", 3): non è una configurazione
+            yield riga, record if isinstance(record, dict) else {"_errore": "La riga non è un oggetto JSON"}
+
+
+class ScrittoreRisultati:
+    """Scrive i risultati su disco man mano che arrivano (JSONL o CSV in base all'estensione)."""
+
+    def __init__(self, percorso: str):
+        self._file = open(percorso, "w", encoding="utf-8", newline="")
+        self._csv = csv.DictWriter(self._file, fieldnames=COLONNE_CSV) if percorso.endswith(".csv") else None
+        if self._csv:
+            self._csv.writeheader()
+
+    def scrivi(self, riga: int, configurazione: Dict[str, Any], esito: Dict[str, Any]):
+        config = normalizza_configurazione(configurazione)
+        if self._csv:
+            motore = esito.get("motore")
+            self._csv.writerow({
+                "riga": riga,
+                "id": configurazione.get("id"),
+                "tipo": config["tipo"],
+                "dimensione": config["dimensione"],
+                "materiale": config["materiale"],
+                "colore": config["colore"],
+                "motore": motore.get("nome_prodotto") if isinstance(motore, dict) else config["motore"],
+                "prezzo_totale": esito.get("prezzo_totale"),
+                "errore": esito.get("errore"),
+            })
+        else:
+            self._file.write(json.dumps(
+                {"riga": riga, "id": configurazione.get("id"), "configurazione": config, "esito": esito},
+                ensure_ascii=False,
+            ) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+async def elabora_file(
+    input_path: str,
+    output_path: str,
+    workers: int = 16,
+    dedupe_size: int = 10000,
+    api=None,
+) -> Dict[str, int]:
+    """Prezza tutte le configurazioni di `input_path` e scrive i risultati in `output_path`.
+
+    La memoria resta costante: la coda tra lettura e calcolo è limitata, e i risultati
+    delle configurazioni già viste sono tenuti in una cache LRU di `dedupe_size` voci.
+    """
+    api = api or get_async_api_service()
+    coda: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    gia_prezzate: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+    in_corso: Dict[Tuple, asyncio.Future] = {}
+    stats = {"righe": 0, "prezzate": 0, "duplicate": 0, "errori": 0}
+    scrittore = ScrittoreRisultati(output_path)
+
+    async def prezza(configurazione: Dict[str, Any]) -> Dict[str, Any]:
+        """Prezza una configurazione, riusando il risultato delle configurazioni identiche."""
+        if "_errore" in configurazione:
+            return {"errore": configurazione["_errore"]}
+        chiave = chiave_configurazione(configurazione)
+        if chiave in gia_prezzate:
+            gia_prezzate.move_to_end(chiave)
+            stats["duplicate"] += 1
+            return gia_prezzate[chiave]
+        if chiave in in_corso:
+            # Configurazione identica già in calcolo su un altro worker
+            stats["duplicate"] += 1
+            return await in_corso[chiave]
+
+        futuro = asyncio.get_running_loop().create_future()
+        in_corso[chiave] = futuro
+        try:
+            esito = await prezza_configurazione(api, configurazione)
+        except Exception as e:
+            logger.exception("Errore nel calcolo del preventivo")
+            esito = {"errore": str(e)}
+        finally:
+            del in_corso[chiave]
+        futuro.set_result(esito)
+        stats["prezzate"] += 1
+        gia_prezzate[chiave] = esito
+        if len(gia_prezzate) > dedupe_size:
+            gia_prezzate.popitem(last=False)
+        return esito
+
+    async def worker():
+        while True:
+            elemento = await coda.get()
+            if elemento is None:
+                return
+            riga, configurazione = elemento
+            try:
+                esito = await prezza(configurazione)
+                if "errore" in esito:
+                    stats["errori"] += 1
+                scrittore.scrivi(riga, configurazione, esito)
+            except Exception as e:
+                # Una riga non valida diventa un errore nei risultati: il worker non deve terminare,
+                # altrimenti senza worker la lettura resta bloccata sulla coda piena
+                logger.exception(f"Errore alla riga {riga}")
+                stats["errori"] += 1
+                try:
+                    scrittore.scrivi(riga, {"id": None}, {"errore": str(e)})
+                except Exception:
+                    logger.exception(f"Impossibile scrivere l'errore della riga {riga}")
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        for riga, configurazione in leggi_configurazioni(input_path):
+            stats["righe"] += 1
+            await coda.put((riga, configurazione))
+        for _ in tasks:
+            await coda.put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        scrittore.close()
+    return stats
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, int]:
+    api = get_async_api_service()
+    if args.locale:
+        api.catalog_mode = "local"  # prezzi solo dal catalogo locale, senza backend
+    try:
+        return await elabora_file(args.input, args.output, args.workers, args.dedupe_size, api)
+    finally:
+        await api.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calcolo batch dei preventivi da CSV/JSONL")
+    parser.add_argument("input", help="file di configurazioni (.csv o .jsonl)")
+    parser.add_argument("output", help="file dei risultati (.csv o .jsonl)")
+    parser.add_argument("--workers", type=int, default=16, help="preventivi calcolati in parallelo")
+    parser.add_argument("--dedupe-size", type=int, default=10000, help="configurazioni recenti tenute per i duplicati")
+    parser.add_argument("--locale", action="store_true", help="usa solo il catalogo locale")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    inizio = time.perf_counter()
+    stats = asyncio.run(_main(args))
+    durata = time.perf_counter() - inizio
+    print(f"Righe: {stats['righe']} - prezzate: {stats['prezzate']} - duplicate: {stats['duplicate']} "
+          f"- errori: {stats['errori']} - {durata:.1f}s ({stats['righe'] / durata if durata else 0:.0f} righe/s)")
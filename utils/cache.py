@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Hashable
+
+# TTL di default (in secondi) per gli endpoint di catalogo: i dati cambiano raramente durante il giorno
+TTL_ENDPOINT = {
+    "prodotti": 15 * 60,
+    "motori": 15 * 60,
+    "varianti": 60 * 60,
+    "colori_tapparelle": 60 * 60,
+}
+
+# Stati restituiti da ResponseCache.lookup
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+def _normalizza_valore(valore: Any) -> Any:
+    """Normalizza un parametro: stringhe senza spazi e minuscole, numeri come float."""
+    if isinstance(valore, str):
+        return valore.strip().lower()
+    if isinstance(valore, bool):
+        return valore
+    if isinstance(valore, (int, float)):
+        return float(valore)
+    if isinstance(valore, (list, tuple)):
+        return tuple(_normalizza_valore(v) for v in valore)
+    return str(valore)
+
+
+def make_key(endpoint: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Hashable, ...]:
+    """Costruisce la chiave di cache a partire da endpoint e parametri normalizzati."""
+    if not params:
+        return (endpoint,)
+    normalizzati = tuple(sorted(
+        (str(k), _normalizza_valore(v)) for k, v in params.items() if v is not None
+    ))
+    return (endpoint, normalizzati)
+
+
+class ResponseCache:
+    """Cache read-through in memoria con TTL per endpoint, eviction LRU e stale-while-revalidate."""
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl_endpoint: Optional[Dict[str, float]] = None,
+        stale_window: float = 300.0,
+    ):
+        self.maxsize = maxsize
+        self.ttl_endpoint = dict(TTL_ENDPOINT if ttl_endpoint is None else ttl_endpoint)
+        self.stale_window = stale_window  # secondi in cui un dato scaduto può ancora essere servito
+        self._data: "OrderedDict[Tuple, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def is_cacheable(self, endpoint: str) -> bool:
+        """Indica se l'endpoint ha un TTL configurato (solo letture di catalogo)."""
+        return self.ttl_endpoint.get(endpoint, 0) > 0
+
+    def lookup(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, str]:
+        """Cerca una risposta in cache e restituisce (valore, stato) con stato FRESH, STALE o MISS."""
+        key = make_key(endpoint, params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, MISS
+            valore, scadenza = entry
+            if now < scadenza:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return valore, FRESH
+            if now < scadenza + self.stale_window:
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                return valore, STALE
+            # Troppo vecchio anche per stale-while-revalidate
+            del self._data[key]
+            self.misses += 1
+            return None, MISS
+
+    def store(self, endpoint: str, params: Optional[Dict[str, Any]], valore: Any):
+        """Salva una risposta applicando il TTL dell'endpoint ed evitando di superare maxsize."""
+        ttl = self.ttl_endpoint.get(endpoint, 0)
+        if ttl <= 0 or valore is None:
+            return
+        key = make_key(endpoint, params)
+        with self._lock:
+            self._data[key] = (valore, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def begin_refresh(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> bool:
+        """Registra un aggiornamento in background; False se ce n'è già uno in corso per la chiave."""
+        key = make_key(endpoint, params)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, endpoint: str, params: Optional[Dict[str, Any]] = None):
+        """Segnala la fine di un aggiornamento in background."""
+        with self._lock:
+            self._refreshing.discard(make_key(endpoint, params))
+
+    def invalidate(self, endpoint: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> int:
+        """Invalida una singola voce, tutte le voci di un endpoint o l'intera cache. Restituisce il numero di voci rimosse."""
+        with self._lock:
+            if endpoint is None:
+                rimosse = len(self._data)
+                self._data.clear()
+                return rimosse
+            if params is not None:
+                return 1 if self._data.pop(make_key(endpoint, params), None) is not None else 0
+            chiavi = [key for key in self._data if key[0] == endpoint]
+            for key in chiavi:
+                del self._data[key]
+            return len(chiavi)
+
+    def stats(self) -> Dict[str, Any]:
+        """Restituisce i contatori di hit/miss e l'occupazione della cache."""
+        with self._lock:
+            richieste = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hit_rate": (self.hits + self.stale_hits) / richieste if richieste else 0.0,
+            }
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Restituisce la cache delle risposte condivisa da ApiService e AsyncApiService."""
+    global _response_cache
+    if _response_cache is None:
+        ttl_endpoint = dict(TTL_ENDPOINT)
+        for endpoint in ttl_endpoint:
+            # Es. API_CACHE_TTL_VARIANTI=600, 0 per disabilitare la cache sull'endpoint
+            valore = os.getenv(f"API_CACHE_TTL_{endpoint.upper()}")
+            if valore is not None:
+                try:
+                    ttl_endpoint[endpoint] = float(valore)
+                except ValueError:
+                    pass
+        try:
+            maxsize = int(os.getenv("API_CACHE_MAXSIZE", 1024))
+            stale_window = float(os.getenv("API_CACHE_STALE_WINDOW", 300))
+        except ValueError:
+            maxsize, stale_window = 1024, 300.0
+        _response_cache = ResponseCache(maxsize=maxsize, ttl_endpoint=ttl_endpoint, stale_window=stale_window)
+    return _response_cache
@@ -1,39 +1,152 @@
+import bisect
 import re
-from typing import Optional
+from typing import Optional, Sequence, Dict, Any, List, Tuple, Union
 
-# Densità media dei materiali in kg/m²
+_numpy = None
+_numpy_cercato = False
+
+
+def get_numpy():
+    """Modulo NumPy, importato al primo calcolo batch; None se non è installato.
+
+    NumPy è opzionale (senza, i calcoli batch usano Python puro) e le azioni non lo usano:
+    importarlo con il modulo rallenterebbe l'avvio del server.
+    """
+    global _numpy, _numpy_cercato
+    if not _numpy_cercato:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = None
+        _numpy_cercato = True
+    return _numpy
+
+# Densità media dei materiali in kg/m², per codice materiale.
+# Tabella unica usata da tutte le azioni per stimare il peso della tapparella.
 DENSITA_MATERIALI = {
-    "PVC": 4.0,
-    "PVC Rinforzato": 5.0,
-    "Alluminio Coibentato": 5.5,
-    "Alluminio Estruso": 7.0,
-    "Acciaio Blindato": 8.5
+    "pvc": 4.0,
+    "pvc_rinforzato": 5.0,
+    "alluminio": 4.5,
+    "alluminio_coibentato": 5.5,
+    "alluminio_estruso": 7.0,
+    "acciaio": 7.0,
+    "acciaio_blindato": 8.5,
+}
+
+# Nomi alternativi con cui gli utenti indicano i materiali
+ALIAS_MATERIALI = {
+    "pvc_leggero": "pvc",
+    "plastica": "pvc",
+    "alluminio_coibentata": "alluminio_coibentato",
+    "acciaio_blindata": "acciaio_blindato",
 }
 
+MATERIALE_DEFAULT = "pvc"
+
+
+def codice_materiale(materiale: Optional[str]) -> Optional[str]:
+    """Normalizza il nome di un materiale (es. 'Alluminio Coibentato') nel suo codice ('alluminio_coibentato')."""
+    if not materiale:
+        return None
+    codice = re.sub(r"[\s_-]+", "_", str(materiale).strip().lower())
+    codice = ALIAS_MATERIALI.get(codice, codice)
+    return codice if codice in DENSITA_MATERIALI else None
+
+
 class Calculations:
     """Classe per il calcolo del peso della tapparella in base alle dimensioni e al materiale."""
 
     @staticmethod
-    def extract_dimensions(dimensione: str) -> Optional[tuple]:
-        """Estrae larghezza e altezza in metri dalla stringa dimensionale es. '120x150 cm'."""
-        match = re.search(r"(\d{2,3})x(\d{2,3})", dimensione)
-        if match:
-            larghezza = float(match.group(1)) / 100  # Conversione cm → m
-            altezza = float(match.group(2)) / 100    # Conversione cm → m
-            return larghezza, altezza
-        return None, None
+    def extract_dimensions(dimensione: Union[str, Tuple[int, int], None]) -> Optional[tuple]:
+        """Estrae larghezza e altezza in metri da una Dimensione o dal testo, es. '120x150 cm' o '1,2x1,5m'."""
+        # Import locale: utils.misure usa la tabella dei materiali di questo modulo
+        from utils.misure import Dimensione, parse_dimensione
+
+        if isinstance(dimensione, tuple):
+            dimensione = Dimensione(*dimensione)  # già interpretata (slot larghezza_cm, altezza_cm)
+        else:
+            dimensione = parse_dimensione(dimensione)
+        return dimensione.metri if dimensione else (None, None)
 
     @staticmethod
-    def estimate_weight(dimensione: str, materiale: str = "PVC") -> Optional[float]:
+    def densita(materiale: Optional[str]) -> float:
+        """Densità in kg/m² del materiale, PVC se non riconosciuto."""
+        return DENSITA_MATERIALI[codice_materiale(materiale) or MATERIALE_DEFAULT]
+
+    @staticmethod
+    def estimate_weight(dimensione: Union[str, Tuple[int, int]], materiale: str = "PVC") -> Optional[float]:
         """Stima il peso della tapparella in base alle dimensioni e al materiale."""
         larghezza, altezza = Calculations.extract_dimensions(dimensione)
         if not larghezza or not altezza:
             return None
 
         # Ottieni la densità del materiale, usa PVC come default se non specificato
-        densita = DENSITA_MATERIALI.get(materiale, 4.0)
+        densita = Calculations.densita(materiale)
 
         # Calcolo peso = larghezza * altezza * densità
         peso = larghezza * altezza * densita
 
         return round(peso, 2)  # Restituisce il peso arrotondato a 2 decimali
+
+    @staticmethod
+    def estimate_weights_batch(
+        larghezze_cm: Sequence[float],
+        altezze_cm: Sequence[float],
+        materiali: Sequence[Optional[str]],
+        use_numpy: bool = True,
+    ):
+        """Stima il peso (kg) di molte tapparelle in una sola chiamata.
+
+        Con NumPy disponibile restituisce un array, altrimenti una lista.
+        """
+        np = get_numpy() if use_numpy else None
+        if np is not None:
+            larghezze = np.asarray(larghezze_cm, dtype=np.float64)
+            altezze = np.asarray(altezze_cm, dtype=np.float64)
+            # Un solo lookup nella tabella per ogni materiale distinto
+            distinti, inverso = np.unique(np.asarray(materiali, dtype=object).astype(str), return_inverse=True)
+            densita = np.array([Calculations.densita(m) for m in distinti])[inverso]
+            return np.round(larghezze * altezze * densita / 10000.0, 2)
+
+        cache_densita: Dict[Optional[str], float] = {}
+        pesi = []
+        for larghezza, altezza, materiale in zip(larghezze_cm, altezze_cm, materiali):
+            if materiale not in cache_densita:
+                cache_densita[materiale] = Calculations.densita(materiale)
+            pesi.append(round(larghezza * altezza * cache_densita[materiale] / 10000.0, 2))
+        return pesi
+
+    @staticmethod
+    def batch_motor_quote(
+        larghezze_cm: Sequence[float],
+        altezze_cm: Sequence[float],
+        materiali: Sequence[Optional[str]],
+        use_numpy: bool = True,
+    ) -> Dict[str, List[Any]]:
+        """Per ogni apertura calcola peso, classe di coppia richiesta (Nm) e motore più economico.
+
+        Restituisce un dizionario di liste allineate: `peso`, `classe_nm` e `motore`
+        (Prodotto o None se nessun motore è adatto).
+        """
+        # Import locale: motor_selection dipende a sua volta da questo modulo
+        from utils.motor_selection import get_motor_selector, MARGINE_SICUREZZA
+
+        selector = get_motor_selector()
+        pesi = Calculations.estimate_weights_batch(larghezze_cm, altezze_cm, materiali, use_numpy)
+
+        np = get_numpy() if use_numpy else None
+        if np is not None:
+            richiesti = pesi * MARGINE_SICUREZZA
+            posizioni = np.searchsorted(np.asarray(selector.soglie, dtype=np.float64), richiesti, side="left")
+            posizioni = posizioni.tolist()
+            pesi = pesi.tolist()
+        else:
+            posizioni = [bisect.bisect_left(selector.soglie, peso * MARGINE_SICUREZZA) for peso in pesi]
+
+        fuori_scala = len(selector.motori)
+        return {
+            "peso": pesi,
+            "classe_nm": [selector.motori[i].coppia_nm if i < fuori_scala else None for i in posizioni],
+            "motore": [selector.piu_economico_in(i) for i in posizioni],
+        }
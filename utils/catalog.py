@@ -0,0 +1,336 @@
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Iterable, Optional, List, Tuple
+
+logger = logging.getLogger("Catalog")
+
+DATASET_DIR = os.path.join(os.path.dirname(__file__), "..", "dataset", "prodotti_per_categoria")
+# Snapshot binario del catalogo, compilato con `python -m utils.snapshot`
+SNAPSHOT_PATH = os.path.join(DATASET_DIR, "..", "catalogo.snap")
+
+# Marche riconosciute nei titoli, nelle descrizioni e nei link dei prodotti
+MARCHE = [
+    "Rollmatik", "Somfy", "Nice", "Bubendorff", "Gewiss", "Vimar", "ElettroCanali",
+    "Sonoff", "Shelly", "Duracell", "Evo",
+]
+
+_RE_COPPIA = re.compile(r"(\d+(?:[.,]\d+)?)\s*nm\b", re.IGNORECASE)
+_RE_PORTATA = re.compile(r"(\d+(?:[.,]\d+)?)\s*kg\b", re.IGNORECASE)
+_RE_MARCA = re.compile(r"\b(" + "|".join(MARCHE) + r")\b", re.IGNORECASE)
+
+
+def parse_prezzo(prezzo: Any) -> Optional[float]:
+    """Converte un prezzo nel formato del sito ("1.234,90") in float."""
+    if isinstance(prezzo, (int, float)):
+        return float(prezzo)
+    if not prezzo:
+        return None
+    try:
+        return float(str(prezzo).strip().replace("€", "").replace(".", "").replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _primo_numero(regex: re.Pattern, *testi: str) -> Optional[float]:
+    """Restituisce il primo numero catturato da `regex` cercando nei testi in ordine."""
+    for testo in testi:
+        match = regex.search(testo or "")
+        if match:
+            return float(match.group(1).replace(",", "."))
+    return None
+
+
+def estrai_marca(*testi: str) -> Optional[str]:
+    """Riconosce la marca del prodotto cercando nei testi in ordine."""
+    for testo in testi:
+        match = _RE_MARCA.search((testo or "").replace("_", " "))
+        if match:
+            trovata = match.group(1).lower()
+            return next(marca for marca in MARCHE if marca.lower() == trovata)
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class Prodotto:
+    """Record compatto di un prodotto del catalogo, con i valori numerici già estratti."""
+
+    id: int
+    categoria: str
+    nome: str
+    descrizione: str
+    prezzo: Optional[float]
+    coppia_nm: Optional[float]
+    portata_kg: Optional[float]
+    marca: Optional[str]
+    link: Optional[str]
+    image_url: Optional[str]
+
+    def to_api(self) -> Dict[str, Any]:
+        """Rappresentazione nel formato restituito dall'API dei prodotti."""
+        return {
+            "categoria": self.categoria,
+            "nome_prodotto": self.nome,
+            "descrizione": self.descrizione,
+            "prezzo_prodotto": self.prezzo,
+            "potenza_nm": self.coppia_nm,
+            "portata_kg": self.portata_kg,
+            "marca": self.marca,
+            "link": self.link,
+            "image_url": self.image_url,
+        }
+
+
+def file_dataset(dataset_dir: str) -> Dict[str, float]:
+    """Restituisce i file JSON del dataset con la data di ultima modifica, in ordine di nome."""
+    mtimes = {}
+    if not os.path.isdir(dataset_dir):
+        return mtimes
+    for nome_file in sorted(os.listdir(dataset_dir)):
+        if nome_file.endswith(".json"):
+            percorso = os.path.join(dataset_dir, nome_file)
+            mtimes[percorso] = os.path.getmtime(percorso)
+    return mtimes
+
+
+def leggi_dataset(percorsi: Iterable[str]) -> List[Prodotto]:
+    """Legge i JSON del dataset (una categoria per file) e restituisce i prodotti, senza duplicati."""
+    prodotti: List[Prodotto] = []
+    visti = set()
+    for percorso in percorsi:
+        categoria = os.path.splitext(os.path.basename(percorso))[0]
+        try:
+            with open(percorso, encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Impossibile leggere {percorso}: {e}")
+            continue
+        for item in items:
+            titolo = (item.get("title") or "").strip()
+            descrizione = (item.get("description") or "").strip()
+            link = item.get("link")
+            # Il dataset contiene pagine duplicate: teniamo un solo record per link
+            chiave = (categoria, link or titolo)
+            if not titolo or chiave in visti:
+                continue
+            visti.add(chiave)
+            prodotti.append(Prodotto(
+                id=len(prodotti),
+                categoria=categoria,
+                nome=titolo,
+                descrizione=descrizione,
+                prezzo=parse_prezzo(item.get("price")),
+                coppia_nm=_primo_numero(_RE_COPPIA, titolo, descrizione),
+                portata_kg=_primo_numero(_RE_PORTATA, titolo, descrizione),
+                marca=estrai_marca(titolo, descrizione, link),
+                link=link,
+                image_url=item.get("image_url"),
+            ))
+    return prodotti
+
+
+class _Indici:
+    """Prodotti e indici costruiti da un singolo caricamento del dataset (immutabili dopo la creazione)."""
+
+    def __init__(self, prodotti: List[Prodotto]):
+        self.prodotti = prodotti
+        self.per_categoria: Dict[str, List[Prodotto]] = {}
+        self.per_marca: Dict[str, List[Prodotto]] = {}
+        self.per_nome: Dict[Tuple[str, str], Prodotto] = {}
+        for prodotto in prodotti:
+            self.per_categoria.setdefault(prodotto.categoria, []).append(prodotto)
+            if prodotto.marca:
+                self.per_marca.setdefault(prodotto.marca.lower(), []).append(prodotto)
+            self.per_nome.setdefault((prodotto.categoria, prodotto.nome.lower()), prodotto)
+
+        # Prodotti con coppia nota ordinati per Nm, per ricerche con bisect
+        con_coppia = sorted((p for p in prodotti if p.coppia_nm is not None), key=lambda p: (p.coppia_nm, p.prezzo or 0))
+        self.per_coppia = con_coppia
+        self.chiavi_coppia = [p.coppia_nm for p in con_coppia]
+
+
+class Catalog:
+    """Catalogo prodotti in memoria costruito dai JSON di dataset/prodotti_per_categoria (o dal loro snapshot)."""
+
+    def __init__(self, dataset_dir: str = DATASET_DIR, check_interval: float = 30.0, snapshot_path: Optional[str] = None):
+        self.dataset_dir = dataset_dir
+        self.check_interval = check_interval  # secondi tra due controlli delle modifiche ai file
+        self.snapshot_path = snapshot_path  # snapshot binario compilato dal dataset (None = solo JSON)
+        self.version = 0  # incrementata a ogni ricaricamento
+        self._mtimes: Dict[str, float] = {}
+        self._snapshot_mtime: Optional[float] = None
+        self._impronta_snapshot: Optional[bytes] = None  # impronta dello snapshot caricato (None = JSON)
+        self._ultimo_controllo = 0.0
+        self._lock = threading.Lock()
+        self._indici = _Indici([])
+        self.load()
+
+    def _file_dataset(self) -> Dict[str, float]:
+        return file_dataset(self.dataset_dir)
+
+    def load(self):
+        """Carica (o ricarica) il catalogo e ricostruisce gli indici.
+
+        Se lo snapshot binario (vedi utils/snapshot.py) è stato compilato dagli stessi file del
+        dataset viene aperto con mmap, senza leggere i JSON; altrimenti i JSON vengono letti.
+        """
+        with self._lock:
+            mtimes = self._file_dataset()
+            snapshot_mtime = self._mtime_snapshot()
+            caricato = self._carica_snapshot(list(mtimes)) if snapshot_mtime is not None else None
+            origine = "snapshot" if caricato is not None else "JSON"
+            prodotti, impronta = caricato if caricato is not None else (leggi_dataset(mtimes), None)
+            # Sostituzione atomica: le letture in corso continuano a usare i vecchi indici
+            self._indici = _Indici(prodotti)
+            self._mtimes = mtimes
+            self._snapshot_mtime = snapshot_mtime
+            self._impronta_snapshot = impronta
+            self._ultimo_controllo = time.monotonic()
+            self.version += 1
+        logger.info(f"Catalogo caricato da {origine}: {len(prodotti)} prodotti (versione {self.version})")
+
+    def _mtime_snapshot(self) -> Optional[float]:
+        if not self.snapshot_path:
+            return None
+        try:
+            return os.path.getmtime(self.snapshot_path)
+        except OSError:
+            return None
+
+    def _carica_snapshot(self, percorsi: List[str]) -> Optional[Tuple[List[Prodotto], bytes]]:
+        """Prodotti e impronta dello snapshot, None se non è valido o non corrisponde ai file del dataset."""
+        from utils.snapshot import apri_snapshot, impronta_dataset
+        try:
+            snapshot = apri_snapshot(self.snapshot_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Snapshot del catalogo non utilizzabile ({self.snapshot_path}): {e}")
+            return None
+        # Senza i JSON (es. immagine con il solo snapshot) lo snapshot è l'unica fonte
+        if percorsi and snapshot.impronta != impronta_dataset(percorsi):
+            logger.warning("Snapshot del catalogo non aggiornato rispetto al dataset: uso i JSON")
+            return None
+        return snapshot.prodotti(), snapshot.impronta
+
+    def reload_if_changed(self, force_check: bool = False) -> bool:
+        """Ricarica il catalogo se i file del dataset o lo snapshot sono cambiati. Restituisce True se ricaricato."""
+        now = time.monotonic()
+        if not force_check and now - self._ultimo_controllo < self.check_interval:
+            return False
+        self._ultimo_controllo = now
+        if self._file_dataset() == self._mtimes and self._mtime_snapshot() == self._snapshot_mtime:
+            return False
+        self.load()
+        return True
+
+    def firma(self) -> Tuple[Tuple[str, Any], ...]:
+        """File del dataset caricati e loro data di modifica, per validare gli indici salvati su disco.
+
+        Con il catalogo letto dallo snapshot ne include l'impronta e il numero di prodotti: senza i
+        JSON (solo snapshot) i file del dataset non ci sono e la firma sarebbe sempre vuota.
+        """
+        firma = tuple((os.path.basename(percorso), mtime) for percorso, mtime in self._mtimes.items())
+        if self._impronta_snapshot is not None:
+            firma += (("snapshot", self._impronta_snapshot.hex()), ("prodotti", len(self.prodotti)))
+        return firma
+
+    @property
+    def prodotti(self) -> List[Prodotto]:
+        return self._indici.prodotti
+
+    def categorie(self) -> List[str]:
+        return list(self._indici.per_categoria)
+
+    def per_marca(self, marca: str) -> List[Prodotto]:
+        """Prodotti di una marca (confronto case-insensitive)."""
+        self.reload_if_changed()
+        return list(self._indici.per_marca.get(marca.lower(), []))
+
+    def per_coppia(self, coppia_min: float, categoria: Optional[str] = "motori") -> List[Prodotto]:
+        """Prodotti con coppia almeno `coppia_min` Nm, ordinati per coppia crescente."""
+        self.reload_if_changed()
+        indici = self._indici
+        inizio = bisect.bisect_left(indici.chiavi_coppia, coppia_min)
+        return [p for p in indici.per_coppia[inizio:] if categoria is None or p.categoria == categoria]
+
+    def trova(self, categoria: str, nome_prodotto: str) -> Optional[Prodotto]:
+        """Cerca un prodotto per nome: prima la corrispondenza esatta, poi per sottostringa."""
+        risultati = self.query(categoria=categoria, nome_prodotto=nome_prodotto)
+        return risultati[0] if risultati else None
+
+    def query(
+        self,
+        categoria: Optional[str] = None,
+        nome_prodotto: Optional[str] = None,
+        potenza_min: Optional[float] = None,
+        marca: Optional[str] = None,
+    ) -> List[Prodotto]:
+        """Filtra il catalogo combinando categoria, nome, coppia minima (Nm) e marca."""
+        self.reload_if_changed()
+        indici = self._indici
+        if potenza_min is not None:
+            candidati = self.per_coppia(float(potenza_min), categoria)
+        elif categoria:
+            candidati = indici.per_categoria.get(categoria, [])
+        else:
+            candidati = indici.prodotti
+
+        if marca:
+            candidati = [p for p in candidati if p.marca and p.marca.lower() == marca.lower()]
+
+        if nome_prodotto:
+            nome = nome_prodotto.strip().lower()
+            if categoria and potenza_min is None and not marca:
+                esatto = indici.per_nome.get((categoria, nome))
+                if esatto is not None:
+                    return [esatto]
+            esatti = [p for p in candidati if p.nome.lower() == nome]
+            candidati = esatti or [p for p in candidati if nome in p.nome.lower()]
+        return list(candidati)
+
+    def risposta_api(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Risponde localmente alle GET `prodotti` e `motori` nello stesso formato dell'API.
+
+        Restituisce None se l'endpoint non è servibile dal catalogo locale.
+        """
+        params = params or {}
+        potenza_min = params.get("potenza_min")
+        try:
+            potenza_min = float(potenza_min) if potenza_min is not None else None
+        except (TypeError, ValueError):
+            potenza_min = None
+
+        if endpoint == "prodotti":
+            risultati = self.query(
+                categoria=params.get("categoria"),
+                nome_prodotto=params.get("nome_prodotto"),
+                potenza_min=potenza_min,
+                marca=params.get("marca"),
+            )
+            return [p.to_api() for p in risultati]
+        if endpoint == "motori":
+            risultati = self.query(categoria="motori", potenza_min=potenza_min, marca=params.get("marca"))
+            return {"prodotti": [p.to_api() for p in risultati]}
+        return None
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """Restituisce il catalogo condiviso dal processo, caricandolo al primo utilizzo."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog(
+                    dataset_dir=os.getenv("CATALOG_DIR", DATASET_DIR),
+                    check_interval=float(os.getenv("CATALOG_CHECK_INTERVAL", 30)),
+                    snapshot_path=os.getenv("CATALOG_SNAPSHOT", SNAPSHOT_PATH) or None,
+                )
+    return _catalog
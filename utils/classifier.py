@@ -0,0 +1,229 @@
+import threading
+import unicodedata
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+
+from utils.catalog import Prodotto, get_catalog
+from utils.query_definitions import CATEGORIE
+
+# Lunghezza degli n-grammi dell'indice per la ricerca approssimata
+NGRAM = 3
+# Similarità minima (coefficiente di Dice sugli n-grammi) per una corrispondenza approssimata
+SOGLIA_FUZZY = 0.6
+# Parole più corte di così non vengono cercate in modo approssimato (troppi falsi positivi)
+MIN_LUNGHEZZA_FUZZY = 4
+# Peso di una corrispondenza con il titolo completo di un prodotto rispetto a una parola chiave
+PESO_TITOLO = 3.0
+
+
+def _normalizza_carattere(carattere: str) -> str:
+    """Un carattere minuscolo senza accenti; spazio per tutto ciò che non è lettera o cifra."""
+    base = unicodedata.normalize("NFKD", carattere)[0].casefold()[:1]
+    return base if base.isalnum() else " "
+
+
+def normalizza(testo: str) -> str:
+    """Minuscole e senza accenti, con la stessa lunghezza del testo originale.
+
+    Mantenere le posizioni permette di riportare le corrispondenze sul testo del messaggio.
+    """
+    return "".join(_normalizza_carattere(c) for c in testo)
+
+
+def ngrammi(parola: str, n: int = NGRAM) -> Counter:
+    """N-grammi della parola con bordi, es. 'kit' → ' ki', 'kit', 'it '."""
+    parola = f" {parola} "
+    return Counter(parola[i:i + n] for i in range(max(len(parola) - n + 1, 1)))
+
+
+@dataclass(frozen=True)
+class Corrispondenza:
+    """Una parola chiave (o titolo) trovata nel testo."""
+
+    categoria: str
+    termine: str  # termine del dizionario riconosciuto
+    inizio: int
+    fine: int
+    peso: float = 1.0
+    similarita: float = 1.0  # 1.0 per le corrispondenze esatte
+
+
+class KeywordAutomaton:
+    """Automa di Aho-Corasick: trova tutte le parole chiave in un solo passaggio sul testo."""
+
+    def __init__(self, termini: Iterable[Tuple[str, Any]]):
+        # Stato 0 è la radice; per ogni stato: transizioni, stato di fallimento e uscite
+        self._transizioni: List[Dict[str, int]] = [{}]
+        self._fallimento: List[int] = [0]
+        self._uscite: List[List[Tuple[int, Any]]] = [[]]
+        for termine, valore in termini:
+            self._aggiungi(termine, valore)
+        self._collega()
+
+    def _aggiungi(self, termine: str, valore: Any):
+        stato = 0
+        for carattere in termine:
+            if carattere not in self._transizioni[stato]:
+                self._transizioni.append({})
+                self._fallimento.append(0)
+                self._uscite.append([])
+                self._transizioni[stato][carattere] = len(self._transizioni) - 1
+            stato = self._transizioni[stato][carattere]
+        self._uscite[stato].append((len(termine), valore))
+
+    def _collega(self):
+        """Calcola i collegamenti di fallimento in ampiezza e unisce le uscite dei suffissi."""
+        coda = deque(self._transizioni[0].values())
+        while coda:
+            stato = coda.popleft()
+            for carattere, figlio in self._transizioni[stato].items():
+                coda.append(figlio)
+                ripiego = self._fallimento[stato]
+                while ripiego and carattere not in self._transizioni[ripiego]:
+                    ripiego = self._fallimento[ripiego]
+                # I figli della radice ripiegano sempre sulla radice
+                self._fallimento[figlio] = self._transizioni[ripiego].get(carattere, 0) if stato else 0
+                self._uscite[figlio] = self._uscite[figlio] + self._uscite[self._fallimento[figlio]]
+
+    def cerca(self, testo: str) -> Iterator[Tuple[int, int, Any]]:
+        """Restituisce (inizio, fine, valore) per ogni termine che compare come parola intera."""
+        stato = 0
+        for i, carattere in enumerate(testo):
+            while stato and carattere not in self._transizioni[stato]:
+                stato = self._fallimento[stato]
+            stato = self._transizioni[stato].get(carattere, 0)
+            for lunghezza, valore in self._uscite[stato]:
+                inizio, fine = i - lunghezza + 1, i + 1
+                if (inizio == 0 or testo[inizio - 1] == " ") and (fine == len(testo) or testo[fine] == " "):
+                    yield inizio, fine, valore
+
+
+class NgramIndex:
+    """Indice invertito degli n-grammi, per la ricerca approssimata senza confronti a coppie."""
+
+    def __init__(self, termini: Iterable[str], n: int = NGRAM):
+        self.n = n
+        self.termini: List[str] = []
+        self._dimensioni: List[int] = []
+        self._liste: Dict[str, List[Tuple[int, int]]] = {}
+        for termine in dict.fromkeys(termini):
+            indice = len(self.termini)
+            grammi = ngrammi(termine, n)
+            self.termini.append(termine)
+            self._dimensioni.append(sum(grammi.values()))
+            for grammo, conteggio in grammi.items():
+                self._liste.setdefault(grammo, []).append((indice, conteggio))
+
+    def simili(self, testo: str, soglia: float = SOGLIA_FUZZY, n: int = 5) -> List[Tuple[str, float]]:
+        """Termini con similarità di Dice ≥ `soglia`, dal più simile.
+
+        Vengono confrontati solo i termini che condividono almeno un n-gramma con il testo.
+        """
+        grammi = ngrammi(testo, self.n)
+        dimensione = sum(grammi.values())
+        comuni: Counter = Counter()
+        for grammo, conteggio in grammi.items():
+            for indice, conteggio_termine in self._liste.get(grammo, ()):
+                comuni[indice] += min(conteggio, conteggio_termine)
+        risultati = []
+        for indice, condivisi in comuni.items():
+            similarita = 2 * condivisi / (dimensione + self._dimensioni[indice])
+            if similarita >= soglia:
+                risultati.append((self.termini[indice], similarita))
+        risultati.sort(key=lambda r: (-r[1], r[0]))
+        return risultati[:n]
+
+
+class CategoryClassifier:
+    """Classificatore delle categorie dalle parole chiave di CATEGORIE e dai titoli del catalogo.
+
+    Le parole chiave e i titoli sono compilati in un unico automa (ricerca esatta in un solo
+    passaggio); le parole del messaggio non riconosciute sono cercate nell'indice di n-grammi.
+    """
+
+    def __init__(self, categorie: Dict[str, List[str]] = CATEGORIE, prodotti: Iterable[Prodotto] = ()):
+        # Ordine delle categorie in CATEGORIE = priorità a parità di punteggio
+        self.priorita = {categoria: i for i, categoria in enumerate(categorie)}
+        self.parole: Dict[str, List[str]] = {}
+        for categoria, parole_chiave in categorie.items():
+            for parola in parole_chiave:
+                self.parole.setdefault(" ".join(normalizza(parola).split()), []).append(categoria)
+        self.titoli: Dict[str, List[Prodotto]] = {}
+        for prodotto in prodotti:
+            titolo = " ".join(normalizza(prodotto.nome).split())
+            if titolo:
+                self.titoli.setdefault(titolo, []).append(prodotto)
+
+        termini = [(parola, ("parola", parola)) for parola in self.parole]
+        termini += [(titolo, ("titolo", titolo)) for titolo in self.titoli]
+        self.automa = KeywordAutomaton(termini)
+        self.indice_parole = NgramIndex(p for p in self.parole if len(p) >= MIN_LUNGHEZZA_FUZZY)
+        self.indice_titoli = NgramIndex(self.titoli)
+
+    def trova(self, testo: str, fuzzy: bool = True) -> List[Corrispondenza]:
+        """Tutte le corrispondenze nel testo, esatte e (se `fuzzy`) approssimate."""
+        normalizzato = normalizza(testo)
+        risultati: List[Corrispondenza] = []
+        coperti = set()
+        for inizio, fine, (tipo, termine) in self.automa.cerca(normalizzato):
+            coperti.update(range(inizio, fine))
+            if tipo == "parola":
+                risultati.extend(Corrispondenza(c, termine, inizio, fine) for c in self.parole[termine])
+            else:
+                risultati.extend(
+                    Corrispondenza(p.categoria, termine, inizio, fine, PESO_TITOLO) for p in self.titoli[termine]
+                )
+        if not fuzzy:
+            return risultati
+
+        # Parole non riconosciute in modo esatto: ricerca approssimata (es. errori di battitura)
+        inizio = 0
+        for parola in normalizzato.split(" "):
+            fine = inizio + len(parola)
+            if len(parola) >= MIN_LUNGHEZZA_FUZZY and inizio not in coperti:
+                for termine, similarita in self.indice_parole.simili(parola, n=1):
+                    risultati.extend(
+                        Corrispondenza(c, termine, inizio, fine, similarita, similarita) for c in self.parole[termine]
+                    )
+            inizio = fine + 1
+        return risultati
+
+    def classifica(self, testo: str, fuzzy: bool = True) -> List[Tuple[str, float]]:
+        """Categorie del testo con il loro punteggio, dalla più probabile."""
+        punteggi: Dict[str, float] = {}
+        for corrispondenza in self.trova(testo, fuzzy):
+            punteggi[corrispondenza.categoria] = punteggi.get(corrispondenza.categoria, 0) + corrispondenza.peso
+        return sorted(punteggi.items(), key=lambda p: (-p[1], self.priorita.get(p[0], len(self.priorita)), p[0]))
+
+    def categoria(self, testo: str, fuzzy: bool = True) -> Optional[str]:
+        """La categoria più probabile del testo, None se non ci sono corrispondenze."""
+        classifica = self.classifica(testo, fuzzy)
+        return classifica[0][0] if classifica else None
+
+    def prodotti_simili(self, testo: str, n: int = 5, soglia: float = 0.5) -> List[Tuple[Prodotto, float]]:
+        """Prodotti del catalogo con il titolo più simile al testo."""
+        titolo = " ".join(normalizza(testo).split())
+        return [
+            (prodotto, similarita)
+            for termine, similarita in self.indice_titoli.simili(titolo, soglia, n)
+            for prodotto in self.titoli[termine]
+        ][:n]
+
+
+_classifier: Optional[CategoryClassifier] = None
+_classifier_version = -1
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> CategoryClassifier:
+    """Restituisce il classificatore, ricompilato quando cambia la versione del catalogo."""
+    global _classifier, _classifier_version
+    catalogo = get_catalog()
+    catalogo.reload_if_changed()
+    if _classifier is None or _classifier_version != catalogo.version:
+        with _classifier_lock:
+            if _classifier is None or _classifier_version != catalogo.version:
+                _classifier = CategoryClassifier(CATEGORIE, catalogo.prodotti)
+                _classifier_version = catalogo.version
+    return _classifier
@@ -0,0 +1,285 @@
+"""Disponibilità dei colori delle tapparelle per materiale.
+
+Indice materiale → insieme dei colori, caricato da dataset/colori_tapparelle.json (prodotto dallo
+scraper) e aggiornato in background dall'API (`colori_tapparelle`). La verifica di un colore è un
+lookup in un set, senza chiamate al backend durante la conversazione; per i nomi quasi giusti
+(es. "grigio antracit") vengono proposti i colori più simili con l'indice di n-grammi.
+
+Uso: python -m utils.colori [materiale] [colore]
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from scraper.config import COLORI_FILE
+from utils.calculation import DENSITA_MATERIALI, codice_materiale
+from utils.classifier import NgramIndex, normalizza
+from utils.metrics import get_metrics
+
+logger = logging.getLogger("Colori")
+
+# Similarità minima per proporre un colore a chi ne ha scritto uno non disponibile
+SOGLIA_SUGGERIMENTI = 0.45
+MAX_SUGGERIMENTI = 3
+
+
+def chiave_materiale(materiale: Optional[str]) -> Optional[str]:
+    """Codice del materiale ('Alluminio Coibentato' → 'alluminio_coibentato'), anche se non ha una densità nota."""
+    if not materiale:
+        return None
+    return codice_materiale(materiale) or "_".join(normalizza(str(materiale)).split()) or None
+
+
+def chiave_colore(colore: Optional[str]) -> str:
+    """Nome del colore confrontabile: minuscole, senza accenti né spazi ripetuti."""
+    return " ".join(normalizza(str(colore or "")).split())
+
+
+def leggi_file_colori(percorso: str = COLORI_FILE) -> Dict[str, List[str]]:
+    """Colori per materiale salvati dallo scraper; dizionario vuoto se il file manca o non è valido."""
+    try:
+        with open(percorso, encoding="utf-8") as f:
+            dati = json.load(f)
+        return {m.strip().lower(): [c.strip().lower() for c in lista if c.strip()] for m, lista in dati.items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+class IndiceColori:
+    """Istantanea immutabile dei colori per materiale: viene sostituita per intero a ogni aggiornamento."""
+
+    def __init__(self, colori: Dict[str, Iterable[str]]):
+        self.nomi: Dict[str, str] = {}  # chiave del colore → nome da mostrare
+        self.materiali: Dict[str, str] = {}  # chiave del materiale → nome da mostrare
+        self.ordinati: Dict[str, List[str]] = {}  # chiavi dei colori nell'ordine del catalogo
+        self.per_materiale: Dict[str, FrozenSet[str]] = {}
+        for materiale, lista in colori.items():
+            chiave = chiave_materiale(materiale)
+            chiavi = []
+            for colore in lista:
+                chiave_c = chiave_colore(colore)
+                if chiave_c:
+                    self.nomi.setdefault(chiave_c, str(colore).strip().lower())
+                    chiavi.append(chiave_c)
+            if not chiave or not chiavi:
+                continue
+            self.materiali[chiave] = str(materiale).strip().lower().replace("_", " ")
+            self.ordinati[chiave] = list(dict.fromkeys(chiavi))
+            self.per_materiale[chiave] = frozenset(chiavi)
+        self.tutti: FrozenSet[str] = frozenset(self.nomi)
+        self._ngrammi: Dict[Optional[str], NgramIndex] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.per_materiale)
+
+    def colori(self, materiale: Optional[str] = None) -> FrozenSet[str]:
+        """Colori ammessi per il materiale; tutti i colori noti se il materiale è assente o sconosciuto."""
+        return self.per_materiale.get(chiave_materiale(materiale), self.tutti)
+
+    def indice_ngrammi(self, materiale: Optional[str] = None) -> NgramIndex:
+        """Indice di n-grammi dei colori del materiale, costruito alla prima richiesta di suggerimenti."""
+        chiave = chiave_materiale(materiale)
+        chiave = chiave if chiave in self.per_materiale else None
+        indice = self._ngrammi.get(chiave)
+        if indice is None:
+            with self._lock:
+                indice = self._ngrammi.get(chiave)
+                if indice is None:
+                    ordine = self.ordinati.get(chiave) or sorted(self.tutti)
+                    indice = self._ngrammi[chiave] = NgramIndex(ordine)
+        return indice
+
+
+class ColoriDisponibili:
+    """Servizio dei colori disponibili, condiviso dal processo.
+
+    Le letture (`ammesso`, `disponibili`, `suggerimenti`) usano solo l'indice in memoria. L'indice
+    viene ricaricato dal file dello scraper quando cambia e aggiornato dall'API, con un task
+    sull'event loop, quando è più vecchio di `intervallo` secondi.
+    """
+
+    def __init__(self, percorso: str = COLORI_FILE, intervallo: float = 600.0, check_interval: float = 30.0):
+        self.percorso = percorso
+        self.intervallo = intervallo  # secondi tra due aggiornamenti dall'API
+        self.check_interval = check_interval  # secondi tra due controlli del file dello scraper
+        self.version = 0
+        self._indice = IndiceColori({})
+        self._da_file: Dict[str, List[str]] = {}
+        self._da_api: Dict[str, List[str]] = {}
+        self._mtime: Optional[float] = None
+        self._ultimo_controllo = 0.0
+        self._ultimo_aggiornamento: Optional[float] = None  # monotonic dell'ultimo aggiornamento dall'API
+        self._aggiornamento: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self.metrics = get_metrics()
+        self.carica_file()
+
+    # --- Caricamento ---
+
+    def _mtime_file(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.percorso)
+        except OSError:
+            return None
+
+    def _ricostruisci(self):
+        """Sostituisce l'indice: i colori dell'API prevalgono su quelli del file per lo stesso materiale."""
+        colori = dict(self._da_file)
+        for materiale, lista in self._da_api.items():
+            colori.pop(next((m for m in colori if chiave_materiale(m) == chiave_materiale(materiale)), None), None)
+            colori[materiale] = lista
+        self._indice = IndiceColori(colori)
+        self.version += 1
+
+    def carica_file(self) -> bool:
+        """Legge il file dello scraper. Restituisce True se conteneva colori."""
+        with self._lock:
+            self._mtime = self._mtime_file()
+            self._ultimo_controllo = time.monotonic()
+            self._da_file = leggi_file_colori(self.percorso)
+            self._ricostruisci()
+        logger.info(f"Colori caricati da file: {len(self._da_file)} materiali (versione {self.version})")
+        return bool(self._da_file)
+
+    def reload_if_changed(self, force_check: bool = False) -> bool:
+        """Ricarica il file dello scraper se è cambiato. Restituisce True se ricaricato."""
+        now = time.monotonic()
+        if not force_check and now - self._ultimo_controllo < self.check_interval:
+            return False
+        self._ultimo_controllo = now
+        if self._mtime_file() == self._mtime:
+            return False
+        self.carica_file()
+        return True
+
+    def materiali_da_aggiornare(self) -> List[str]:
+        """Materiali da chiedere all'API: quelli già noti più quelli del calcolo del peso."""
+        materiali = dict.fromkeys(self._indice.materiali.values())
+        materiali.update((codice.replace("_", " "), None) for codice in DENSITA_MATERIALI)
+        return list(materiali)
+
+    async def aggiorna(self, client) -> int:
+        """Interroga l'API per tutti i materiali e sostituisce l'indice. Restituisce i materiali aggiornati.
+
+        I materiali per cui l'API non risponde (o non restituisce colori) mantengono i colori già noti.
+        """
+        materiali = self.materiali_da_aggiornare()
+        risposte = await asyncio.gather(*(client.get_colori(m, use_cache=False) for m in materiali), return_exceptions=True)
+        aggiornati = {m: colori for m, colori in zip(materiali, risposte) if isinstance(colori, list) and colori}
+        falliti = len(materiali) - len(aggiornati)
+        with self._lock:
+            self._da_api.update(aggiornati)
+            self._ultimo_aggiornamento = time.monotonic()
+            self._ricostruisci()
+        esito = "ok" if not falliti else ("parziale" if aggiornati else "errore")
+        self.metrics.incrementa("colori_refresh_total", esito=esito)
+        log = logger.info if esito == "ok" else logger.warning
+        log(f"Colori aggiornati dall'API: {len(aggiornati)} materiali, {falliti} senza colori (versione {self.version})")
+        return len(aggiornati)
+
+    def _scaduto(self) -> bool:
+        return self._ultimo_aggiornamento is None or time.monotonic() - self._ultimo_aggiornamento >= self.intervallo
+
+    def _avvia_aggiornamento(self, client) -> asyncio.Task:
+        """Un solo aggiornamento alla volta: le richieste concorrenti riusano il task in corso."""
+        if self._aggiornamento is None or self._aggiornamento.done():
+            self._aggiornamento = asyncio.get_running_loop().create_task(self.aggiorna(client))
+            self._aggiornamento.add_done_callback(self._fine_aggiornamento)
+        return self._aggiornamento
+
+    def _fine_aggiornamento(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            # Il prossimo accesso riproverà dopo `intervallo`, servendo intanto l'indice attuale
+            self._ultimo_aggiornamento = time.monotonic()
+            logger.error(f"Aggiornamento dei colori non riuscito: {task.exception()!r}")
+
+    async def pronto(self, client) -> "ColoriDisponibili":
+        """Prepara l'indice per il turno corrente senza attendere la rete, se possibile.
+
+        Se l'indice è vuoto (nessun file e nessun aggiornamento riuscito) attende l'aggiornamento
+        dall'API; se è scaduto lo avvia in background e risponde con i colori già noti.
+        """
+        self.reload_if_changed()
+        # Con l'indice vuoto si riprova a ogni turno: il circuit breaker protegge il backend
+        if not self._scaduto() and len(self._indice):
+            return self
+        task = self._avvia_aggiornamento(client)
+        if not len(self._indice):
+            try:
+                await asyncio.shield(task)
+            except Exception:
+                pass  # già registrato da _fine_aggiornamento
+        return self
+
+    # --- Letture ---
+
+    def conosce(self, materiale: Optional[str] = None) -> bool:
+        """True se sono noti i colori del materiale (o almeno un colore, senza materiale)."""
+        return bool(self._indice.colori(materiale))
+
+    def ammesso(self, colore: str, materiale: Optional[str] = None) -> bool:
+        """True se il colore è disponibile per il materiale (per almeno un materiale, se non indicato)."""
+        return chiave_colore(colore) in self._indice.colori(materiale)
+
+    def nome(self, colore: str) -> str:
+        """Nome del colore come riportato nel catalogo."""
+        chiave = chiave_colore(colore)
+        return self._indice.nomi.get(chiave, chiave)
+
+    def disponibili(self, materiale: Optional[str] = None) -> List[str]:
+        """Nomi dei colori del materiale, nell'ordine del catalogo."""
+        indice = self._indice
+        chiave = chiave_materiale(materiale)
+        chiavi = indice.ordinati.get(chiave) if chiave in indice.per_materiale else sorted(indice.tutti)
+        return [indice.nomi[c] for c in chiavi]
+
+    def suggerimenti(self, colore: str, materiale: Optional[str] = None, n: int = MAX_SUGGERIMENTI) -> List[str]:
+        """Colori disponibili più simili a quello indicato, dal più simile."""
+        indice = self._indice
+        simili = indice.indice_ngrammi(materiale).simili(chiave_colore(colore), soglia=SOGLIA_SUGGERIMENTI, n=n)
+        return [indice.nomi[c] for c, _ in simili]
+
+    def stats(self):
+        return {
+            "versione": self.version,
+            "materiali": len(self._indice),
+            "colori": len(self._indice.tutti),
+            "eta_aggiornamento": (
+                None if self._ultimo_aggiornamento is None else round(time.monotonic() - self._ultimo_aggiornamento, 1)
+            ),
+        }
+
+
+_colori: Optional[ColoriDisponibili] = None
+_colori_lock = threading.Lock()
+
+
+def get_colori_disponibili() -> ColoriDisponibili:
+    """Restituisce il servizio dei colori condiviso dal processo, caricando il file al primo utilizzo."""
+    global _colori
+    if _colori is None:
+        with _colori_lock:
+            if _colori is None:
+                try:
+                    intervallo = float(os.getenv("COLORI_REFRESH_INTERVAL", 600))
+                    check_interval = float(os.getenv("CATALOG_CHECK_INTERVAL", 30))
+                except ValueError:
+                    intervallo, check_interval = 600.0, 30.0
+                _colori = ColoriDisponibili(intervallo=intervallo, check_interval=check_interval)
+    return _colori
+
+
+if __name__ == "__main__":
+    colori = get_colori_disponibili()
+    materiale = sys.argv[1] if len(sys.argv) > 1 else None
+    print(f"colori ({materiale or 'tutti i materiali'}):", ", ".join(colori.disponibili(materiale)) or "nessuno")
+    if len(sys.argv) > 2:
+        richiesto = " ".join(sys.argv[2:])
+        print(f"{richiesto!r} ammesso:", colori.ammesso(richiesto, materiale))
+        print("suggerimenti:", ", ".join(colori.suggerimenti(richiesto, materiale)) or "nessuno")
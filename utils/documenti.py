@@ -0,0 +1,380 @@
+"""Documenti dei preventivi (PDF e HTML) generati in background da un pool di processi.
+
+Le azioni costruiscono il contenuto del preventivo (titolo, voci, totale) e chiamano
+`get_coda_documenti().accoda(...)`: il lavoro entra in una coda limitata e l'azione riceve subito
+un ticket, senza aspettare la generazione. Un thread del processo prende i lavori dalla coda e li
+passa a un pool di processi (avviati con spawn, indipendenti dal server), che scrivono i file in
+PDF_OUTPUT_DIR con scritture atomiche: un file presente è sempre completo.
+
+Il ticket è l'hash del contenuto: preventivi identici producono lo stesso file, generato una sola
+volta (anche se richiesto di nuovo mentre è in corso). Con più worker (utils/prefork.py) ogni
+processo ha il proprio pool; un file già scritto da un altro worker non viene rigenerato.
+
+Il PDF è prodotto senza dipendenze esterne (testo su pagine A4 con il font Helvetica standard).
+
+Variabili: PDF_OUTPUT_DIR (vuota = documenti disattivati), PDF_BASE_URL (URL pubblico della
+cartella: il link restituito all'utente), PDF_WORKERS, PDF_QUEUE_SIZE.
+
+Uso: python -m utils.documenti [--esempio] [--stato TICKET]
+"""
+import hashlib
+import html
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import textwrap
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger("DocumentiPreventivo")
+
+# Cambia quando cambia l'aspetto dei documenti: i file già generati non vengono riusati
+VERSIONE_MODELLO = 1
+
+
+def contenuto_preventivo(titolo: str, voci: Sequence[Tuple[str, Any]], totale: Optional[float] = None,
+                         note: Optional[str] = None) -> Dict[str, Any]:
+    """Contenuto di un documento: titolo, voci (etichetta, valore), totale in euro e note."""
+    return {
+        "titolo": titolo,
+        "voci": [[str(etichetta), "" if valore is None else str(valore)] for etichetta, valore in voci],
+        "totale": round(float(totale), 2) if totale is not None else None,
+        "note": note,
+    }
+
+
+def ticket_documento(contenuto: Dict[str, Any]) -> str:
+    """Hash del contenuto (e della versione del modello): nome dei file e ticket per l'utente."""
+    serializzato = json.dumps([VERSIONE_MODELLO, contenuto], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serializzato.encode("utf-8")).hexdigest()[:20]
+
+
+def _euro(valore: float) -> str:
+    return f"{valore:,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+# --- Generazione (nei processi del pool) ---
+
+def rendi_html(contenuto: Dict[str, Any]) -> str:
+    righe = "\n".join(
+        f"<tr><th>{html.escape(etichetta)}</th><td>{html.escape(valore)}</td></tr>"
+        for etichetta, valore in contenuto["voci"]
+    )
+    totale = contenuto.get("totale")
+    if totale is not None:
+        righe += f'\n<tr class="totale"><th>Totale</th><td>{html.escape(_euro(totale))}</td></tr>'
+    note = f"<p>{html.escape(contenuto['note'])}</p>" if contenuto.get("note") else ""
+    titolo = html.escape(contenuto["titolo"])
+    return f"""<!DOCTYPE html>
+<html lang="it">
+<head>
+<meta charset="utf-8">
+<title>{titolo}</title>
+<style>
+body {{ font-family: Helvetica, Arial, sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; min-width: 24em; }}
+th, td {{ text-align: left; padding: .3em 1em .3em 0; border-bottom: 1px solid #ddd; }}
+tr.totale th, tr.totale td {{ font-weight: bold; border-bottom: none; }}
+</style>
+</head>
+<body>
+<h1>{titolo}</h1>
+<table>
+{righe}
+</table>
+{note}
+</body>
+</html>
+"""
+
+
+# Pagina A4 in punti, margini e interlinea del PDF
+_LARGHEZZA, _ALTEZZA, _MARGINE, _INTERLINEA = 595, 842, 56, 16
+_CARATTERI_RIGA = 80
+
+
+def _testo_pdf(testo: str) -> str:
+    """Testo per una stringa PDF in WinAnsi: caratteri non rappresentabili (emoji) tolti, escape di \\ ( )."""
+    testo = testo.encode("cp1252", errors="ignore").decode("latin-1")
+    return testo.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _righe_pdf(contenuto: Dict[str, Any]) -> List[Tuple[str, int, str]]:
+    """Righe del documento come (font, dimensione, testo)."""
+    righe = [("F2", 18, contenuto["titolo"]), ("F1", 11, "")]
+    for etichetta, valore in contenuto["voci"]:
+        testo = textwrap.wrap(f"{etichetta}: {valore}", _CARATTERI_RIGA, subsequent_indent="    ") or [""]
+        righe.extend(("F1", 11, riga) for riga in testo)
+    if contenuto.get("totale") is not None:
+        righe += [("F1", 11, ""), ("F2", 13, f"Totale: {_euro(contenuto['totale'])}")]
+    if contenuto.get("note"):
+        righe.append(("F1", 11, ""))
+        righe.extend(("F1", 9, riga) for riga in textwrap.wrap(contenuto["note"], _CARATTERI_RIGA + 15))
+    return righe
+
+
+def rendi_pdf(contenuto: Dict[str, Any]) -> bytes:
+    """PDF 1.4 con una o più pagine A4 di testo."""
+    per_pagina = (_ALTEZZA - 2 * _MARGINE) // _INTERLINEA
+    righe = _righe_pdf(contenuto)
+    pagine = [righe[i:i + per_pagina] for i in range(0, len(righe), per_pagina)]
+
+    oggetti = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # /Pages, scritto quando sono noti gli oggetti delle pagine
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    figli = []
+    for pagina in pagine:
+        flusso = ["BT", f"{_MARGINE} {_ALTEZZA - _MARGINE} Td"]
+        for font, dimensione, testo in pagina:
+            flusso.append(f"/{font} {dimensione} Tf ({_testo_pdf(testo)}) Tj 0 -{_INTERLINEA} Td")
+        flusso.append("ET")
+        dati = "\n".join(flusso).encode("latin-1")
+        oggetti.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(dati), dati))
+        oggetti.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (_LARGHEZZA, _ALTEZZA, len(oggetti))
+        )
+        figli.append(len(oggetti))
+    oggetti[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % n for n in figli), len(figli))
+
+    documento = bytearray(b"%PDF-1.4\n")
+    posizioni = []
+    for numero, oggetto in enumerate(oggetti, start=1):
+        posizioni.append(len(documento))
+        documento += b"%d 0 obj\n%s\nendobj\n" % (numero, oggetto)
+    inizio_xref = len(documento)
+    documento += b"xref\n0 %d\n0000000000 65535 f \n" % (len(oggetti) + 1)
+    documento += b"".join(b"%010d 00000 n \n" % p for p in posizioni)
+    documento += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(oggetti) + 1, inizio_xref)
+    return bytes(documento)
+
+
+def _inizializza_processo():
+    """Processi del pool a priorità più bassa: sulla CPU le richieste del server hanno la precedenza."""
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+
+
+def _scrivi_atomico(percorso: str, dati: bytes):
+    temporaneo = f"{percorso}.{os.getpid()}.tmp"
+    with open(temporaneo, "wb") as f:
+        f.write(dati)
+    os.replace(temporaneo, percorso)
+
+
+def genera_documento(contenuto: Dict[str, Any], cartella: str, ticket: str) -> List[str]:
+    """Scrive i file del preventivo (HTML prima, PDF per ultimo: il PDF presente indica il lavoro finito)."""
+    os.makedirs(cartella, exist_ok=True)
+    html_path = os.path.join(cartella, f"{ticket}.html")
+    pdf_path = os.path.join(cartella, f"{ticket}.pdf")
+    _scrivi_atomico(html_path, rendi_html(contenuto).encode("utf-8"))
+    _scrivi_atomico(pdf_path, rendi_pdf(contenuto))
+    return [html_path, pdf_path]
+
+
+# --- Coda (nel processo del server delle azioni) ---
+
+class CodaDocumenti:
+    """Coda limitata di documenti da generare, consumata da un thread che li passa al pool di processi."""
+
+    def __init__(self, cartella: str, url_base: str = "", workers: int = 1, maxsize: int = 100):
+        self.cartella = cartella
+        self.url_base = url_base.rstrip("/")
+        self.workers = max(1, workers)
+        self._coda: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue(maxsize=maxsize)
+        self._in_corso: Set[str] = set()  # ticket in coda o in generazione
+        self._errori: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._slot = threading.BoundedSemaphore(self.workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self.accodati = 0
+        self.deduplicati = 0
+        self.rifiutati = 0
+        self.completati = 0
+        self.falliti = 0
+
+    def _percorso(self, ticket: str, formato: str = "pdf") -> str:
+        return os.path.join(self.cartella, f"{ticket}.{formato}")
+
+    def link(self, ticket: str) -> Optional[str]:
+        """URL pubblico del PDF, se PDF_BASE_URL è configurato."""
+        return f"{self.url_base}/{ticket}.pdf" if self.url_base else None
+
+    def accoda(self, contenuto: Dict[str, Any]) -> Optional[str]:
+        """Accoda il documento e restituisce subito il ticket; None se la coda è piena."""
+        ticket = ticket_documento(contenuto)
+        with self._lock:
+            if ticket in self._in_corso or os.path.exists(self._percorso(ticket)):
+                self.deduplicati += 1
+                return ticket
+            try:
+                self._coda.put_nowait((ticket, contenuto))
+            except queue.Full:
+                self.rifiutati += 1
+                logger.warning("Coda dei documenti piena: preventivo non generato", extra={"ticket": ticket})
+                return None
+            self._in_corso.add(ticket)
+            self._errori.pop(ticket, None)
+            self.accodati += 1
+            self._avvia()
+        return ticket
+
+    def stato(self, ticket: str) -> str:
+        """'pronto', 'in_corso', 'errore' o 'sconosciuto'."""
+        with self._lock:
+            if ticket in self._in_corso:
+                return "in_corso"
+            if ticket in self._errori:
+                return "errore"
+        return "pronto" if os.path.exists(self._percorso(ticket)) else "sconosciuto"
+
+    def attendi(self, timeout: Optional[float] = None) -> bool:
+        """Attende la fine dei lavori accodati (per script e benchmark). False allo scadere del timeout."""
+        scadenza = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._lock:
+                if not self._in_corso:
+                    return True
+            if scadenza is not None and time.monotonic() >= scadenza:
+                return False
+            time.sleep(0.01)
+
+    def _avvia(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._consuma, name="coda-documenti", daemon=True)
+            self._thread.start()
+
+    def _consuma(self):
+        # spawn: i processi del pool non ereditano thread, socket ed event loop del server
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_inizializza_processo)
+        while True:
+            ticket, contenuto = self._coda.get()
+            self._slot.acquire()  # al massimo un lavoro per processo: il resto aspetta in coda
+            try:
+                future = self._pool.submit(genera_documento, contenuto, self.cartella, ticket)
+            except Exception as e:
+                self._slot.release()
+                self._concludi(ticket, e)
+                continue
+            future.add_done_callback(lambda f, t=ticket: self._fine(t, f))
+
+    def _fine(self, ticket: str, future: Future):
+        self._slot.release()
+        self._concludi(ticket, RuntimeError("annullato") if future.cancelled() else future.exception())
+
+    def _concludi(self, ticket: str, errore: Optional[BaseException]):
+        with self._lock:
+            self._in_corso.discard(ticket)
+            if errore is None:
+                self.completati += 1
+            else:
+                self.falliti += 1
+                self._errori[ticket] = str(errore)
+        if errore is not None:
+            logger.error(f"Generazione del documento non riuscita: {errore}", extra={"ticket": ticket})
+
+    def chiudi(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "accodati": self.accodati,
+                "deduplicati": self.deduplicati,
+                "rifiutati": self.rifiutati,
+                "completati": self.completati,
+                "falliti": self.falliti,
+                "in_corso": len(self._in_corso),
+                "in_coda": self._coda.qsize(),
+            }
+
+
+def accoda_preventivo(contenuto: Dict[str, Any]) -> Optional[str]:
+    """Accoda il documento del preventivo e restituisce il messaggio per l'utente (link o ticket).
+
+    None se i documenti sono disattivati o la coda è piena: il preventivo in chat resta valido.
+    """
+    coda = get_coda_documenti()
+    if coda is None:
+        return None
+    try:
+        ticket = coda.accoda(contenuto)
+    except Exception:
+        logger.exception("Accodamento del documento non riuscito")
+        return None
+    if ticket is None:
+        return None
+    link = coda.link(ticket)
+    if link:
+        return f"📄 Il PDF del preventivo sarà disponibile a breve qui: {link}"
+    return f"📄 Stiamo preparando il PDF del preventivo (codice {ticket})."
+
+
+_coda_documenti: Optional[CodaDocumenti] = None
+_coda_documenti_lock = threading.Lock()
+
+
+def get_coda_documenti() -> Optional[CodaDocumenti]:
+    """Coda dei documenti del processo; None se PDF_OUTPUT_DIR non è configurata."""
+    global _coda_documenti
+    with _coda_documenti_lock:
+        if _coda_documenti is None:
+            cartella = os.getenv("PDF_OUTPUT_DIR")
+            if not cartella:
+                return None
+            try:
+                workers = int(os.getenv("PDF_WORKERS") or 1)
+                maxsize = int(os.getenv("PDF_QUEUE_SIZE") or 100)
+            except ValueError:
+                workers, maxsize = 1, 100
+            _coda_documenti = CodaDocumenti(cartella, os.getenv("PDF_BASE_URL", ""), workers, maxsize)
+        return _coda_documenti
+
+
+def _dopo_fork():
+    """Nel processo figlio (worker di utils/prefork.py): thread e pool sono rimasti nel padre."""
+    global _coda_documenti, _coda_documenti_lock
+    _coda_documenti = None
+    _coda_documenti_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_dopo_fork)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from utils.settings import carica_ambiente
+
+    parser = argparse.ArgumentParser(description="Documenti dei preventivi in PDF_OUTPUT_DIR")
+    parser.add_argument("--esempio", action="store_true", help="genera un preventivo di esempio tramite la coda")
+    parser.add_argument("--stato", help="stato del documento con questo ticket")
+    args = parser.parse_args()
+
+    carica_ambiente()
+    coda = get_coda_documenti()
+    if coda is None:
+        raise SystemExit("PDF_OUTPUT_DIR non configurata")
+    if args.esempio:
+        ticket = coda.accoda(contenuto_preventivo(
+            "Preventivo per la tua tapparella",
+            [("Dimensioni", "120x150"), ("Materiale", "alluminio coibentato"), ("Colore", "bianco")],
+            totale=182.5,
+        ))
+        coda.attendi(timeout=60)
+        print(f"{ticket}: {coda.stato(ticket)} → {coda.link(ticket) or coda._percorso(ticket)}")
+    if args.stato:
+        print(f"{args.stato}: {coda.stato(args.stato)}")
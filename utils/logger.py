@@ -1,18 +1,162 @@
+import atexit
+import json
 import logging
 import os
-from config.settings import settings
-
-#crea cartella logs se non esiste
-os.makedirs (os.path.dirname (settings.LOG_FILE), exist_ok=True)
-
-# Configurazione base del logger
-logging.basicConfig(
-    level=getattr(logging, settings.LOG_LEVEL, logging.INFO),
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(settings.LOG_FILE, mode="a"),
-        logging.StreamHandler()  # Mostra i log anche in console
-    ]
-)
-
-logger =  logging.getLogger("RasaBot")
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+# Configurazione da variabili d'ambiente (vedi .env.*), letta da setup_logging
+LOG_FILE_DEFAULT = os.path.join("logs", "rasa_bot.log")
+
+
+def _env(nome: str, default, tipo=str):
+    try:
+        return tipo(os.getenv(nome, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Attributi standard di LogRecord: tutto il resto viene da `extra` e finisce nel JSON
+_ATTRIBUTI_RECORD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Una riga JSON per record, con i campi passati tramite `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dati = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for chiave, valore in vars(record).items():
+            if chiave not in _ATTRIBUTI_RECORD:
+                dati[chiave] = valore
+        if record.exc_info:
+            dati["exc"] = self.formatException(record.exc_info)
+        return json.dumps(dati, ensure_ascii=False, default=str)
+
+
+class CampionamentoDebug(logging.Filter):
+    """Lascia passare solo una frazione dei record DEBUG che trasportano un payload."""
+
+    def __init__(self, frazione: float = 0.1):
+        super().__init__()
+        self.frazione = frazione
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or not hasattr(record, "payload"):
+            return True
+        return random.random() < self.frazione
+
+
+class CodaLimitata(QueueHandler):
+    """Passa i record al thread di scrittura senza mai bloccare chi logga.
+
+    Se la coda è piena il record viene scartato e conteggiato.
+    """
+
+    def __init__(self, coda: queue.Queue):
+        super().__init__(coda)
+        self.scartati = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.scartati += 1
+
+
+class ListenerCoda(QueueListener):
+    """QueueListener che alla chiusura attende lo svuotamento della coda invece di fallire se è piena."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:  # già fermato (es. chiusura esplicita prima di atexit)
+            super().stop()
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    log_file: Optional[str] = None,
+    formato: Optional[str] = None,
+    console: bool = True,
+) -> QueueListener:
+    """Configura il logging con un thread di scrittura in background (una sola volta per processo).
+
+    I logger scrivono in una coda limitata; file (con rotazione per dimensione) e console sono
+    gestiti dal thread del QueueListener, fuori dal percorso delle richieste. I parametri non
+    indicati vengono da LOG_LEVEL, LOG_FILE (vuoto per non scrivere su file) e LOG_FORMAT.
+    Va chiamata all'avvio del processo (vedi utils/avvio.py), non all'import dei moduli.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = (level or _env("LOG_LEVEL", "INFO")).upper()
+    log_file = _env("LOG_FILE", LOG_FILE_DEFAULT) if log_file is None else log_file
+    formato = formato or _env("LOG_FORMAT", "json")  # json o text
+
+    formatter = JsonFormatter() if formato == "json" else logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    handlers = []
+    if log_file:
+        cartella = os.path.dirname(log_file)
+        if cartella:
+            os.makedirs(cartella, exist_ok=True)
+        handlers.append(RotatingFileHandler(
+            log_file,
+            maxBytes=_env("LOG_MAX_BYTES", 10 * 1024 * 1024, int),
+            backupCount=_env("LOG_BACKUP_COUNT", 5, int),
+            encoding="utf-8",
+        ))
+    if console:
+        handlers.append(logging.StreamHandler())  # Mostra i log anche in console
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    coda_handler = CodaLimitata(queue.Queue(maxsize=_env("LOG_QUEUE_SIZE", 10000, int)))
+    # Frazione dei record DEBUG con payload (es. corpi delle risposte) effettivamente scritti
+    coda_handler.addFilter(CampionamentoDebug(_env("LOG_DEBUG_SAMPLE_RATE", 0.1, float)))
+    radice = logging.getLogger()
+    radice.setLevel(getattr(logging, level, logging.INFO))
+    radice.addHandler(coda_handler)
+
+    _listener = ListenerCoda(coda_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    # I processi creati con fork (es. utils/prefork.py) non ereditano il thread di scrittura
+    os.register_at_fork(after_in_child=_dopo_fork)
+    return _listener
+
+
+def _dopo_fork():
+    """Nel processo figlio: nuova coda e nuovo thread di scrittura sugli stessi handler."""
+    global _listener
+    if _listener is None:
+        return
+    vecchio = _listener
+    vecchio._thread = None  # il thread è rimasto nel processo padre: niente da fermare qui
+    coda = queue.Queue(maxsize=vecchio.queue.maxsize)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, CodaLimitata):
+            handler.queue = coda
+    _listener = ListenerCoda(coda, *vecchio.handlers, respect_handler_level=vecchio.respect_handler_level)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def chiudi_logging():
+    """Scrive i record ancora in coda e ferma il thread di scrittura (per chi termina con os._exit)."""
+    if _listener is not None:
+        _listener.stop()
+
+
+logger = logging.getLogger("RasaBot")
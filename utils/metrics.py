@@ -0,0 +1,262 @@
+"""Metriche delle azioni e delle chiamate al backend, esportate in formato testo Prometheus.
+
+Attivazione con METRICS_ENABLED=true; esportazione su http://0.0.0.0:METRICS_PORT/metrics
+e/o su file (METRICS_DUMP_FILE, riscritto ogni METRICS_DUMP_INTERVAL secondi, compatibile con
+il textfile collector di node_exporter). Con le metriche disattivate le azioni non vengono
+avvolte e le chiamate al backend usano un contesto vuoto condiviso.
+"""
+import bisect
+import contextlib
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, Tuple, List
+
+logger = logging.getLogger("Metrics")
+
+# Limiti superiori (secondi) dei bucket degli istogrammi di durata
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NESSUN_CONTESTO = contextlib.nullcontext()
+
+Etichette = Tuple[Tuple[str, str], ...]
+
+
+class Istogramma:
+    """Conteggi per bucket (non cumulativi), somma e numero delle osservazioni."""
+
+    __slots__ = ("conteggi", "somma", "totale")
+
+    def __init__(self):
+        self.conteggi = [0] * (len(BUCKETS) + 1)
+        self.somma = 0.0
+        self.totale = 0
+
+    def osserva(self, valore: float):
+        self.conteggi[bisect.bisect_left(BUCKETS, valore)] += 1
+        self.somma += valore
+        self.totale += 1
+
+
+class _Cronometro:
+    """Misura la durata di un blocco e conta le eccezioni che lo attraversano."""
+
+    __slots__ = ("metrics", "nome", "etichette", "inizio")
+
+    def __init__(self, metrics: "Metrics", nome: str, etichette: Etichette):
+        self.metrics = metrics
+        self.nome = nome
+        self.etichette = etichette
+
+    def __enter__(self):
+        self.inizio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valore, traceback):
+        self.metrics._osserva(self.nome, self.etichette, time.perf_counter() - self.inizio)
+        if tipo is not None:
+            self.metrics._incrementa(self.nome.replace("_duration_seconds", "_errors_total"), self.etichette, 1)
+        return False
+
+
+def _etichette(valori: Dict[str, Any]) -> Etichette:
+    return tuple(sorted((k, str(v)) for k, v in valori.items()))
+
+
+def _formatta_etichette(etichette: Etichette, extra: str = "") -> str:
+    parti = ['{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in etichette]
+    if extra:
+        parti.append(extra)
+    return "{" + ",".join(parti) + "}" if parti else ""
+
+
+class Metrics:
+    """Registro in memoria di istogrammi e contatori, con etichette."""
+
+    def __init__(self, attive: bool = False):
+        self.attive = attive
+        self._istogrammi: Dict[str, Dict[Etichette, Istogramma]] = {}
+        self._contatori: Dict[str, Dict[Etichette, float]] = {}
+        self._lock = threading.Lock()
+
+    def cronometra(self, nome: str, **etichette):
+        """Contesto che registra la durata in `nome` e gli errori in `nome` con suffisso _errors_total."""
+        if not self.attive:
+            return _NESSUN_CONTESTO
+        return _Cronometro(self, nome, _etichette(etichette))
+
+    def osserva(self, nome: str, valore: float, **etichette):
+        if self.attive:
+            self._osserva(nome, _etichette(etichette), valore)
+
+    def incrementa(self, nome: str, n: float = 1, **etichette):
+        if self.attive:
+            self._incrementa(nome, _etichette(etichette), n)
+
+    def _osserva(self, nome: str, etichette: Etichette, valore: float):
+        with self._lock:
+            serie = self._istogrammi.setdefault(nome, {})
+            istogramma = serie.get(etichette)
+            if istogramma is None:
+                istogramma = serie[etichette] = Istogramma()
+            istogramma.osserva(valore)
+
+    def _incrementa(self, nome: str, etichette: Etichette, n: float):
+        with self._lock:
+            serie = self._contatori.setdefault(nome, {})
+            serie[etichette] = serie.get(etichette, 0) + n
+
+    def esporta(self) -> str:
+        """Tutte le metriche nel formato testo di Prometheus."""
+        righe: List[str] = []
+        with self._lock:
+            for nome, serie in sorted(self._istogrammi.items()):
+                righe.append(f"# TYPE {nome} histogram")
+                for etichette, istogramma in sorted(serie.items()):
+                    cumulato = 0
+                    for limite, conteggio in zip(BUCKETS + (float("inf"),), istogramma.conteggi):
+                        cumulato += conteggio
+                        le = "+Inf" if limite == float("inf") else f"{limite:g}"
+                        extra = f'le="{le}"'
+                        righe.append(f"{nome}_bucket{_formatta_etichette(etichette, extra)} {cumulato}")
+                    righe.append(f"{nome}_sum{_formatta_etichette(etichette)} {istogramma.somma:.6f}")
+                    righe.append(f"{nome}_count{_formatta_etichette(etichette)} {istogramma.totale}")
+            for nome, serie in sorted(self._contatori.items()):
+                righe.append(f"# TYPE {nome} counter")
+                for etichette, valore in sorted(serie.items()):
+                    righe.append(f"{nome}{_formatta_etichette(etichette)} {valore:g}")
+        return "\n".join(righe) + "\n"
+
+    def scrivi(self, percorso: str):
+        """Scrive le metriche su file (scrittura atomica)."""
+        temporaneo = percorso + ".tmp"
+        with open(temporaneo, "w", encoding="utf-8") as f:
+            f.write(self.esporta())
+        os.replace(temporaneo, percorso)
+
+    def reset(self):
+        with self._lock:
+            self._istogrammi.clear()
+            self._contatori.clear()
+
+    def avvia_server(self, porta: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Espone le metriche su http://host:porta/metrics in un thread separato."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                corpo = metrics.esporta().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, porta), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Metriche esposte su http://{host}:{server.server_port}/metrics")
+        return server
+
+    def avvia_dump(self, percorso: str, intervallo: float) -> threading.Thread:
+        """Riscrive periodicamente le metriche su file in un thread separato."""
+        def _dump():
+            while True:
+                time.sleep(intervallo)
+                try:
+                    self.scrivi(percorso)
+                except OSError as e:
+                    logger.error(f"Impossibile scrivere le metriche in {percorso}: {e}")
+
+        thread = threading.Thread(target=_dump, name="metrics-dump", daemon=True)
+        thread.start()
+        return thread
+
+
+def _avvolgi(metodo, nome_metodo: str, metrics: Metrics):
+    """Avvolge run o un validatore registrando durata ed errori con l'etichetta dell'azione."""
+    def etichetta(self) -> str:
+        nome = self.name()
+        return nome if nome_metodo == "run" else f"{nome}.{nome_metodo}"
+
+    if inspect.iscoroutinefunction(metodo):
+        @functools.wraps(metodo)
+        async def avvolto(self, *args, **kwargs):
+            with metrics.cronometra("rasa_action_duration_seconds", action=etichetta(self)):
+                return await metodo(self, *args, **kwargs)
+    else:
+        @functools.wraps(metodo)
+        def avvolto(self, *args, **kwargs):
+            with metrics.cronometra("rasa_action_duration_seconds", action=etichetta(self)):
+                return metodo(self, *args, **kwargs)
+    avvolto._strumentato = True
+    return avvolto
+
+
+def strumenta_azioni(namespace: Dict[str, Any], metrics: Optional["Metrics"] = None):
+    """Strumenta `run` e i validatori `validate_*` delle azioni definite in un modulo.
+
+    Da chiamare in fondo a ogni modulo di azioni con `strumenta_azioni(globals())`.
+    Non fa nulla se le metriche sono disattivate.
+    """
+    metrics = metrics or get_metrics()
+    if not metrics.attive:
+        return
+    modulo = namespace.get("__name__")
+    for oggetto in list(namespace.values()):
+        if not inspect.isclass(oggetto) or oggetto.__module__ != modulo or not hasattr(oggetto, "name"):
+            continue
+        nomi = ["run"] + [nome for nome in vars(oggetto) if nome.startswith("validate_")]
+        for nome in nomi:
+            metodo = getattr(oggetto, nome, None)
+            if callable(metodo) and not getattr(metodo, "_strumentato", False):
+                setattr(oggetto, nome, _avvolgi(metodo, nome, metrics))
+
+
+_metrics: Optional[Metrics] = None
+_metrics_lock = threading.Lock()
+
+
+def _avvia_esportazione(metrics: Metrics, worker: int = 0):
+    """Avvia l'esportazione configurata (server HTTP e/o dump su file).
+
+    Il worker N di utils/prefork.py usa la porta METRICS_PORT + N e il file METRICS_DUMP_FILE.N.
+    """
+    porta = os.getenv("METRICS_PORT")
+    if porta:
+        metrics.avvia_server(int(porta) + worker)
+    percorso = os.getenv("METRICS_DUMP_FILE")
+    if percorso:
+        metrics.avvia_dump(f"{percorso}.{worker}" if worker else percorso, float(os.getenv("METRICS_DUMP_INTERVAL", 15)))
+
+
+def metriche_dopo_fork(worker: int):
+    """Nel worker creato con fork: valori azzerati ed esportazione propria (i thread non sopravvivono al fork)."""
+    metrics = get_metrics()
+    metrics._lock = threading.Lock()
+    metrics.reset()
+    if metrics.attive:
+        _avvia_esportazione(metrics, worker)
+
+
+def get_metrics() -> Metrics:
+    """Restituisce il registro delle metriche del processo, avviando l'esportazione configurata."""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                attive = os.getenv("METRICS_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+                metrics = Metrics(attive)
+                if attive:
+                    _avvia_esportazione(metrics)
+                _metrics = metrics
+    return _metrics
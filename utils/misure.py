@@ -0,0 +1,112 @@
+"""Riconoscimento deterministico di dimensioni e materiali nel testo dei messaggi.
+
+Dimensioni: '120x100', '120 x 100 cm', '120*100', '120 per 100 cm', '1,2x1m', '120 cm x 1,5 m'.
+L'unità indicata dopo un solo numero vale per entrambi; senza unità i valori sono centimetri.
+Il separatore 'per' vale solo con un'unità: in frasi come 'ho 3 per 4 finestre' non è una
+dimensione. Il risultato è sempre in centimetri interi.
+
+Materiali: nomi e alias della tabella unica di utils/calculation.py ('alluminio coibentato',
+'PVC', 'plastica'), restituiti come codice ('alluminio_coibentato', 'pvc').
+
+Usato dal componente NLU nlu_components/fast_path.py, che li estrae prima di DIET, e dalle azioni
+per leggere gli slot tipizzati (larghezza_cm, altezza_cm, codice_materiale).
+"""
+import re
+from typing import NamedTuple, Optional, Tuple
+
+from utils.calculation import ALIAS_MATERIALI, DENSITA_MATERIALI, codice_materiale
+
+# Misure plausibili per una tapparella, in cm (come i 2-3 cifre accettati finora)
+MIN_CM = 10
+MAX_CM = 999
+
+_NUMERO = r"\d+(?:[.,]\d+)?"
+_UNITA = r"(?:millimetri|mm|centimetri|cm|metri|metro|mt|m)\b"
+_RE_DIMENSIONE = re.compile(
+    rf"(?<![\d.,])(?P<larghezza>{_NUMERO})\s*(?P<unita_l>{_UNITA})?"
+    rf"(?:\s*[x×*]\s*|\s+(?P<per>per)\s+)"
+    rf"(?P<altezza>{_NUMERO})\s*(?P<unita_a>{_UNITA})?(?![\d.,]?\d)",
+    re.IGNORECASE,
+)
+_FATTORI = {"mm": 0.1, "millimetri": 0.1, "cm": 1.0, "centimetri": 1.0, "m": 100.0, "mt": 100.0, "metri": 100.0,
+            "metro": 100.0}
+
+
+class Dimensione(NamedTuple):
+    """Dimensioni della tapparella in centimetri."""
+    larghezza_cm: int
+    altezza_cm: int
+
+    @property
+    def testo(self) -> str:
+        """Forma canonica 'LxH', il valore dello slot `dimensione`."""
+        return f"{self.larghezza_cm}x{self.altezza_cm}"
+
+    @property
+    def metri(self) -> Tuple[float, float]:
+        return self.larghezza_cm / 100, self.altezza_cm / 100
+
+
+def _centimetri(valore: str, unita: Optional[str]) -> float:
+    numero = float(valore.replace(",", "."))
+    return numero * _FATTORI[unita.lower()] if unita else numero
+
+
+def trova_dimensione(testo: str) -> Optional[Tuple[Dimensione, int, int]]:
+    """Prima dimensione plausibile nel testo, con inizio e fine della corrispondenza."""
+    if not testo:
+        return None
+    for match in _RE_DIMENSIONE.finditer(testo):
+        unita_l, unita_a = match.group("unita_l"), match.group("unita_a")
+        if match.group("per") and not (unita_l or unita_a):
+            continue  # 'ho 3 per 4 finestre': 'per' senza unità non indica una misura
+        # Un'unità sola vale per entrambi i numeri
+        unita_l, unita_a = unita_l or unita_a, unita_a or unita_l
+        valori = (match.group("larghezza"), match.group("altezza"))
+        larghezza, altezza = (round(_centimetri(v, u)) for v, u in zip(valori, (unita_l, unita_a)))
+        if MIN_CM <= larghezza <= MAX_CM and MIN_CM <= altezza <= MAX_CM:
+            return Dimensione(larghezza, altezza), match.start(), match.end()
+    return None
+
+
+def parse_dimensione(testo: Optional[str]) -> Optional[Dimensione]:
+    """Dimensione in centimetri dal testo, None se non c'è una dimensione plausibile."""
+    trovata = trova_dimensione(str(testo)) if testo else None
+    return trovata[0] if trovata else None
+
+
+def dimensione_da_slot(dimensione: Optional[str], larghezza_cm: Optional[float] = None,
+                       altezza_cm: Optional[float] = None) -> Optional[Dimensione]:
+    """Dimensione dagli slot: quelli tipizzati se corrispondono a `dimensione`, altrimenti il testo."""
+    if larghezza_cm and altezza_cm:
+        tipizzata = Dimensione(int(larghezza_cm), int(altezza_cm))
+        if dimensione is None or dimensione == tipizzata.testo:
+            return tipizzata
+    return parse_dimensione(dimensione)
+
+
+def _alternativa(nome: str) -> str:
+    return r"[\s_-]+".join(re.escape(parola) for parola in nome.split("_"))
+
+
+# I nomi più lunghi per primi: 'alluminio coibentato' prima di 'alluminio'
+_NOMI_MATERIALI = sorted({*DENSITA_MATERIALI, *ALIAS_MATERIALI}, key=len, reverse=True)
+_RE_MATERIALE = re.compile(r"\b(?:" + "|".join(_alternativa(n) for n in _NOMI_MATERIALI) + r")\b", re.IGNORECASE)
+
+
+def trova_materiale(testo: str) -> Optional[Tuple[str, int, int]]:
+    """Primo materiale della tabella nel testo: codice, inizio e fine della corrispondenza."""
+    match = _RE_MATERIALE.search(testo) if testo else None
+    if not match:
+        return None
+    return codice_materiale(match.group()), match.start(), match.end()
+
+
+def nome_materiale(codice: Optional[str]) -> Optional[str]:
+    """Nome da mostrare per un codice materiale ('alluminio_coibentato' → 'alluminio coibentato')."""
+    return codice.replace("_", " ") if codice else None
+
+
+def dimensione_da_tracker(tracker) -> Optional[Dimensione]:
+    """Dimensione dagli slot del tracker di rasa_sdk: dimensione, larghezza_cm, altezza_cm."""
+    return dimensione_da_slot(tracker.get_slot("dimensione"), tracker.get_slot("larghezza_cm"), tracker.get_slot("altezza_cm"))
@@ -0,0 +1,92 @@
+import bisect
+import threading
+from typing import Optional, List, Tuple, Union
+
+from utils.calculation import Calculations
+from utils.catalog import Prodotto, get_catalog
+
+# Margine applicato al peso stimato della tapparella: il motore deve poterne sollevare almeno il 25% in più
+MARGINE_SICUREZZA = 1.25
+# Numero di alternative precalcolate per ogni soglia di portata
+MAX_ALTERNATIVE = 5
+# Rapporto kg/Nm dei motori del catalogo (20 Nm → 40 kg), usato se la portata non è indicata
+KG_PER_NM = 2.0
+
+
+def portata_motore(motore: Prodotto) -> Optional[float]:
+    """Portata in kg del motore, ricavata dalla coppia se non indicata nel titolo."""
+    if motore.portata_kg is not None:
+        return motore.portata_kg
+    if motore.coppia_nm is not None:
+        return motore.coppia_nm * KG_PER_NM
+    return None
+
+
+def peso_richiesto(peso_tapparella: float) -> float:
+    """Portata minima (kg) che il motore deve garantire per una tapparella di questo peso."""
+    return peso_tapparella * MARGINE_SICUREZZA
+
+
+class MotorSelector:
+    """Indice dei motori ordinati per portata, per scegliere il più economico con una ricerca binaria.
+
+    Per ogni soglia di portata sono precalcolati i motori più economici tra quelli
+    con portata maggiore o uguale, già ordinati per prezzo.
+    """
+
+    def __init__(self, motori: List[Prodotto]):
+        validi = [m for m in motori if portata_motore(m) is not None and m.prezzo is not None]
+        self.motori = sorted(validi, key=lambda m: (portata_motore(m), m.prezzo))
+        self.soglie = [portata_motore(m) for m in self.motori]
+
+        # Scorrendo da destra, la classifica in posizione i contiene i MAX_ALTERNATIVE
+        # motori più economici tra motori[i:]
+        self._classifiche: List[List[Prodotto]] = [[] for _ in self.motori]
+        classifica: List[Prodotto] = []
+        for i in range(len(self.motori) - 1, -1, -1):
+            classifica = sorted(classifica + [self.motori[i]], key=lambda m: (m.prezzo, portata_motore(m)))[:MAX_ALTERNATIVE]
+            self._classifiche[i] = classifica
+
+    def alternative(self, peso_kg: float, n: int = MAX_ALTERNATIVE) -> List[Prodotto]:
+        """Motori in grado di sollevare `peso_kg`, dal più economico, in O(log n)."""
+        i = bisect.bisect_left(self.soglie, peso_kg)
+        if i >= len(self.motori):
+            return []
+        return self._classifiche[i][:n]
+
+    def piu_economico_in(self, posizione: int) -> Optional[Prodotto]:
+        """Il più economico tra i motori a partire dalla posizione `posizione` dell'indice."""
+        if posizione >= len(self.motori):
+            return None
+        return self._classifiche[posizione][0]
+
+    def piu_economico(self, peso_kg: float) -> Optional[Prodotto]:
+        """Il motore più economico in grado di sollevare `peso_kg`, None se nessuno è adatto."""
+        alternative = self.alternative(peso_kg, 1)
+        return alternative[0] if alternative else None
+
+    def per_tapparella(self, dimensione: Union[str, Tuple[int, int]], materiale: Optional[str] = None,
+                       n: int = MAX_ALTERNATIVE) -> List[Prodotto]:
+        """Motori adatti a una tapparella (es. '120x100' o Dimensione(120, 100), 'PVC'), dal più economico."""
+        peso = Calculations.estimate_weight(dimensione, materiale or "PVC")
+        if peso is None:
+            return []
+        return self.alternative(peso_richiesto(peso), n)
+
+
+_selector: Optional[MotorSelector] = None
+_selector_version = -1
+_selector_lock = threading.Lock()
+
+
+def get_motor_selector() -> MotorSelector:
+    """Restituisce il selettore dei motori, ricostruito quando cambia la versione del catalogo."""
+    global _selector, _selector_version
+    catalogo = get_catalog()
+    catalogo.reload_if_changed()
+    if _selector is None or _selector_version != catalogo.version:
+        with _selector_lock:
+            if _selector is None or _selector_version != catalogo.version:
+                _selector = MotorSelector(catalogo.query(categoria="motori"))
+                _selector_version = catalogo.version
+    return _selector
@@ -0,0 +1,240 @@
+"""Server delle azioni multiprocesso: N worker creati con fork condividono socket e stato caricato.
+
+Il processo principale carica ambiente, logging, azioni e stato condiviso (catalogo, indici,
+classificatore, colori: utils/avvio.riscalda), apre il socket in ascolto e crea i worker con
+fork. I worker ereditano socket e stato copy-on-write (gc.freeze evita che il garbage collector
+tocchi, e quindi copi, gli oggetti caricati prima del fork) ed eseguono il server di rasa_sdk in
+un solo processo sul socket condiviso: è il kernel a distribuire le connessioni tra i worker.
+
+Il processo principale:
+- ricrea i worker che terminano in modo anomalo;
+- ogni CATALOG_CHECK_INTERVAL secondi controlla dataset e snapshot del catalogo (vedi
+  utils/snapshot.py): se sono cambiati, o alla ricezione di SIGHUP, ricarica lo stato e sostituisce
+  i worker senza interrompere il servizio, creando i nuovi prima di fermare i vecchi (SIGTERM: le
+  richieste in corso vengono completate);
+- con SIGTERM o SIGINT ferma i worker e termina.
+
+Ogni worker ha il proprio client HTTP, le proprie cache delle risposte e dei preventivi e le
+proprie metriche (porta METRICS_PORT + N). I worker scrivono sullo stesso LOG_FILE: la rotazione
+per dimensione non è coordinata tra processi, in questa modalità conviene LOG_MAX_BYTES=0 e
+rotazione esterna (logrotate).
+
+Uso: python -m utils.prefork [--workers N] [--port 5055] [--host 0.0.0.0] [--actions actions]
+"""
+import argparse
+import gc
+import logging
+import math
+import os
+import signal
+import socket
+import time
+from typing import Dict, Optional, Tuple
+
+from utils.avvio import prepara_processo, riscalda
+
+logger = logging.getLogger("Prefork")
+
+# Attesa massima (s) della chiusura dei worker oltre la quale vengono terminati con SIGKILL
+ATTESA_CHIUSURA = 30.0
+# Un worker che termina prima di questo tempo dall'avvio viene ricreato con un ritardo
+DURATA_MINIMA_WORKER = 1.0
+
+
+def numero_worker() -> int:
+    """Numero di worker da ACTION_WORKERS, di default uno per CPU disponibile."""
+    valore = os.getenv("ACTION_WORKERS", "").strip()
+    try:
+        return max(1, int(valore)) if valore else cpu_disponibili()
+    except ValueError:
+        logger.warning(f"ACTION_WORKERS non valido ({valore!r}): uso un worker per CPU")
+        return cpu_disponibili()
+
+
+def cpu_disponibili() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # non disponibile su macOS
+        return os.cpu_count() or 1
+
+
+def apri_socket(host: str, porta: int, backlog: int = 1024) -> socket.socket:
+    """Socket in ascolto ereditato dai worker."""
+    famiglia = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(famiglia, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, porta))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Prefork:
+    """Processo principale: stato condiviso, socket in ascolto e ciclo di vita dei worker."""
+
+    def __init__(self, workers: int, host: str = "0.0.0.0", porta: int = 5055, pacchetto: str = "actions",
+                 check_interval: Optional[float] = None):
+        self.workers = workers
+        self.host = host
+        self.porta = porta
+        self.pacchetto = pacchetto
+        self.check_interval = float(os.getenv("CATALOG_CHECK_INTERVAL", 30)) if check_interval is None else check_interval
+        self.generazione = 0
+        self._figli: Dict[int, Tuple[int, int, float]] = {}  # pid → (generazione, numero del worker, avvio)
+        self._in_chiusura = False
+        self._da_ricaricare = False
+        self.executor = None
+        self.sock: Optional[socket.socket] = None
+
+    # --- Processo principale ---
+
+    def prepara(self):
+        """Carica azioni e stato condiviso prima del fork e apre il socket."""
+        prepara_processo(riscaldamento=False)
+        riscalda()
+        from rasa_sdk.executor import ActionExecutor
+
+        self.executor = ActionExecutor()
+        self.executor.register_package(self.pacchetto)
+        self._congela()
+        self.sock = apri_socket(self.host, self.porta)
+        logger.info(f"Server delle azioni su http://{self.host}:{self.porta} con {self.workers} worker")
+
+    def _congela(self):
+        """Sposta gli oggetti caricati nella generazione permanente del GC, che non li visita più."""
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+    def esegui(self):
+        """Avvia i worker e li supervisiona fino a SIGTERM/SIGINT."""
+        if self.sock is None:
+            self.prepara()
+        signal.signal(signal.SIGTERM, self._chiudi)
+        signal.signal(signal.SIGINT, self._chiudi)
+        signal.signal(signal.SIGHUP, self._ricarica)
+        self._avvia_generazione()
+        prossimo_controllo = time.monotonic() + self.check_interval
+        while not self._in_chiusura:
+            self._raccogli_figli()
+            if self._da_ricaricare or time.monotonic() >= prossimo_controllo:
+                forzato, self._da_ricaricare = self._da_ricaricare, False
+                prossimo_controllo = time.monotonic() + self.check_interval
+                self._ricarica_se_cambiato(forzato)
+            time.sleep(0.2)
+        self._ferma(list(self._figli))
+        self.sock.close()
+        logger.info("Server delle azioni fermato")
+
+    def _chiudi(self, signum, frame):
+        self._in_chiusura = True
+
+    def _ricarica(self, signum, frame):
+        self._da_ricaricare = True
+
+    def _ricarica_se_cambiato(self, forzato: bool = False):
+        """Ricarica catalogo e indici se sono cambiati (o se `forzato`) e sostituisce i worker."""
+        from utils.catalog import get_catalog
+
+        catalogo = get_catalog()
+        if forzato:
+            catalogo.load()
+        elif not catalogo.reload_if_changed(force_check=True):
+            return
+        logger.info(f"Catalogo aggiornato (versione {catalogo.version}): sostituzione dei worker")
+        riscalda()
+        self._congela()
+        vecchi = list(self._figli)
+        self._avvia_generazione()
+        self._ferma(vecchi)
+
+    def _avvia_generazione(self):
+        self.generazione += 1
+        for numero in range(1, self.workers + 1):
+            self._avvia_worker(numero)
+
+    def _avvia_worker(self, numero: int):
+        pid = os.fork()
+        if pid == 0:
+            codice = 1
+            try:
+                self._worker(numero)
+                codice = 0
+            except BaseException:
+                logger.exception(f"Worker {numero} terminato per errore")
+            finally:
+                from utils.logger import chiudi_logging
+                chiudi_logging()
+                os._exit(codice)
+        self._figli[pid] = (self.generazione, numero, time.monotonic())
+
+    def _raccogli_figli(self):
+        """Raccoglie i worker terminati e ricrea quelli della generazione corrente."""
+        while self._figli:
+            try:
+                pid, stato = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generazione, numero, avvio = self._figli.pop(pid, (None, None, 0.0))
+            if generazione != self.generazione or self._in_chiusura:
+                continue
+            logger.error(f"Worker {numero} (pid {pid}) terminato con stato {os.waitstatus_to_exitcode(stato)}: lo ricreo")
+            if time.monotonic() - avvio < DURATA_MINIMA_WORKER:
+                time.sleep(DURATA_MINIMA_WORKER)
+            self._avvia_worker(numero)
+
+    def _ferma(self, pids):
+        """SIGTERM ai worker indicati e attesa della chiusura; SIGKILL dopo ATTESA_CHIUSURA secondi."""
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        scadenza = time.monotonic() + ATTESA_CHIUSURA
+        in_attesa = set(pids)
+        while in_attesa and time.monotonic() < scadenza:
+            for pid in list(in_attesa):
+                try:
+                    terminato, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    terminato = pid
+                if terminato:
+                    in_attesa.discard(pid)
+                    self._figli.pop(pid, None)
+            time.sleep(0.05)
+        for pid in in_attesa:
+            logger.warning(f"Worker {pid} non terminato entro {ATTESA_CHIUSURA:.0f}s: SIGKILL")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self._figli.pop(pid, None)
+
+    # --- Worker ---
+
+    def _worker(self, numero: int):
+        """Esegue il server di rasa_sdk sul socket condiviso, in un solo processo."""
+        for segnale in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(segnale, signal.SIG_DFL)
+        from rasa_sdk.endpoint import create_app
+        from utils.catalog import get_catalog
+        from utils.metrics import metriche_dopo_fork
+
+        # I ricaricamenti del catalogo li decide il processo principale, sostituendo i worker
+        get_catalog().check_interval = math.inf
+        metriche_dopo_fork(numero)
+        app = create_app(self.executor)
+        logger.info(f"Worker {numero} avviato (pid {os.getpid()}, generazione {self.generazione})")
+        app.run(sock=self.sock, single_process=True, access_log=False, motd=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server delle azioni con più processi worker")
+    parser.add_argument("--workers", type=int, default=None, help="numero di worker (default ACTION_WORKERS o CPU)")
+    parser.add_argument("--port", type=int, default=int(os.getenv("ACTION_PORT", 5055)))
+    parser.add_argument("--host", default=os.getenv("SANIC_HOST", "0.0.0.0"))
+    parser.add_argument("--actions", default="actions", help="package delle azioni")
+    args = parser.parse_args()
+
+    prepara_processo(riscaldamento=False)  # ambiente prima di leggere ACTION_WORKERS
+    Prefork(args.workers or numero_worker(), args.host, args.port, args.actions).esegui()
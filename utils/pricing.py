@@ -0,0 +1,142 @@
+from typing import Dict, Any, Optional, List, Iterable, Tuple, Union
+
+from utils.misure import Dimensione, parse_dimensione
+from utils.motor_selection import get_motor_selector
+
+# Logica di prezzo condivisa tra le azioni e il calcolo batch dei preventivi.
+# Le funzioni accettano un client con l'interfaccia di AsyncApiService.
+
+def normalizza_dimensione(dimensione: Optional[str]) -> Optional[str]:
+    """Dimensione in forma canonica 'LxH' (cm): '120 X 100 cm', '120*100' e '1,2x1m' → '120x100'."""
+    if not dimensione:
+        return None
+    interpretata = parse_dimensione(dimensione)
+    if interpretata:
+        return interpretata.testo
+    return str(dimensione).strip().lower() or None
+
+
+def trova_motore_adatto(dimensione: str, materiale: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Seleziona il motore più economico in grado di sollevare la tapparella"""
+    motori = get_motor_selector().per_tapparella(dimensione, materiale, 1)
+    return motori[0].to_api() if motori else None
+
+
+def normalizza_configurazione(configurazione: Dict[str, Any]) -> Dict[str, Any]:
+    """Forma canonica di una configurazione: testi minuscoli, dimensione 'LxH' e accessori ordinati."""
+    def testo(valore):
+        return str(valore).strip().lower() if valore not in (None, "") else None
+
+    accessori = configurazione.get("accessori") or []
+    if isinstance(accessori, str):
+        accessori = accessori.split(";")
+    return {
+        "tipo": testo(configurazione.get("tipo")) or "preventivo",
+        "dimensione": normalizza_dimensione(configurazione.get("dimensione")),
+        "materiale": testo(configurazione.get("materiale")),
+        "colore": testo(configurazione.get("colore")),
+        "motore": testo(configurazione.get("motore")),
+        "pulsante": testo(configurazione.get("pulsante")),
+        "accessori": sorted(a for a in (testo(a) for a in accessori) if a),
+    }
+
+
+def chiave_configurazione(configurazione: Dict[str, Any]) -> Tuple:
+    """Chiave hashable di una configurazione normalizzata, per riconoscere quelle identiche."""
+    normalizzata = normalizza_configurazione(configurazione)
+    return tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in sorted(normalizzata.items()))
+
+
+async def prezza_preventivo(
+    api,
+    dimensione: str,
+    materiale: Optional[str],
+    motore: Optional[str] = None,
+    pulsante: Optional[str] = None,
+    accessori: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """Calcola il preventivo completo (motore, pulsante, accessori) con una sola ricerca bulk.
+
+    Restituisce `motore`, `pulsante`, `accessori` e `prezzo_totale`, oppure `errore`.
+    """
+    accessori = list(accessori)
+
+    # Distinta dei prodotti da prezzare: motore scelto dall'utente, pulsante e accessori
+    coppie = []
+    if motore:
+        coppie.append(("motori", motore))
+    if pulsante:
+        coppie.append(("pulsanti", pulsante))
+    coppie.extend(("accessori", accessorio) for accessorio in accessori)
+
+    # Un solo giro di richieste per tutta la distinta; se l'utente non ha scelto un motore
+    # selezioniamo quello più adatto dall'indice locale
+    prodotti = await api.get_prodotti_bulk(coppie)
+    motore_prodotto = prodotti.pop(0) if motore else trova_motore_adatto(dimensione, materiale)
+
+    if not motore_prodotto:
+        return {"errore": "Non ho trovato un motore adatto per questa tapparella."}
+
+    prezzo_totale = float(motore_prodotto["prezzo_prodotto"])
+
+    # Prezzo del pulsante, se richiesto e trovato
+    pulsante_prodotto = prodotti.pop(0) if pulsante else None
+    if pulsante_prodotto:
+        prezzo_totale += float(pulsante_prodotto["prezzo_prodotto"])
+
+    # Prezzo degli accessori trovati
+    accessori_selezionati: List[Dict[str, Any]] = [prodotto for prodotto in prodotti if prodotto]
+    prezzo_totale += sum(float(prodotto["prezzo_prodotto"]) for prodotto in accessori_selezionati)
+
+    return {
+        "motore": motore_prodotto,
+        "pulsante": pulsante_prodotto,
+        "accessori": accessori_selezionati,
+        "prezzo_totale": round(prezzo_totale, 2),
+    }
+
+
+async def prezza_tapparella(
+    api,
+    dimensione: Union[str, Dimensione],
+    materiale: str,
+    colore: str,
+    accessori: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """Chiede al backend il preventivo della tapparella (POST `configura_tapparella`).
+
+    `dimensione` è una Dimensione già interpretata (slot tipizzati) o il testo da interpretare.
+    Restituisce il `preventivo` del backend, oppure `errore`.
+    """
+    accessori = list(accessori)
+    misure = dimensione if isinstance(dimensione, Dimensione) else parse_dimensione(dimensione)
+    if misure is None:
+        return {"errore": f"Dimensione non valida: {dimensione}"}
+
+    response = await api.post("configura_tapparella", {
+        "materiale": materiale,
+        "larghezza": misure.larghezza_cm,
+        "altezza": misure.altezza_cm,
+        "colore": colore,
+        "accessori": accessori
+    })
+
+    if not response:
+        return {"errore": "servizio non disponibile"}
+    if "errore" in response:
+        return {"errore": response["errore"]}
+    return response["preventivo"]
+
+
+async def prezza_configurazione(api, configurazione: Dict[str, Any]) -> Dict[str, Any]:
+    """Calcola il preventivo di una configurazione generica (campo `tipo`: preventivo o tapparella)."""
+    config = normalizza_configurazione(configurazione)
+    if not config["dimensione"]:
+        return {"errore": "Dimensione mancante"}
+    if config["tipo"] == "tapparella":
+        if not config["materiale"] or not config["colore"]:
+            return {"errore": "Materiale e colore sono obbligatori per la tapparella"}
+        return await prezza_tapparella(api, config["dimensione"], config["materiale"], config["colore"], config["accessori"])
+    return await prezza_preventivo(
+        api, config["dimensione"], config["materiale"], config["motore"], config["pulsante"], config["accessori"]
+    )
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+
+from utils.catalog import get_catalog
+from utils.metrics import get_metrics
+from utils.pricing import chiave_configurazione
+
+
+class QuoteCache:
+    """Cache dei preventivi per configurazione normalizzata, con eviction LRU e TTL.
+
+    Le voci valgono solo per la versione del catalogo con cui sono state calcolate: quando il
+    dataset viene ricaricato i preventivi precedenti non vengono più serviti. Richieste identiche
+    concorrenti attendono lo stesso calcolo invece di interrogare di nuovo il backend.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 900.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._in_corso: Dict[Tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _chiave(self, configurazione: Dict[str, Any]) -> Tuple:
+        return (get_catalog().version, chiave_configurazione(configurazione))
+
+    def lookup(self, configurazione: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Preventivo in cache per la configurazione, None se assente o scaduto."""
+        chiave = self._chiave(configurazione)
+        entry = self._data.get(chiave)
+        if entry is None:
+            return None
+        preventivo, scadenza = entry
+        if time.monotonic() >= scadenza:
+            del self._data[chiave]
+            return None
+        self._data.move_to_end(chiave)
+        return preventivo
+
+    def store(self, configurazione: Dict[str, Any], preventivo: Dict[str, Any]):
+        """Salva un preventivo; gli errori non vengono memorizzati."""
+        if self.ttl <= 0 or not preventivo or "errore" in preventivo:
+            return
+        chiave = self._chiave(configurazione)
+        self._data[chiave] = (preventivo, time.monotonic() + self.ttl)
+        self._data.move_to_end(chiave)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(
+        self, configurazione: Dict[str, Any], calcola: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Restituisce il preventivo in cache o lo calcola con `calcola`, una sola volta per chiave."""
+        preventivo = self.lookup(configurazione)
+        if preventivo is not None:
+            self.hits += 1
+            get_metrics().incrementa("quote_cache_lookups_total", stato="hit")
+            return preventivo
+
+        chiave = self._chiave(configurazione)
+        in_corso = self._in_corso.get(chiave)
+        if in_corso is not None:
+            # Stessa configurazione già in calcolo per un'altra conversazione
+            self.coalesced += 1
+            get_metrics().incrementa("quote_cache_lookups_total", stato="coalesced")
+            return await asyncio.shield(in_corso)
+
+        self.misses += 1
+        get_metrics().incrementa("quote_cache_lookups_total", stato="miss")
+        # Il calcolo è un task a sé: se la conversazione che l'ha avviato viene cancellata (client
+        # disconnesso, budget del turno) le altre in attesa ricevono comunque il risultato
+        task = asyncio.ensure_future(calcola())
+        self._in_corso[chiave] = task
+        task.add_done_callback(lambda t: self._concludi(chiave, configurazione, t))
+        return await asyncio.shield(task)
+
+    def _concludi(self, chiave: Tuple, configurazione: Dict[str, Any], task: asyncio.Future):
+        """Alla fine del calcolo: salva il preventivo riuscito e libera la chiave."""
+        if self._in_corso.get(chiave) is task:
+            del self._in_corso[chiave]
+        if task.cancelled() or task.exception() is not None:  # exception(): niente avviso se nessuno attende
+            return
+        self.store(configurazione, task.result())
+
+    def invalidate(self) -> int:
+        """Svuota la cache. Restituisce il numero di voci rimosse."""
+        rimosse = len(self._data)
+        self._data.clear()
+        return rimosse
+
+    def stats(self) -> Dict[str, Any]:
+        """Restituisce i contatori di hit/miss e l'occupazione della cache."""
+        richieste = self.hits + self.coalesced + self.misses
+        return {
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hit_rate": (self.hits + self.coalesced) / richieste if richieste else 0.0,
+        }
+
+
+_quote_cache: Optional[QuoteCache] = None
+
+
+def get_quote_cache() -> QuoteCache:
+    """Restituisce la cache dei preventivi condivisa dalle azioni."""
+    global _quote_cache
+    if _quote_cache is None:
+        try:
+            maxsize = int(os.getenv("QUOTE_CACHE_MAXSIZE", 1024))
+            ttl = float(os.getenv("QUOTE_CACHE_TTL", 900))
+        except ValueError:
+            maxsize, ttl = 1024, 900.0
+        _quote_cache = QuoteCache(maxsize=maxsize, ttl=ttl)
+    return _quote_cache
@@ -0,0 +1,221 @@
+"""Resilienza delle chiamate al backend: budget di latenza del turno, retry e circuit breaker.
+
+- Ogni turno (run di un'azione) ha un budget di latenza (API_TURN_BUDGET secondi); il timeout
+  di ogni chiamata è il minimo tra quello dell'endpoint e il tempo rimasto del turno.
+- Solo le GET (idempotenti) vengono ritentate, con backoff esponenziale e jitter.
+- Un circuit breaker per endpoint smette di chiamare il backend dopo troppi errori consecutivi:
+  le letture vengono servite da cache o catalogo locale finché il backend non torna disponibile.
+"""
+import contextvars
+import functools
+import inspect
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# Stati del circuit breaker
+CHIUSO = "closed"
+APERTO = "open"
+SEMI_APERTO = "half_open"
+
+# Status HTTP che indicano un problema temporaneo del backend
+STATUS_RITENTABILI = frozenset({429, 500, 502, 503, 504})
+
+_scadenza_turno: contextvars.ContextVar = contextvars.ContextVar("scadenza_turno", default=None)
+
+
+def _env_float(nome: str, default: float) -> float:
+    try:
+        return float(os.getenv(nome, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def tempo_rimanente() -> Optional[float]:
+    """Secondi rimasti nel budget del turno corrente, None se non c'è un turno attivo."""
+    scadenza = _scadenza_turno.get()
+    return None if scadenza is None else scadenza - time.monotonic()
+
+
+@contextmanager
+def budget_turno(secondi: Optional[float] = None):
+    """Imposta la scadenza del turno per tutte le chiamate al backend fatte nel blocco.
+
+    Un turno annidato non può estendere la scadenza di quello esterno.
+    """
+    secondi = _env_float("API_TURN_BUDGET", 5.0) if secondi is None else secondi
+    scadenza = time.monotonic() + secondi
+    esterna = _scadenza_turno.get()
+    token = _scadenza_turno.set(scadenza if esterna is None else min(scadenza, esterna))
+    try:
+        yield
+    finally:
+        _scadenza_turno.reset(token)
+
+
+def applica_budget_turno(namespace: Dict[str, Any]):
+    """Esegue `run` di ogni azione definita nel modulo dentro un budget_turno.
+
+    Da chiamare in fondo a ogni modulo di azioni con `applica_budget_turno(globals())`;
+    i validatori dei form sono coperti perché vengono chiamati dal `run` del form.
+    """
+    modulo = namespace.get("__name__")
+    for oggetto in list(namespace.values()):
+        if not inspect.isclass(oggetto) or oggetto.__module__ != modulo or not hasattr(oggetto, "name"):
+            continue
+        run = getattr(oggetto, "run", None)
+        if run is None or getattr(run, "_con_budget", False):
+            continue
+        if inspect.iscoroutinefunction(run):
+            @functools.wraps(run)
+            async def avvolto(self, *args, _run=run, **kwargs):
+                with budget_turno():
+                    return await _run(self, *args, **kwargs)
+        else:
+            @functools.wraps(run)
+            def avvolto(self, *args, _run=run, **kwargs):
+                with budget_turno():
+                    return _run(self, *args, **kwargs)
+        avvolto._con_budget = True
+        oggetto.run = avvolto
+
+
+class CircuitBreaker:
+    """Circuit breaker a tre stati per un endpoint del backend.
+
+    Dopo `soglia_errori` errori consecutivi si apre e rifiuta le chiamate per `apertura` secondi;
+    poi lascia passare una sola chiamata di prova (semi-aperto) che decide se richiudersi.
+    """
+
+    def __init__(self, soglia_errori: int = 5, apertura: float = 30.0):
+        self.soglia_errori = soglia_errori
+        self.apertura = apertura
+        self.errori_consecutivi = 0
+        self._stato = CHIUSO
+        self._aperto_dal = 0.0
+        self._prova_in_corso = False
+        self._lock = threading.Lock()
+
+    @property
+    def stato(self) -> str:
+        with self._lock:
+            if self._stato == APERTO and time.monotonic() - self._aperto_dal >= self.apertura:
+                return SEMI_APERTO
+            return self._stato
+
+    def consenti(self) -> bool:
+        """True se la chiamata può partire."""
+        with self._lock:
+            if self._stato == CHIUSO:
+                return True
+            if self._stato == APERTO:
+                if time.monotonic() - self._aperto_dal < self.apertura:
+                    return False
+                self._stato = SEMI_APERTO
+                self._prova_in_corso = False
+            # Semi-aperto: una sola chiamata di prova alla volta
+            if self._prova_in_corso:
+                return False
+            self._prova_in_corso = True
+            return True
+
+    def rilascia(self):
+        """Annulla una chiamata consentita ma terminata senza esito (cancellata o interrotta da un errore inatteso)."""
+        with self._lock:
+            self._prova_in_corso = False
+
+    def successo(self):
+        with self._lock:
+            self.errori_consecutivi = 0
+            self._stato = CHIUSO
+            self._prova_in_corso = False
+
+    def fallimento(self):
+        with self._lock:
+            self.errori_consecutivi += 1
+            self._prova_in_corso = False
+            if self._stato == SEMI_APERTO or self.errori_consecutivi >= self.soglia_errori:
+                self._stato = APERTO
+                self._aperto_dal = time.monotonic()
+
+
+class Resilienza:
+    """Parametri di timeout e retry e circuit breaker per endpoint, condivisi dai client del processo."""
+
+    def __init__(
+        self,
+        timeout_default: float = 10.0,
+        tentativi: int = 2,
+        backoff_base: float = 0.1,
+        backoff_max: float = 1.0,
+        soglia_errori: int = 5,
+        apertura: float = 30.0,
+    ):
+        self.timeout_default = timeout_default
+        self.tentativi = tentativi  # retry dopo il primo tentativo, solo per le GET
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.soglia_errori = soglia_errori
+        self.apertura = apertura
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(endpoint, CircuitBreaker(self.soglia_errori, self.apertura))
+        return breaker
+
+    def timeout(self, endpoint: str) -> Optional[float]:
+        """Timeout della prossima chiamata: quello dell'endpoint, ridotto al tempo rimasto del turno.
+
+        None se il budget del turno è esaurito (la chiamata non deve partire).
+        """
+        # Es. API_TIMEOUT_CONFIGURA_TAPPARELLA=5
+        timeout = _env_float(f"API_TIMEOUT_{endpoint.upper().replace('/', '_')}", self.timeout_default)
+        rimanente = tempo_rimanente()
+        if rimanente is None:
+            return timeout
+        if rimanente <= 0.01:
+            return None
+        return min(timeout, rimanente)
+
+    def attesa(self, tentativo: int) -> Optional[float]:
+        """Attesa prima del retry numero `tentativo` (da 0), None se non resta budget per ritentare."""
+        attesa = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** tentativo))
+        rimanente = tempo_rimanente()
+        if rimanente is not None and rimanente - attesa <= 0.05:
+            return None
+        return attesa
+
+    def stats(self) -> Dict[str, Any]:
+        """Stato dei circuit breaker per endpoint."""
+        return {
+            endpoint: {"stato": breaker.stato, "errori_consecutivi": breaker.errori_consecutivi}
+            for endpoint, breaker in list(self._breakers.items())
+        }
+
+
+_resilienza: Optional[Resilienza] = None
+_resilienza_lock = threading.Lock()
+
+
+def get_resilienza() -> Resilienza:
+    """Restituisce la configurazione di resilienza condivisa da ApiService e AsyncApiService."""
+    global _resilienza
+    if _resilienza is None:
+        with _resilienza_lock:
+            if _resilienza is None:
+                _resilienza = Resilienza(
+                    timeout_default=_env_float("API_READ_TIMEOUT", 10.0),
+                    tentativi=int(_env_float("API_RETRY_MAX", 2)),
+                    backoff_base=_env_float("API_RETRY_BACKOFF", 0.1),
+                    backoff_max=_env_float("API_RETRY_BACKOFF_MAX", 1.0),
+                    soglia_errori=int(_env_float("API_CB_FAILURES", 5)),
+                    apertura=_env_float("API_CB_RESET", 30.0),
+                )
+    return _resilienza
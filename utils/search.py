@@ -0,0 +1,247 @@
+"""Ricerca full-text nel catalogo per le richieste libere degli utenti.
+
+Indice invertito su titoli e descrizioni con stemming leggero italiano, ranking BM25
+e filtri numerici (Nm, kg, prezzo). L'indice è salvato su disco e ricaricato all'avvio
+se il dataset non è cambiato.
+
+Uso: python -m utils.search "motore somfy 30 nm con manovra di soccorso"
+"""
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from utils.catalog import Prodotto, DATASET_DIR, get_catalog
+from utils.classifier import normalizza
+
+logger = logging.getLogger("Search")
+
+# Parametri BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Il titolo conta come se i suoi termini comparissero più volte nel documento
+PESO_TITOLO = 3
+# Bonus per i prodotti con esattamente la coppia o la portata richiesta
+BONUS_FACET = 2.0
+# Punteggio minimo perché un testo libero indichi un prodotto preciso: sotto questa soglia
+# (es. solo "motore" o "tapparella") la corrispondenza non basta e si propongono suggerimenti
+PUNTEGGIO_MINIMO = 3.0
+# Versione del formato dell'indice salvato su disco
+FORMATO_INDICE = 1
+
+INDEX_PATH = os.path.join(DATASET_DIR, "..", ".indice_ricerca.pkl")
+
+STOPWORDS = frozenset("""
+a ad al allo ai agli all agl alla alle con col coi da dal dallo dai dagli dall dagl dalla dalle di del dello
+dei degli dell degl della delle in nel nello nei negli nell negl nella nelle su sul sullo sui sugli sull sugl
+sulla sulle per tra fra il lo la i gli le l un uno una e ed o od ma se che chi cui non come dove quale quali
+quanto quanti mi ti si ci vi ne io tu lui lei noi voi loro mio mia miei mie tuo tua suo sua nostro vostro
+questo questa questi queste quello quella quelli quelle sono sei e è era essere ho hai ha abbiamo hanno
+vorrei voglio cerco serve servono mi più meno molto anche solo tipo cosa
+""".split())
+
+_RE_COPPIA = re.compile(r"(\d+(?:[.,]\d+)?)\s*nm\b")
+_RE_PORTATA = re.compile(r"(\d+(?:[.,]\d+)?)\s*kg\b")
+_RE_PREZZO_MAX = re.compile(
+    r"\b(?:sotto|entro|max|massimo|meno di|fino a)\s*(?:i\s+|ai\s+)?(?:€\s*)?(\d+(?:[.,]\d+)?)\s*(?:€|euro)?"
+)
+
+
+def stem(parola: str) -> str:
+    """Stemming leggero italiano: rimuove le desinenze di genere e numero (motore/motori → motor)."""
+    if len(parola) > 6 and parola.endswith(("zione", "zioni")):
+        return parola[:-1]
+    if len(parola) > 3 and parola[-1] in "aeio":
+        parola = parola[:-1]
+        # Plurali in -chi/-ghi e -che/-ghe: staffe → staff, banchi → banc
+        if parola.endswith(("ch", "gh")):
+            parola = parola[:-1]
+    return parola
+
+
+def termini(testo: str) -> List[str]:
+    """Termini indicizzati di un testo: normalizzati, senza stopword né numeri, con stemming."""
+    return [
+        stem(parola) for parola in normalizza(testo).split()
+        if parola not in STOPWORDS and not parola.isdigit() and len(parola) > 1
+    ]
+
+
+def _numero(testo: str) -> float:
+    return float(testo.replace(",", "."))
+
+
+@dataclass
+class Filtri:
+    """Filtri numerici della ricerca; i valori None non filtrano."""
+
+    categoria: Optional[str] = None
+    coppia_nm: Optional[float] = None  # coppia richiesta: almeno questa, bonus se identica
+    portata_kg: Optional[float] = None  # portata richiesta: almeno questa, bonus se identica
+    prezzo_max: Optional[float] = None
+
+    @classmethod
+    def da_testo(cls, testo: str, categoria: Optional[str] = None) -> "Filtri":
+        """Ricava i filtri dal testo libero, es. '30 nm', '40kg', 'sotto i 100 euro'."""
+        normalizzato = testo.lower().replace("€", " euro ")
+        coppia = _RE_COPPIA.search(normalizzato)
+        portata = _RE_PORTATA.search(normalizzato)
+        prezzo = _RE_PREZZO_MAX.search(normalizzato)
+        return cls(
+            categoria=categoria,
+            coppia_nm=_numero(coppia.group(1)) if coppia else None,
+            portata_kg=_numero(portata.group(1)) if portata else None,
+            prezzo_max=_numero(prezzo.group(1)) if prezzo else None,
+        )
+
+
+class SearchIndex:
+    """Indice BM25 con i contributi di ogni termine precalcolati per documento.
+
+    Una ricerca somma solo le liste dei termini della query: nessun calcolo per i documenti
+    che non contengono almeno un termine.
+    """
+
+    def __init__(self, prodotti: List[Prodotto], firma: Tuple = ()):
+        self.prodotti = prodotti
+        self.firma = firma
+        self.liste: Dict[str, List[Tuple[int, float]]] = {}
+        self._costruisci()
+
+    def _costruisci(self):
+        documenti = []
+        for prodotto in self.prodotti:
+            frequenze: Dict[str, int] = {}
+            for termine in termini(prodotto.nome) * PESO_TITOLO + termini(prodotto.descrizione):
+                frequenze[termine] = frequenze.get(termine, 0) + 1
+            documenti.append(frequenze)
+
+        n = len(documenti)
+        lunghezza_media = sum(sum(d.values()) for d in documenti) / n if n else 0
+        frequenza_documenti: Dict[str, int] = {}
+        for frequenze in documenti:
+            for termine in frequenze:
+                frequenza_documenti[termine] = frequenza_documenti.get(termine, 0) + 1
+
+        for indice, frequenze in enumerate(documenti):
+            lunghezza = sum(frequenze.values())
+            norma = BM25_K1 * (1 - BM25_B + BM25_B * lunghezza / lunghezza_media) if lunghezza_media else BM25_K1
+            for termine, tf in frequenze.items():
+                df = frequenza_documenti[termine]
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                self.liste.setdefault(termine, []).append((indice, idf * tf * (BM25_K1 + 1) / (tf + norma)))
+
+    def _ammesso(self, prodotto: Prodotto, filtri: Filtri) -> bool:
+        if filtri.categoria and prodotto.categoria != filtri.categoria:
+            return False
+        if filtri.coppia_nm is not None and (prodotto.coppia_nm is None or prodotto.coppia_nm < filtri.coppia_nm):
+            return False
+        if filtri.portata_kg is not None and (prodotto.portata_kg is None or prodotto.portata_kg < filtri.portata_kg):
+            return False
+        if filtri.prezzo_max is not None and (prodotto.prezzo is None or prodotto.prezzo > filtri.prezzo_max):
+            return False
+        return True
+
+    def cerca(self, testo: str, k: int = 5, filtri: Optional[Filtri] = None) -> List[Tuple[Prodotto, float]]:
+        """I `k` prodotti più rilevanti per il testo, con il loro punteggio.
+
+        Se `filtri` non è indicato viene ricavato dal testo (Nm, kg, prezzo massimo).
+        """
+        filtri = filtri or Filtri.da_testo(testo)
+        punteggi: Dict[int, float] = {}
+        for termine in set(termini(testo)):
+            for indice, peso in self.liste.get(termine, ()):
+                punteggi[indice] = punteggi.get(indice, 0.0) + peso
+
+        # Solo filtri numerici (es. "motore 30 nm" con termini già filtrati): tutti i documenti sono candidati
+        if not punteggi and (filtri.coppia_nm is not None or filtri.portata_kg is not None):
+            punteggi = dict.fromkeys(range(len(self.prodotti)), 0.0)
+
+        risultati = []
+        for indice, punteggio in punteggi.items():
+            prodotto = self.prodotti[indice]
+            if not self._ammesso(prodotto, filtri):
+                continue
+            if filtri.coppia_nm is not None and prodotto.coppia_nm == filtri.coppia_nm:
+                punteggio += BONUS_FACET
+            if filtri.portata_kg is not None and prodotto.portata_kg == filtri.portata_kg:
+                punteggio += BONUS_FACET
+            risultati.append((punteggio, -indice))
+        return [(self.prodotti[-i], punteggio) for punteggio, i in heapq.nlargest(k, risultati)]
+
+    def scegli(self, testo: str, categoria: str, k: int = 3) -> Tuple[Optional[Prodotto], List[Prodotto]]:
+        """Il prodotto indicato dal testo se la corrispondenza è sicura, altrimenti None e fino a `k` suggerimenti.
+
+        Sicura: nome identico a quello di un prodotto della categoria (es. il payload di un pulsante),
+        oppure primo risultato con almeno PUNTEGGIO_MINIMO e davanti al secondo.
+        """
+        nome = " ".join(testo.split()).lower()
+        for prodotto in self.prodotti:
+            if prodotto.categoria == categoria and prodotto.nome.lower() == nome:
+                return prodotto, []
+        risultati = self.cerca(testo, k=max(k, 2), filtri=Filtri.da_testo(testo, categoria=categoria))
+        if risultati and risultati[0][1] >= PUNTEGGIO_MINIMO and (len(risultati) == 1 or risultati[0][1] > risultati[1][1]):
+            return risultati[0][0], []
+        return None, [prodotto for prodotto, _ in risultati[:k]]
+
+    def salva(self, percorso: str = INDEX_PATH):
+        """Salva l'indice su disco (scrittura atomica)."""
+        dati = {"formato": FORMATO_INDICE, "firma": self.firma, "liste": self.liste}
+        temporaneo = percorso + ".tmp"
+        with open(temporaneo, "wb") as f:
+            pickle.dump(dati, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaneo, percorso)
+
+    @classmethod
+    def carica(cls, prodotti: List[Prodotto], firma: Tuple, percorso: str = INDEX_PATH) -> Optional["SearchIndex"]:
+        """Carica l'indice salvato se è stato costruito dallo stesso dataset, altrimenti None."""
+        try:
+            with open(percorso, "rb") as f:
+                dati = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return None
+        if not isinstance(dati, dict) or dati.get("formato") != FORMATO_INDICE or dati.get("firma") != firma:
+            return None
+        indice = cls.__new__(cls)
+        indice.prodotti = prodotti
+        indice.firma = firma
+        indice.liste = dati["liste"]
+        return indice
+
+
+_index: Optional[SearchIndex] = None
+_index_version = -1
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Restituisce l'indice di ricerca, caricato da disco o ricostruito quando cambia il catalogo."""
+    global _index, _index_version
+    catalogo = get_catalog()
+    catalogo.reload_if_changed()
+    if _index is None or _index_version != catalogo.version:
+        with _index_lock:
+            if _index is None or _index_version != catalogo.version:
+                percorso = os.getenv("SEARCH_INDEX_PATH", INDEX_PATH)
+                firma = catalogo.firma()
+                indice = SearchIndex.carica(catalogo.prodotti, firma, percorso)
+                if indice is None:
+                    indice = SearchIndex(catalogo.prodotti, firma)
+                    try:
+                        indice.salva(percorso)
+                    except OSError as e:
+                        logger.warning(f"Impossibile salvare l'indice di ricerca in {percorso}: {e}")
+                _index = indice
+                _index_version = catalogo.version
+    return _index
+
+
+if __name__ == "__main__":
+    for prodotto, punteggio in get_search_index().cerca(" ".join(sys.argv[1:]), k=10):
+        print(f"{punteggio:6.2f}  [{prodotto.categoria}] {prodotto.nome} - {prodotto.prezzo} €")
@@ -0,0 +1,31 @@
+import os
+import threading
+from typing import Optional
+
+# Sceglie il .env corretto (ENV_FILE=.env.prod in produzione); le variabili già impostate non vengono sovrascritte
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+ENV_FILE_DEFAULT = os.path.join(ROOT_DIR, ".env.dev")
+
+_caricato = False
+_lock = threading.Lock()
+
+
+def carica_ambiente(percorso: Optional[str] = None) -> bool:
+    """Carica le variabili d'ambiente dal file .env, una sola volta per processo.
+
+    Restituisce True se il file è stato letto. Senza python-dotenv valgono solo le
+    variabili già presenti nell'ambiente.
+    """
+    global _caricato
+    if _caricato:
+        return True
+    with _lock:
+        if _caricato:
+            return True
+        percorso = percorso or os.getenv("ENV_FILE") or ENV_FILE_DEFAULT
+        try:
+            from dotenv import load_dotenv
+        except ImportError:
+            return False
+        _caricato = load_dotenv(dotenv_path=percorso)
+        return _caricato
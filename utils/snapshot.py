@@ -0,0 +1,238 @@
+"""Snapshot binario del catalogo, aperto con mmap dai processi del server delle azioni.
+
+Il file contiene colonne a larghezza fissa (prezzo, coppia, portata come float64; categoria,
+marca, nome, descrizione, link e immagine come indici uint32 in una tabella di stringhe con i
+testi uguali salvati una volta sola). Aprirlo non richiede di leggere i JSON: le pagine del file
+restano nella page cache e sono condivise da tutti i worker, e descrizioni, link e immagini
+vengono decodificati solo quando servono.
+
+Il file viene sostituito in modo atomico: i processi che hanno ancora mappato il vecchio
+snapshot continuano a leggerlo finché non ricaricano il catalogo.
+
+Uso: python -m utils.snapshot [--dataset-dir DIR] [--output FILE]
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from dataclasses import fields
+from typing import Dict, Iterable, List, Optional
+
+from utils.catalog import DATASET_DIR, SNAPSHOT_PATH, Prodotto, file_dataset, leggi_dataset
+
+MAGIC = b"CATSNAP\0"
+FORMATO_SNAPSHOT = 1
+# magic, formato, riservato, numero di prodotti, numero di stringhe, impronta del dataset
+HEADER = struct.Struct("<8sHHII32s")
+DIMENSIONE_HEADER = 64
+BLOCCO_LETTURA = 1 << 20  # i JSON vengono letti a blocchi per calcolare l'impronta
+
+COLONNE_NUMERICHE = ("prezzo", "coppia_nm", "portata_kg")  # float64, NaN = valore assente
+COLONNE_TESTO = ("categoria", "marca", "nome", "descrizione", "link", "image_url")  # uint32 nella tabella
+NESSUNA = 0xFFFFFFFF  # indice di stringa per i valori assenti
+
+
+def _allinea(offset: int, a: int = 8) -> int:
+    return (offset + a - 1) // a * a
+
+
+def _little_endian(valori: array) -> bytes:
+    if sys.byteorder != "little":
+        valori = array(valori.typecode, valori)
+        valori.byteswap()
+    return valori.tobytes()
+
+
+def impronta_dataset(percorsi: Iterable[str]) -> bytes:
+    """Nome, dimensione e CRC32 dei file del dataset: lega lo snapshot ai JSON da cui è compilato.
+
+    Dipende dal contenuto e non dalle date di modifica, quindi resta valida se i file vengono
+    copiati (es. nell'immagine del container) senza essere cambiati.
+    """
+    crc, totale, n_file = 0, 0, 0
+    for percorso in percorsi:
+        dimensione = os.path.getsize(percorso)
+        crc = zlib.crc32(os.path.basename(percorso).encode("utf-8") + struct.pack("<Q", dimensione), crc)
+        with open(percorso, "rb") as f:
+            while blocco := f.read(BLOCCO_LETTURA):
+                crc = zlib.crc32(blocco, crc)
+        totale += dimensione
+        n_file += 1
+    return struct.pack("<IQI", crc, totale, n_file).ljust(32, b"\0")
+
+
+def _disposizione(n_prodotti: int, n_stringhe: int) -> Dict[str, int]:
+    """Offset delle sezioni del file: colonne, offset delle stringhe, testi."""
+    offset = DIMENSIONE_HEADER
+    sezioni = {}
+    for colonna in COLONNE_NUMERICHE:
+        sezioni[colonna] = offset
+        offset += 8 * n_prodotti
+    for colonna in COLONNE_TESTO:
+        sezioni[colonna] = offset
+        offset += 4 * n_prodotti
+    sezioni["offset_stringhe"] = offset = _allinea(offset)
+    sezioni["testi"] = _allinea(offset + 4 * (n_stringhe + 1))
+    return sezioni
+
+
+def compila(dataset_dir: str = DATASET_DIR, percorso: str = SNAPSHOT_PATH) -> Dict[str, int]:
+    """Compila i JSON del dataset nello snapshot binario (scrittura atomica). Restituisce le statistiche."""
+    percorsi = list(file_dataset(dataset_dir))
+    prodotti = leggi_dataset(percorsi)
+
+    tabella: Dict[str, int] = {}
+    testi: List[bytes] = []
+    riferimenti = 0
+
+    def interna(testo: Optional[str]) -> int:
+        nonlocal riferimenti
+        if testo is None:
+            return NESSUNA
+        riferimenti += 1
+        indice = tabella.get(testo)
+        if indice is None:
+            indice = tabella[testo] = len(testi)
+            testi.append(testo.encode("utf-8"))
+        return indice
+
+    numeriche = {c: array("d", (math.nan if getattr(p, c) is None else getattr(p, c) for p in prodotti)) for c in COLONNE_NUMERICHE}
+    colonne_testo = {c: array("I", (interna(getattr(p, c)) for p in prodotti)) for c in COLONNE_TESTO}
+    offset_stringhe = array("I", [0])
+    for testo in testi:
+        offset_stringhe.append(offset_stringhe[-1] + len(testo))
+
+    sezioni = _disposizione(len(prodotti), len(testi))
+    temporaneo = percorso + ".tmp"
+    with open(temporaneo, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMATO_SNAPSHOT, 0, len(prodotti), len(testi), impronta_dataset(percorsi)))
+        for nome, colonna in [*numeriche.items(), *colonne_testo.items(), ("offset_stringhe", offset_stringhe)]:
+            f.write(b"\0" * (sezioni[nome] - f.tell()))
+            f.write(_little_endian(colonna))
+        f.write(b"\0" * (sezioni["testi"] - f.tell()))
+        for testo in testi:
+            f.write(testo)
+        dimensione = f.tell()
+    os.replace(temporaneo, percorso)
+    return {
+        "prodotti": len(prodotti),
+        "stringhe": len(testi),
+        "stringhe_condivise": riferimenti - len(testi),
+        "byte": dimensione,
+        "byte_json": sum(os.path.getsize(p) for p in percorsi),
+    }
+
+
+class ProdottoMappato(Prodotto):
+    """Prodotto dello snapshot: descrizione, link e immagine restano nel file mappato fino all'uso."""
+
+    __slots__ = ("_snapshot",)
+
+    def __init__(self, snapshot: "Snapshot", **valori):
+        imposta = object.__setattr__
+        imposta(self, "_snapshot", snapshot)
+        for campo, valore in valori.items():
+            imposta(self, campo, valore)
+
+    @property
+    def descrizione(self) -> str:
+        return self._snapshot.testo("descrizione", self.id) or ""
+
+    @property
+    def link(self) -> Optional[str]:
+        return self._snapshot.testo("link", self.id)
+
+    @property
+    def image_url(self) -> Optional[str]:
+        return self._snapshot.testo("image_url", self.id)
+
+    def __reduce__(self):
+        # Fuori dal processo (pickle) viaggia come Prodotto normale, senza il riferimento alla mappa
+        return Prodotto, tuple(getattr(self, campo.name) for campo in fields(Prodotto))
+
+
+class Snapshot:
+    """Snapshot aperto in sola lettura: colonne e tabella delle stringhe sono viste sul file mappato."""
+
+    def __init__(self, percorso: str = SNAPSHOT_PATH):
+        if sys.byteorder != "little":
+            raise ValueError("snapshot little-endian non leggibile con viste dirette su questa piattaforma")
+        self.percorso = percorso
+        with open(percorso, "rb") as f:
+            self._mappa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mappa) < DIMENSIONE_HEADER:
+            raise ValueError("file troppo corto")
+        magic, formato, _, self.n_prodotti, self.n_stringhe, self.impronta = HEADER.unpack_from(self._mappa)
+        if magic != MAGIC or formato != FORMATO_SNAPSHOT:
+            raise ValueError(f"formato non riconosciuto ({magic!r}, versione {formato})")
+        sezioni = _disposizione(self.n_prodotti, self.n_stringhe)
+        vista = memoryview(self._mappa)
+        self.colonne = {
+            c: vista[sezioni[c]:sezioni[c] + 8 * self.n_prodotti].cast("d") for c in COLONNE_NUMERICHE
+        }
+        self.colonne.update({
+            c: vista[sezioni[c]:sezioni[c] + 4 * self.n_prodotti].cast("I") for c in COLONNE_TESTO
+        })
+        inizio = sezioni["offset_stringhe"]
+        self._offset = vista[inizio:inizio + 4 * (self.n_stringhe + 1)].cast("I")
+        self._testi = sezioni["testi"]
+        if self._testi + self._offset[-1] != len(self._mappa):
+            raise ValueError("dimensione del file non coerente con l'header")
+
+    def stringa(self, indice: int) -> Optional[str]:
+        """Stringa della tabella (decodificata a ogni chiamata), None per i valori assenti."""
+        if indice == NESSUNA:
+            return None
+        return str(self._mappa[self._testi + self._offset[indice]:self._testi + self._offset[indice + 1]], "utf-8")
+
+    def testo(self, colonna: str, prodotto: int) -> Optional[str]:
+        return self.stringa(self.colonne[colonna][prodotto])
+
+    def numero(self, colonna: str, prodotto: int) -> Optional[float]:
+        valore = self.colonne[colonna][prodotto]
+        return None if math.isnan(valore) else valore
+
+    def prodotti(self) -> List[ProdottoMappato]:
+        """I prodotti dello snapshot. Categoria e marca sono oggetti condivisi tra i prodotti."""
+        condivise: Dict[int, str] = {}
+
+        def condivisa(indice: int) -> Optional[str]:
+            if indice not in condivise:
+                testo = self.stringa(indice)
+                condivise[indice] = sys.intern(testo) if testo is not None else None
+            return condivise[indice]
+
+        categorie, marche, nomi = self.colonne["categoria"], self.colonne["marca"], self.colonne["nome"]
+        return [
+            ProdottoMappato(
+                self,
+                id=i,
+                categoria=condivisa(categorie[i]),
+                nome=self.stringa(nomi[i]),
+                prezzo=self.numero("prezzo", i),
+                coppia_nm=self.numero("coppia_nm", i),
+                portata_kg=self.numero("portata_kg", i),
+                marca=condivisa(marche[i]),
+            )
+            for i in range(self.n_prodotti)
+        ]
+
+
+def apri_snapshot(percorso: str = SNAPSHOT_PATH) -> Snapshot:
+    """Apre lo snapshot; OSError se manca, ValueError se non è valido."""
+    return Snapshot(percorso)
+
+
+if __name__ == "__main__":
+    import argparse  # solo per la riga di comando: i worker importano il modulo per aprire lo snapshot
+
+    parser = argparse.ArgumentParser(description="Compila il catalogo JSON nello snapshot binario")
+    parser.add_argument("--dataset-dir", default=os.getenv("CATALOG_DIR", DATASET_DIR))
+    parser.add_argument("--output", default=os.getenv("CATALOG_SNAPSHOT") or SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    print(json.dumps(compila(args.dataset_dir, args.output), indent=4, ensure_ascii=False))